@@ -0,0 +1,91 @@
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+
+
+class PipeValues(Mapping):
+    """Dict-style {pipe_id: bool} view over a boolean array of a NetworkState"""
+
+    def __init__(self, state):
+        self._state = state
+
+    def __getitem__(self, pipe_id):
+        return bool(self.values[self._state.index[pipe_id]])
+
+    def __iter__(self):
+        return iter(self._state.pipe_ids)
+
+    def __len__(self):
+        return len(self._state.pipe_ids)
+
+    def count(self):
+        return int(np.count_nonzero(self.values))
+
+    def true_ids(self):
+        """Pipe ids whose value is set, in pipe table order"""
+        return [self._state.pipe_ids[i] for i in np.flatnonzero(self.values)]
+
+    def to_wire(self):
+        """{pipe_id: 0/1}, the format written to /water_system"""
+        return dict(zip(self._state.pipe_ids, self.values.astype(np.uint8).tolist()))
+
+
+class PipeColumn(PipeValues, MutableMapping):
+    """Writable column of a NetworkState.
+
+    Lets code written against {pipe_id: bool} dicts keep indexing by pipe id
+    while the values live in a NumPy array. Pipes can be set but not added
+    or removed; the pipe table is fixed when the state is created.
+    """
+
+    def __init__(self, state, values):
+        super().__init__(state)
+        self.values = values
+
+    def __setitem__(self, pipe_id, value):
+        self.values[self._state.index[pipe_id]] = bool(value)
+
+    def __delitem__(self, pipe_id):
+        raise TypeError("pipes cannot be removed from a NetworkState")
+
+
+class ActiveLeaksView(PipeValues):
+    """Read-only leaks & flow, recomputed from the columns on access"""
+
+    @property
+    def values(self):
+        return self._state.leaks.values & self._state.flow.values
+
+    def __getitem__(self, pipe_id):
+        # One pipe: skip building the whole derived array
+        index = self._state.index[pipe_id]
+        return bool(self._state.leaks.values[index] and self._state.flow.values[index])
+
+
+class NetworkState:
+    """Columnar per-pipe state: one pipe-id-to-index table and a bool array per attribute.
+
+    `leaks` and `flow` are PipeColumn views over the arrays, `active_leaks`
+    is derived as leaks & flow, so there is nothing to keep in sync. Bulk
+    changes (resetting flow, marking a set of pipes flowing) are single
+    array operations rather than per-pipe dict writes.
+    """
+
+    def __init__(self, pipe_ids):
+        self.pipe_ids = tuple(pipe_ids)
+        self.index = {pipe_id: i for i, pipe_id in enumerate(self.pipe_ids)}
+        self.leaks = PipeColumn(self, np.zeros(len(self.pipe_ids), dtype=bool))
+        self.flow = PipeColumn(self, np.zeros(len(self.pipe_ids), dtype=bool))
+        self.active_leaks = ActiveLeaksView(self)
+
+    def indices(self, pipe_ids):
+        return np.fromiter((self.index[pipe_id] for pipe_id in pipe_ids), dtype=np.intp)
+
+    def set_flow(self, flowing_pipe_ids):
+        """Mark exactly these pipes as carrying water"""
+        self.flow.values[:] = False
+        self.flow.values[self.indices(flowing_pipe_ids)] = True
+
+    @property
+    def nbytes(self):
+        return self.leaks.values.nbytes + self.flow.values.nbytes
@@ -1,12 +1,23 @@
+import os
 import sys
+from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 
+from telemetry import TelemetryPublisher, connect_firebase
+
+# Highest rate (writes per second) the simulator publishes to /water_system
+TELEMETRY_MAX_RATE = float(os.environ.get('TELEMETRY_MAX_RATE', 5))
+
+# Pipelines from the tank to the tap; water reaches a pipe only if every one before it is open
+PIPELINE_ORDER = ("TANK-A", "A-B", "B-C", "C-TAP")
+
 class WaterSystemGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.initUI()
+        self.setup_telemetry()
         
     def initUI(self):
         self.setWindowTitle('Water System Control')
@@ -90,12 +101,70 @@ class WaterSystemGUI(QMainWindow):
         self.turbidity_slider.valueChanged.connect(self.update_sensor_values)
         self.salinity_slider.valueChanged.connect(self.update_sensor_values)
         self.water_level_slider.valueChanged.connect(self.viz_widget.set_water_level)
+        self.water_level_slider.valueChanged.connect(self.mark_state_changed)
         
         # Initialize status display
         self.update_pipeline_status()
         
         # Connect pipeline clicks to status update
         self.viz_widget.pipeline_clicked.connect(self.update_pipeline_status)
+        self.viz_widget.pipeline_clicked.connect(self.mark_state_changed)
+    
+    def setup_telemetry(self):
+        """Publish state to Firebase from a worker thread, at most TELEMETRY_MAX_RATE times a second"""
+        self.firebase_ref, self.firebase_connected = connect_firebase()
+        self.publisher = TelemetryPublisher(self.firebase_ref, max_rate=TELEMETRY_MAX_RATE)
+        self.state_changed = True  # Send the initial state
+        
+        # Slider drags only set a flag; the timer turns it into one snapshot per tick
+        self.telemetry_timer = QTimer(self)
+        self.telemetry_timer.timeout.connect(self.publish_state)
+        self.telemetry_timer.start(max(1, int(1000 / TELEMETRY_MAX_RATE)))
+    
+    def mark_state_changed(self, *args):
+        self.state_changed = True
+    
+    def publish_state(self):
+        if not self.state_changed:
+            return
+        self.state_changed = False
+        self.publisher.submit(self.build_snapshot())
+    
+    def build_snapshot(self):
+        """Current state in the /water_system schema the Tk simulator writes"""
+        water_level = self.water_level_slider.value()
+        pipeline_status = self.viz_widget.pipeline_status
+        
+        water_flow = {}
+        flowing = water_level > 0
+        for pipe_id in PIPELINE_ORDER:
+            flowing = flowing and pipeline_status[pipe_id]
+            water_flow[pipe_id] = int(flowing)
+        
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'sensors': {
+                'pH': float(self.ph_slider.value()),
+                'turbidity': float(self.turbidity_slider.value()),
+                'salinity': float(self.salinity_slider.value()),
+                # No flow sensor here: scale with the tank level while water reaches the tap
+                'flow': round(5.0 * water_level / 100, 2) if water_flow["C-TAP"] else 0.0
+            },
+            'water_level': int(water_level),
+            # Pipelines are the open/close controls of this simulator
+            'valves': {pipe_id: int(status) for pipe_id, status in pipeline_status.items()},
+            'taps': {'TAP': water_flow["C-TAP"]},
+            'leaks': {pipe_id: 0 for pipe_id in PIPELINE_ORDER},
+            'active_leaks': {pipe_id: 0 for pipe_id in PIPELINE_ORDER},
+            'water_flow': water_flow
+        }
+    
+    def closeEvent(self, event):
+        self.telemetry_timer.stop()
+        if self.state_changed:
+            self.publish_state()
+        self.publisher.stop()
+        super().closeEvent(event)
         
     def create_slider(self, label_text, min_val, max_val, default_val, unit=""):
         layout = QVBoxLayout()
@@ -123,13 +192,8 @@ class WaterSystemGUI(QMainWindow):
         return slider, layout
     
     def update_sensor_values(self):
-        # This method can be expanded to send sensor values to other parts of the system
-        ph = self.ph_slider.value()
-        turbidity = self.turbidity_slider.value()
-        salinity = self.salinity_slider.value()
-        
-        # In a real application, you would send these values to the hardware
-        print(f"Sensor values - pH: {ph}, Turbidity: {turbidity}, Salinity: {salinity}")
+        # Picked up by the next telemetry timer tick (see publish_state)
+        self.mark_state_changed()
     
     def update_pipeline_status(self):
         status_text = "Pipeline Status:\n"
@@ -140,11 +204,24 @@ class WaterSystemGUI(QMainWindow):
     def reset_pipelines(self):
         self.viz_widget.reset_pipelines()
         self.update_pipeline_status()
+        self.mark_state_changed()
 
 
 class VisualizationWidget(QWidget):
+    """Network view drawn in three layers.
+
+    The background and the node/label overlay never change, so they are
+    rendered once into pixmaps (again only on resize). paintEvent blits them
+    and draws just the pipelines and tank water that fall inside the dirty
+    rectangle; state changes call update() with the rectangle they affect.
+    """
+    
     pipeline_clicked = pyqtSignal()
     
+    PIPE_WIDTH = 6
+    TANK_RADIUS = 100
+    NODE_RADIUS = 12
+    
     def __init__(self):
         super().__init__()
         self.water_level = 50  # Percentage
@@ -156,39 +233,63 @@ class VisualizationWidget(QWidget):
         }
         self.setMinimumSize(600, 600)
         
+        # Fixed layout
+        self.tank_center = QPoint(300, 150)
+        self.node_a = QPoint(200, 350)
+        self.node_b = QPoint(400, 350)
+        self.node_c = QPoint(500, 500)
+        self.tap_pos = QPoint(700, 500)
+        self.pipelines = [
+            ("TANK-A", self.tank_center, self.node_a),
+            ("A-B", self.node_a, self.node_b),
+            ("B-C", self.node_b, self.node_c),
+            ("C-TAP", self.node_c, self.tap_pos)
+        ]
+        
+        # Screen area each pipeline covers, used for partial repaints
+        margin = self.PIPE_WIDTH
+        self.pipe_rects = {
+            pipe_id: QRect(p1, p2).normalized().adjusted(-margin, -margin, margin, margin)
+            for pipe_id, p1, p2 in self.pipelines
+        }
+        
+        self.open_pen = QPen(QColor(0, 180, 0), self.PIPE_WIDTH)
+        self.closed_pen = QPen(QColor(220, 0, 0), self.PIPE_WIDTH)
+        for pen in (self.open_pen, self.closed_pen):
+            pen.setCapStyle(Qt.RoundCap)
+        
+        self.background_layer = None
+        self.overlay_layer = None
+    
+    def tank_rect(self):
+        """Area the tank, its water and the level line can touch"""
+        radius = self.TANK_RADIUS + 12
+        return QRect(self.tank_center.x() - radius, self.tank_center.y() - radius, radius * 2, radius * 2)
+    
     def set_water_level(self, level):
+        if level == self.water_level:
+            return
         self.water_level = level
-        self.update()
+        self.update(self.tank_rect())
     
     def reset_pipelines(self):
+        dirty = QRegion()
         for key in self.pipeline_status.keys():
-            self.pipeline_status[key] = True
-        self.update()
+            if not self.pipeline_status[key]:
+                self.pipeline_status[key] = True
+                dirty = dirty.united(self.pipe_rects[key])
+        if not dirty.isEmpty():
+            self.update(dirty)
     
     def mousePressEvent(self, event):
         # Check if a pipeline was clicked
         pos = event.pos()
         
-        # Define pipeline clickable areas
-        tank_center = QPoint(300, 150)
-        node_a = QPoint(200, 350)
-        node_b = QPoint(400, 350)
-        node_c = QPoint(500, 500)
-        tap_pos = QPoint(700, 500)
-        
-        # Check each pipeline
-        pipelines = [
-            ("TANK-A", tank_center, node_a),
-            ("A-B", node_a, node_b),
-            ("B-C", node_b, node_c),
-            ("C-TAP", node_c, tap_pos)
-        ]
-        
-        for pipe_id, p1, p2 in pipelines:
+        for pipe_id, p1, p2 in self.pipelines:
             if self.point_near_line(pos, p1, p2, 15):
                 self.pipeline_status[pipe_id] = not self.pipeline_status[pipe_id]
                 self.pipeline_clicked.emit()
-                self.update()
+                self.update(self.pipe_rects[pipe_id])
                 break
         
         super().mousePressEvent(event)
@@ -219,34 +320,57 @@ class VisualizationWidget(QWidget):
         
         return distance <= threshold
     
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
+    def resizeEvent(self, event):
+        # Static layers are sized to the widget; rebuild them lazily
+        self.background_layer = None
+        self.overlay_layer = None
+        super().resizeEvent(event)
+    
+    def new_layer(self, fill):
+        ratio = self.devicePixelRatioF()
+        layer = QPixmap(self.size() * ratio)
+        layer.setDevicePixelRatio(ratio)
+        layer.fill(fill)
+        return layer
+    
+    def build_static_layers(self):
         # Draw background
-        painter.fillRect(self.rect(), QColor(240, 245, 250))
+        self.background_layer = self.new_layer(QColor(240, 245, 250))
+        
+        # Nodes and labels sit above the pipelines and the tank
+        self.overlay_layer = self.new_layer(Qt.transparent)
+        painter = QPainter(self.overlay_layer)
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.draw_nodes(painter, self.node_a, self.node_b, self.node_c, self.tap_pos)
+        self.draw_labels(painter, self.tank_center, self.node_a, self.node_b, self.node_c, self.tap_pos)
+        painter.end()
+    
+    def paintEvent(self, event):
+        if self.background_layer is None:
+            self.build_static_layers()
         
-        # Define positions
-        tank_center = QPoint(300, 150)
-        tank_radius = 100
-        water_height = tank_radius * 2 * self.water_level / 100
+        dirty = event.rect()
+        painter = QPainter(self)
+        painter.setClipRect(dirty)
+        painter.drawPixmap(QRectF(dirty), self.background_layer, self.layer_rect(dirty))
         
-        node_a = QPoint(200, 350)
-        node_b = QPoint(400, 350)
-        node_c = QPoint(500, 500)
-        tap_pos = QPoint(700, 500)
+        painter.setRenderHint(QPainter.Antialiasing)
         
         # Draw pipelines first (so they're behind nodes)
-        self.draw_pipelines(painter, tank_center, node_a, node_b, node_c, tap_pos)
+        self.draw_pipelines(painter, dirty)
         
         # Draw tank with water level
-        self.draw_tank(painter, tank_center, tank_radius, water_height)
-        
-        # Draw nodes
-        self.draw_nodes(painter, node_a, node_b, node_c, tap_pos)
+        if dirty.intersects(self.tank_rect()):
+            water_height = self.TANK_RADIUS * 2 * self.water_level // 100
+            self.draw_tank(painter, self.tank_center, self.TANK_RADIUS, water_height)
         
-        # Draw labels
-        self.draw_labels(painter, tank_center, node_a, node_b, node_c, tap_pos)
+        # Draw nodes and labels
+        painter.drawPixmap(QRectF(dirty), self.overlay_layer, self.layer_rect(dirty))
+    
+    def layer_rect(self, rect):
+        """Widget rect -> source rect in a (possibly high-DPI) layer pixmap"""
+        ratio = self.background_layer.devicePixelRatio()
+        return QRectF(rect.x() * ratio, rect.y() * ratio, rect.width() * ratio, rect.height() * ratio)
     
     def draw_tank(self, painter, center, radius, water_height):
         # Tank outline
@@ -277,26 +401,18 @@ class VisualizationWidget(QWidget):
         painter.setFont(QFont("Arial", 12, QFont.Bold))
         painter.drawText(center.x() - 30, center.y() + 5, "TANK")
     
-    def draw_pipelines(self, painter, tank_center, node_a, node_b, node_c, tap_pos):
-        # Draw pipelines with different colors based on status
-        pipelines = [
-            ("TANK-A", tank_center, node_a),
-            ("A-B", node_a, node_b),
-            ("B-C", node_b, node_c),
-            ("C-TAP", node_c, tap_pos)
-        ]
-        
-        for pipe_id, p1, p2 in pipelines:
-            if self.pipeline_status[pipe_id]:
-                # Open pipeline - green
-                pen = QPen(QColor(0, 180, 0), 6)
-            else:
-                # Closed pipeline - red
-                pen = QPen(QColor(220, 0, 0), 6)
-            
-            pen.setCapStyle(Qt.RoundCap)
-            painter.setPen(pen)
-            painter.drawLine(p1, p2)
+    def draw_pipelines(self, painter, dirty):
+        # Batch the pipelines inside the dirty area by color: one drawLines per pen
+        open_lines, closed_lines = [], []
+        for pipe_id, p1, p2 in self.pipelines:
+            if dirty.intersects(self.pipe_rects[pipe_id]):
+                lines = open_lines if self.pipeline_status[pipe_id] else closed_lines
+                lines.append(QLine(p1, p2))
+        
+        for pen, lines in ((self.open_pen, open_lines), (self.closed_pen, closed_lines)):
+            if lines:
+                painter.setPen(pen)
+                painter.drawLines(lines)
     
     def draw_nodes(self, painter, node_a, node_b, node_c, tap_pos):
         # Draw nodes as circles
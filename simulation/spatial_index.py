@@ -0,0 +1,96 @@
+import numpy as np
+
+
+class SpatialIndex:
+    """Uniform grid over pipe segments and tap rectangles for click hit-testing.
+
+    Each shape is registered in every grid cell its (tolerance-padded)
+    bounding box touches, so a click only looks at the shapes of one cell and
+    checks them together with NumPy. When several shapes are hit, the one
+    added first wins, matching the order the canvas used to be scanned in.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.clear()
+
+    def clear(self):
+        self._segment_keys = []
+        self._segment_rows = []
+        self._rect_keys = []
+        self._rect_rows = []
+        self._segment_cells = {}
+        self._rect_cells = {}
+        self._segments = np.empty((0, 5))
+        self._rects = np.empty((0, 4))
+
+    def add_segment(self, key, x1, y1, x2, y2, tolerance):
+        self._segment_keys.append(key)
+        self._segment_rows.append((x1, y1, x2, y2, tolerance))
+
+    def add_rect(self, key, cx, cy, width, height):
+        self._rect_keys.append(key)
+        self._rect_rows.append((cx, cy, width / 2, height / 2))
+
+    def _cells_for_box(self, min_x, min_y, max_x, max_y):
+        size = self.cell_size
+        for gx in range(int(min_x // size), int(max_x // size) + 1):
+            for gy in range(int(min_y // size), int(max_y // size) + 1):
+                yield gx, gy
+
+    def build(self):
+        """Freeze the shapes added so far into the grid"""
+        self._segments = np.array(self._segment_rows, dtype=float).reshape(-1, 5)
+        self._rects = np.array(self._rect_rows, dtype=float).reshape(-1, 4)
+
+        segment_cells = {}
+        for index, (x1, y1, x2, y2, tol) in enumerate(self._segment_rows):
+            box = (min(x1, x2) - tol, min(y1, y2) - tol, max(x1, x2) + tol, max(y1, y2) + tol)
+            for cell in self._cells_for_box(*box):
+                segment_cells.setdefault(cell, []).append(index)
+
+        rect_cells = {}
+        for index, (cx, cy, half_w, half_h) in enumerate(self._rect_rows):
+            for cell in self._cells_for_box(cx - half_w, cy - half_h, cx + half_w, cy + half_h):
+                rect_cells.setdefault(cell, []).append(index)
+
+        self._segment_cells = {cell: np.array(ids, dtype=np.intp) for cell, ids in segment_cells.items()}
+        self._rect_cells = {cell: np.array(ids, dtype=np.intp) for cell, ids in rect_cells.items()}
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def rect_at(self, x, y):
+        """Key of the first rectangle containing (x, y), or None"""
+        candidates = self._rect_cells.get(self._cell(x, y))
+        if candidates is None:
+            return None
+
+        rects = self._rects[candidates]
+        hits = (np.abs(x - rects[:, 0]) <= rects[:, 2]) & (np.abs(y - rects[:, 1]) <= rects[:, 3])
+        if not hits.any():
+            return None
+        return self._rect_keys[candidates[np.argmax(hits)]]
+
+    def segment_at(self, x, y):
+        """Key of the first segment within its tolerance of (x, y), or None"""
+        candidates = self._segment_cells.get(self._cell(x, y))
+        if candidates is None:
+            return None
+
+        segments = self._segments[candidates]
+        x1, y1, x2, y2, tolerance = segments.T
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+
+        # Projection of the point onto each segment, clamped to its ends
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(length_sq > 0, ((x - x1) * dx + (y - y1) * dy) / length_sq, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+
+        dist_x = x - (x1 + t * dx)
+        dist_y = y - (y1 + t * dy)
+        hits = dist_x * dist_x + dist_y * dist_y <= tolerance * tolerance
+        if not hits.any():
+            return None
+        return self._segment_keys[candidates[np.argmax(hits)]]
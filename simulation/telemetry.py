@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+import uuid
+
+# Firebase imports - with graceful fallback
+try:
+    import firebase_admin
+    from firebase_admin import credentials, db
+    FIREBASE_AVAILABLE = True
+except ImportError:
+    FIREBASE_AVAILABLE = False
+
+SERVICE_ACCOUNT_PATHS = [
+    'serviceAccountKey.json',
+    '../serviceAccountKey.json',
+    '../serviceAccountKey11.json',
+    'firebase-key.json',
+    'key.json',
+    './config/serviceAccountKey.json',
+    os.path.join(os.path.dirname(__file__), '..', 'serviceAccountKey.json'),
+    os.path.join(os.path.dirname(__file__), '..', 'serviceAccountKey11.json')
+]
+
+
+class MockFirebaseRef:
+    """Offline stand-in for a Firebase reference"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self):
+        return self.data
+
+    def set(self, data):
+        self.data = dict(data)
+
+    def update(self, data):
+        self.data.update(data)
+
+
+def connect_firebase(path='/water_system'):
+    """Return (reference, connected); falls back to an offline mock like the Tk simulator"""
+    if not FIREBASE_AVAILABLE:
+        print("Firebase library not available. Running in offline mode.")
+        return MockFirebaseRef(), False
+
+    service_account_path = next((p for p in SERVICE_ACCOUNT_PATHS if os.path.exists(p)), None)
+    if not service_account_path:
+        print("No Firebase service account key found. Running in offline mode.")
+        return MockFirebaseRef(), False
+
+    try:
+        database_url = os.environ.get('FIREBASE_DB_URL', 'https://aterleak2-default-rtdb.firebaseio.com/')
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate(service_account_path), {
+                'databaseURL': database_url
+            })
+        print(f"Firebase initialized successfully with URL: {database_url}")
+        return db.reference(path), True
+    except Exception as e:
+        print(f"Firebase setup error: {e}")
+        return MockFirebaseRef(), False
+
+
+class TelemetryPublisher:
+    """Publishes /water_system snapshots from a worker thread.
+
+    submit() only swaps the snapshot into a one-slot mailbox, so the GUI
+    thread never waits on the network. The worker sends at most `max_rate`
+    writes per second; snapshots submitted while it is busy or throttled are
+    coalesced and only the latest is written. After the first full set(),
+    only the top-level subtrees that changed are sent, all in one update(),
+    so readers never see half of a tick. Every write carries a `tick` number
+    that increases across restarts (it starts from the wall clock in ms).
+    """
+
+    def __init__(self, ref, max_rate=5.0):
+        self.ref = ref
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.published = 0
+        self.coalesced = 0
+        self._pending = None
+        self._full = False
+        self._last_sent = None
+        self._tick = int(time.time() * 1000)
+        self._ready = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot, full=False):
+        """Queue a snapshot; full=True rewrites the whole tree instead of the changes"""
+        with self._ready:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = snapshot
+            self._full = self._full or full
+            self._ready.notify()
+
+    def _run(self):
+        last_publish = 0.0
+        while True:
+            with self._ready:
+                while self._pending is None and not self._stopped:
+                    self._ready.wait()
+                if self._pending is None:
+                    return
+                stopping = self._stopped
+
+            # Throttle outside the lock so submit() never waits; flush at once on stop
+            delay = last_publish + self.min_interval - time.monotonic()
+            if delay > 0 and not stopping:
+                time.sleep(delay)
+
+            with self._ready:
+                snapshot, self._pending = self._pending, None
+                full, self._full = self._full, False
+
+            last_publish = time.monotonic()
+            try:
+                self._publish(snapshot, full)
+            except Exception as e:
+                print(f"Error publishing telemetry: {e}")
+
+    def _publish(self, snapshot, full=False):
+        self._tick += 1
+        snapshot = dict(snapshot, tick=self._tick,
+                        trace={'id': uuid.uuid4().hex[:16], 'written_at': time.time()})
+        if full or self._last_sent is None:
+            self.ref.set(snapshot)
+        else:
+            changed = {key: value for key, value in snapshot.items() if self._last_sent.get(key) != value}
+            self.ref.update(changed)
+        self._last_sent = snapshot
+        self.published += 1
+
+    def stop(self):
+        """Write any pending snapshot, then end the worker"""
+        with self._ready:
+            self._stopped = True
+            self._ready.notify()
+        self._thread.join(timeout=2)
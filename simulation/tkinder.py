@@ -6,6 +6,11 @@ import json
 import os
 from datetime import datetime
 
+from network_state import NetworkState
+from spatial_index import SpatialIndex
+from telemetry import TelemetryPublisher
+from wire_format import WireIndex
+
 # Firebase imports - with graceful fallback
 try:
     import firebase_admin
@@ -17,6 +22,12 @@ except ImportError:
     FIREBASE_AVAILABLE = False
     print("Firebase library not available. Running in offline mode.")
 
+# 'bitset' writes leaks/flow/taps as compact encoded families (see wire_format.py)
+WIRE_FORMAT = os.environ.get('WIRE_FORMAT', 'json')
+
+# Highest rate (writes per second) state ticks are committed to /water_system
+TELEMETRY_MAX_RATE = float(os.environ.get('TELEMETRY_MAX_RATE', 5))
+
 class WaterSystemGUI:
 
     def start_firebase_listener(self):
@@ -47,12 +58,12 @@ class WaterSystemGUI:
         # CHANGED: Increased height from 600 to 900 to fit all controls
         self.root.geometry("1000x900") 
         self.root.configure(bg='white')
-        # Active leak states (leaks with water flowing)
-        self.active_leaks = {}
         
         # Firebase configuration
         self.firebase_initialized = False
         self.firebase_ref = None
+        self.publisher = None
+        self.publish_scheduled = False
         self.last_update_time = 0
         self.update_interval = 2  # seconds
         
@@ -66,24 +77,28 @@ class WaterSystemGUI:
             "TAP5": False
         }
         
+        # Per-pipe state is held in NumPy columns indexed through one pipe
+        # table (see network_state.py); the views below index by pipe id
+        self.network = NetworkState([
+            "TANK-S1",
+            "S1-S2",
+            "S2-VALVE_A",
+            "VALVE_A-S3",
+            "S3-TAP1",
+            "VALVE_A-S4",
+            "S4-TAP2",
+            "VALVE_A-S5",
+            "S5-JUNCTION_E",
+            "JUNCTION_E-S6",
+            "S6-TAP3",
+            "JUNCTION_E-S7",
+            "S7-TAP4",
+            "JUNCTION_E-S8",
+            "S8-TAP5"
+        ])
+        
         # Pipe leak states: True = has leak, False = no leak
-        self.pipe_leaks = {
-            "TANK-S1": False,
-            "S1-S2": False,
-            "S2-VALVE_A": False,
-            "VALVE_A-S3": False,
-            "S3-TAP1": False,
-            "VALVE_A-S4": False,
-            "S4-TAP2": False,
-            "VALVE_A-S5": False,
-            "S5-JUNCTION_E": False,
-            "JUNCTION_E-S6": False,
-            "S6-TAP3": False,
-            "JUNCTION_E-S7": False,
-            "S7-TAP4": False,
-            "JUNCTION_E-S8": False,
-            "S8-TAP5": False
-        }
+        self.pipe_leaks = self.network.leaks
         
         # Valve states: True = open (water can flow), False = closed (no water)
         self.valve_states = {
@@ -92,7 +107,14 @@ class WaterSystemGUI:
         }
         
         # Water flow status for each pipe
-        self.water_flow = {}
+        self.water_flow = self.network.flow
+        
+        # Id order and index version for the bitset wire format
+        self.pipe_wire = WireIndex(self.network.pipe_ids)
+        self.tap_wire = WireIndex(self.tap_states)
+        
+        # Active leak states (leaks with water flowing), derived as leaks & flow
+        self.active_leaks = self.network.active_leaks
         
         # Initialize sensor values
         self.ph_value = tk.DoubleVar(value=7.0)
@@ -108,6 +130,10 @@ class WaterSystemGUI:
         self.canvas_width = 1200
         self.canvas_height = 800
         
+        # Canvas item handles, created once by build_scene()
+        self.scene = None
+        self.item_styles = {}
+        
         # Setup GUI
         self.setup_gui()
         
@@ -797,6 +823,10 @@ class WaterSystemGUI:
                 
                 self.firebase_ref = db.reference('/water_system')
                 self.firebase_initialized = True
+                if WIRE_FORMAT == 'bitset':
+                    self.pipe_wire.publish(db)
+                    self.tap_wire.publish(db)
+                self.publisher = TelemetryPublisher(self.firebase_ref, max_rate=TELEMETRY_MAX_RATE)
                 self.firebase_status_var.set("Firebase: Connected ✓")
                 self.firebase_status_label.config(fg='#4CAF50')
                 print(f"Firebase initialized successfully with URL: {database_url}")
@@ -853,100 +883,120 @@ class WaterSystemGUI:
             self.canvas.yview_scroll(-1, "units")
     
     def calculate_water_flow(self):
-        """Calculate water flow through pipes and determine active leaks"""
-        # Reset all water flow status
-        for pipe_id in self.pipe_leaks.keys():
-            self.water_flow[pipe_id] = False
-        
-        # Reset active leaks detection
-        self.active_leaks = {}
+        """Calculate water flow through pipes; active leaks follow as leaks & flow"""
+        flowing = []
         
         # Check if water can flow from tank (tank valve must be open and water level > 0)
         water_available = self.valve_states["TANK_VALVE"] and self.water_level_value.get() > 0
         
         if not water_available:
-            # Send water flow status even when no flow
-            if self.firebase_initialized:
-                self.send_water_flow_to_firebase()
+            self.network.set_flow(flowing)
+            # Publish the (empty) water flow status too
+            self.schedule_publish()
             return  # No water flow if tank valve is closed or empty
         
         # Water flow path calculation
-        # Tank -> S1
-        self.water_flow["TANK-S1"] = True
-        
-        # S1 -> S2
-        self.water_flow["S1-S2"] = True
-        
-        # S2 -> VALVE_A
-        self.water_flow["S2-VALVE_A"] = True
+        # Tank -> S1 -> S2 -> VALVE_A
+        flowing += ["TANK-S1", "S1-S2", "S2-VALVE_A"]
         
         # From VALVE_A (only if valve A is open)
         if self.valve_states["VALVE_A"]:
             # VALVE_A -> S3 -> TAP1
-            self.water_flow["VALVE_A-S3"] = True
+            flowing.append("VALVE_A-S3")
             if self.tap_states["TAP1"]:
-                self.water_flow["S3-TAP1"] = True
+                flowing.append("S3-TAP1")
             
             # VALVE_A -> S4 -> TAP2
-            self.water_flow["VALVE_A-S4"] = True
+            flowing.append("VALVE_A-S4")
             if self.tap_states["TAP2"]:
-                self.water_flow["S4-TAP2"] = True
+                flowing.append("S4-TAP2")
             
             # VALVE_A -> S5 -> JUNCTION_E
-            self.water_flow["VALVE_A-S5"] = True
-            self.water_flow["S5-JUNCTION_E"] = True
+            flowing += ["VALVE_A-S5", "S5-JUNCTION_E"]
             
             # From JUNCTION_E to other taps
             # JUNCTION_E -> S6 -> TAP3
-            self.water_flow["JUNCTION_E-S6"] = True
+            flowing.append("JUNCTION_E-S6")
             if self.tap_states["TAP3"]:
-                self.water_flow["S6-TAP3"] = True
+                flowing.append("S6-TAP3")
             
             # JUNCTION_E -> S7 -> TAP4
-            self.water_flow["JUNCTION_E-S7"] = True
+            flowing.append("JUNCTION_E-S7")
             if self.tap_states["TAP4"]:
-                self.water_flow["S7-TAP4"] = True
+                flowing.append("S7-TAP4")
             
             # JUNCTION_E -> S8 -> TAP5
-            self.water_flow["JUNCTION_E-S8"] = True
+            flowing.append("JUNCTION_E-S8")
             if self.tap_states["TAP5"]:
-                self.water_flow["S8-TAP5"] = True
+                flowing.append("S8-TAP5")
         
-        # Calculate active leaks (leaks with water flow)
-        self.calculate_active_leaks()
+        # One vectorized write; active leaks are derived from it on access
+        self.network.set_flow(flowing)
         
-        # Send water flow status after calculation
-        if self.firebase_initialized:
-            self.send_water_flow_to_firebase()
-            self.send_active_leaks_to_firebase()
-
-    def calculate_active_leaks(self):
-        """Calculate which leaks are active (water flowing through leaking pipes)"""
-        self.active_leaks = {}
-        
-        for pipe_id, has_leak in self.pipe_leaks.items():
-            if has_leak and self.water_flow.get(pipe_id, False):
-                # This is an active leak (water flowing through a leaking pipe)
-                self.active_leaks[pipe_id] = True
-            else:
-                self.active_leaks[pipe_id] = False
+        # Flow and active leaks go out with the rest of this tick
+        self.schedule_publish()
 
-    def send_active_leaks_to_firebase(self):
-        """Send active leak status to Firebase"""
-        if not self.firebase_initialized:
+    def pipe_payload(self, column):
+        """A per-pipe family as written to Firebase: {pipe_id: 0/1} or bitset-encoded"""
+        if WIRE_FORMAT == 'bitset':
+            return self.pipe_wire.encode(column.values)
+        return column.to_wire()
+    
+    def tap_payload(self):
+        if WIRE_FORMAT == 'bitset':
+            return self.tap_wire.encode([self.tap_states[tap] for tap in self.tap_wire.ids])
+        return {tap: int(state) for tap, state in self.tap_states.items()}
+    
+    def build_snapshot(self):
+        """Full /water_system state as one dict"""
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'sensors': {
+                'pH': float(self.ph_value.get()),
+                'turbidity': float(self.turbidity_value.get()),
+                'salinity': float(self.salinity_value.get()),
+                'flow': float(self.flow_value.get())
+            },
+            'water_level': int(self.water_level_value.get()),
+            'valves': {
+                'TANK_VALVE': int(self.valve_states["TANK_VALVE"]),
+                'VALVE_A': int(self.valve_states["VALVE_A"])
+            },
+            'taps': self.tap_payload(),
+            'leaks': self.pipe_payload(self.pipe_leaks),
+            'active_leaks': self.pipe_payload(self.active_leaks),
+            'water_flow': self.pipe_payload(self.water_flow)
+        }
+    
+    def schedule_publish(self):
+        """Commit the current state once the running Tk event has finished.
+        
+        A click can change valves, flow and active leaks in several steps;
+        deferring to idle time turns all of them into one tick, written as a
+        single update() of the changed subtrees with a shared tick number, so
+        the dashboard never reads a half-applied change.
+        """
+        if not self.firebase_initialized or self.publish_scheduled:
             return
-            
-        try:
-            active_leaks_data = {pipe: int(is_active) for pipe, is_active in self.active_leaks.items()}
-            self.firebase_ref.child('active_leaks').set(active_leaks_data)
-            print(f"Active leaks sent to Firebase: {active_leaks_data}")
-            
-        except Exception as e:
-            print(f"Error sending active leaks to Firebase: {e}")
+        self.publish_scheduled = True
+        self.root.after_idle(self.publish_tick)
+    
+    def publish_tick(self):
+        self.publish_scheduled = False
+        # Never blocks: the publisher writes from its own thread
+        self.publisher.submit(self.build_snapshot())
     
     def draw_water_system(self):
+        # Items are created once; later calls only restyle what changed
+        if self.scene is None:
+            self.build_scene()
+        self.update_scene()
+    
+    def build_scene(self):
         canvas = self.canvas
         canvas.delete("all")
+        self.scene = {'taps': {}, 'pipes': {}, 'leaks': {}}
+        self.item_styles = {}
         
         # Scale down the entire diagram
         scale_factor = 0.7  # You can adjust this value
@@ -969,24 +1019,18 @@ class WaterSystemGUI:
             tags=("tank", "clickable")
         )
         
-        # Draw water in tank based on water level
-        water_level = self.water_level_value.get()
-        water_height = tank_height * (water_level / 100)
-        water_y = tank_y + tank_height - water_height
-        
-        water_color = '#66b3ff' if water_level > 0 else '#cccccc'
-        
-        canvas.create_rectangle(
-            tank_x, water_y, 
+        # Water in tank; its height and color follow the water level (update_scene)
+        self.scene['tank'] = (tank_x, tank_y, tank_width, tank_height)
+        self.scene['water'] = canvas.create_rectangle(
+            tank_x, tank_y + tank_height,
             tank_x + tank_width, tank_y + tank_height,
-            outline='', fill=water_color,
+            outline='',
             tags=("water", "clickable")
         )
         
-        # Draw water level percentage inside tank
-        canvas.create_text(
+        # Water level percentage inside tank
+        self.scene['water_level_text'] = canvas.create_text(
             tank_x + tank_width/2, tank_y + tank_height/2,
-            text=f"{water_level}%",
             font=('Helvetica', 16, 'bold'),
             fill='#1a5a99',
             tags=("water_level_display", "clickable")
@@ -1001,14 +1045,11 @@ class WaterSystemGUI:
             tags=("tank_label", "clickable")
         )
         
-        # Draw tank valve indicator
-        tank_valve_color = '#0066cc' if self.valve_states["TANK_VALVE"] else '#ff3333'
-        tank_valve_text = "OPEN" if self.valve_states["TANK_VALVE"] else "CLOSED"
-        
-        canvas.create_rectangle(
+        # Tank valve indicator
+        self.scene['tank_valve'] = canvas.create_rectangle(
             tank_x + tank_width/2 - 25, tank_y + tank_height + 20,
             tank_x + tank_width/2 + 25, tank_y + tank_height + 50,
-            outline='#1a5a99', width=2, fill=tank_valve_color,
+            outline='#1a5a99', width=2,
             tags=("tank_valve", "clickable")
         )
         
@@ -1131,16 +1172,15 @@ class WaterSystemGUI:
             )
         
         # Draw Valve A
-        valve_a_color = '#0066cc' if self.valve_states["VALVE_A"] else '#ff3333'
         points = [
             valve_a_x, valve_a_y - 30,  # top
             valve_a_x + 30, valve_a_y,  # right
             valve_a_x, valve_a_y + 30,  # bottom
             valve_a_x - 30, valve_a_y   # left
         ]
-        canvas.create_polygon(
+        self.scene['valve_a'] = canvas.create_polygon(
             points,
-            outline='#1a5a99', width=3, fill=valve_a_color,
+            outline='#1a5a99', width=3,
             tags=("node_VALVE_A", "valve", "clickable")
         )
         
@@ -1172,15 +1212,12 @@ class WaterSystemGUI:
         self.node_areas = {}
         self.tap_areas = {}
         
-        # Draw all TAP nodes with appropriate colors
+        # Draw all TAP nodes (colored by update_scene)
         for tap_x, tap_y, tap_name in tap_positions:
-            # Determine tap color: RED if open, GREEN if closed
-            tap_color = '#ff3333' if self.tap_states[tap_name] else '#00cc66'
-            
-            canvas.create_rectangle(
+            self.scene['taps'][tap_name] = canvas.create_rectangle(
                 tap_x - 35, tap_y - 20,
                 tap_x + 35, tap_y + 20,
-                outline='#1a5a99', width=3, fill=tap_color,
+                outline='#1a5a99', width=3,
                 tags=(f"node_{tap_name}", "tap", "clickable")
             )
             
@@ -1245,6 +1282,9 @@ class WaterSystemGUI:
         for x1, y1, x2, y2, pipe_id, label in pipes:
             self.draw_pipe(x1, y1, x2, y2, pipe_id, label)
         
+        # Index taps and pipes so a click only checks the shapes near it
+        self.build_hit_index()
+        
         # Add legend
         self.add_legend()
         
@@ -1253,60 +1293,24 @@ class WaterSystemGUI:
     
     def draw_pipe(self, x1, y1, x2, y2, pipe_id, label):
         canvas = self.canvas
-        
-        # Determine pipe color based on water flow and leaks
-        if self.water_flow.get(pipe_id, False):
-            # Water is flowing through this pipe
-            if self.pipe_leaks[pipe_id]:
-                # Pipe has a leak and water is flowing - ACTIVE LEAK
-                color = '#ff3333'  # Red for active leak
-                leak_color = '#ff0000'  # Bright red for active leak indicator
-            else:
-                # Pipe is intact with water flow
-                color = '#0099ff'  # Light blue for normal water flow
-        else:
-            # No water flow
-            if self.pipe_leaks[pipe_id]:
-                # Pipe has leak but no water - INACTIVE LEAK
-                color = '#ff9900'  # Orange for inactive leak
-                leak_color = '#ff9900'  # Orange for inactive leak indicator
-            else:
-                # Normal pipe without water
-                color = '#cccccc'  # Gray for inactive pipe
-        
         width = 8
         
         # Draw the pipe
         pipe = canvas.create_line(
             x1, y1, x2, y2,
-            width=width, fill=color, capstyle=tk.ROUND,
+            width=width, capstyle=tk.ROUND,
             tags=(f"pipe_{pipe_id}", "pipe", "clickable")
         )
         
-        # Add leak indicator if pipe has a leak
-        if self.pipe_leaks[pipe_id]:
-            # Calculate midpoint for leak indicator
-            mid_x = (x1 + x2) / 2
-            mid_y = (y1 + y2) / 2
-            
-            # Determine leak indicator color and size based on activity
-            if self.active_leaks.get(pipe_id, False):
-                # Active leak (water flowing) - larger, brighter indicator
-                leak_size = 12
-                fill_color = '#ff6666'
-                outline_color = '#ff0000'
-            else:
-                # Inactive leak (no water flow) - smaller, dimmer indicator
-                leak_size = 8
-                fill_color = '#ffcc99'
-                outline_color = '#ff9900'
-            
-            canvas.create_oval(
-                mid_x - leak_size, mid_y - leak_size,
-                mid_x + leak_size, mid_y + leak_size,
-                outline=outline_color, width=2, fill=fill_color,
-                tags=(f"leak_{pipe_id}", "leak", "clickable")
-            )
+        # Leak indicator at the midpoint, hidden until the pipe has a leak
+        leak = canvas.create_oval(
+            0, 0, 0, 0,
+            width=2, state='hidden',
+            tags=(f"leak_{pipe_id}", "leak", "clickable")
+        )
+        
+        self.scene['pipes'][pipe_id] = pipe
+        self.scene['leaks'][pipe_id] = leak
         
         # Store pipe coordinates for click detection
         self.pipe_areas[pipe_id] = {
@@ -1316,6 +1320,79 @@ class WaterSystemGUI:
             'width': width
         }
     
+    def pipe_style(self, pipe_id):
+        """Line color and leak indicator (None or (size, fill, outline)) for a pipe"""
+        if self.water_flow.get(pipe_id, False):
+            # Water is flowing: red for an active leak, light blue otherwise
+            color = '#ff3333' if self.pipe_leaks[pipe_id] else '#0099ff'
+        else:
+            # No water flow: orange for an inactive leak, gray otherwise
+            color = '#ff9900' if self.pipe_leaks[pipe_id] else '#cccccc'
+        
+        if not self.pipe_leaks[pipe_id]:
+            return color, None
+        
+        if self.active_leaks.get(pipe_id, False):
+            # Active leak (water flowing) - larger, brighter indicator
+            return color, (12, '#ff6666', '#ff0000')
+        # Inactive leak (no water flow) - smaller, dimmer indicator
+        return color, (8, '#ffcc99', '#ff9900')
+    
+    def set_item(self, item, coords=None, **options):
+        """itemconfig/coords only the options that differ from what the item already shows"""
+        current = self.item_styles.setdefault(item, {})
+        
+        if coords is not None and current.get('coords') != coords:
+            self.canvas.coords(item, *coords)
+            current['coords'] = coords
+        
+        changed = {key: value for key, value in options.items() if current.get(key) != value}
+        if changed:
+            self.canvas.itemconfig(item, **changed)
+            current.update(changed)
+    
+    def update_scene(self):
+        scene = self.scene
+        
+        # Tank water height, color and percentage
+        tank_x, tank_y, tank_width, tank_height = scene['tank']
+        water_level = self.water_level_value.get()
+        water_y = tank_y + tank_height - tank_height * (water_level / 100)
+        self.set_item(scene['water'],
+                      coords=(tank_x, water_y, tank_x + tank_width, tank_y + tank_height),
+                      fill='#66b3ff' if water_level > 0 else '#cccccc')
+        self.set_item(scene['water_level_text'], text=f"{water_level}%")
+        
+        # Valves: blue when open, red when closed
+        self.set_item(scene['tank_valve'], fill='#0066cc' if self.valve_states["TANK_VALVE"] else '#ff3333')
+        self.set_item(scene['valve_a'], fill='#0066cc' if self.valve_states["VALVE_A"] else '#ff3333')
+        
+        # Taps: RED if open, GREEN if closed
+        for tap_name, item in scene['taps'].items():
+            self.set_item(item, fill='#ff3333' if self.tap_states[tap_name] else '#00cc66')
+        
+        for pipe_id, item in scene['pipes'].items():
+            color, leak = self.pipe_style(pipe_id)
+            self.set_item(item, fill=color)
+            
+            leak_item = scene['leaks'][pipe_id]
+            if leak is None:
+                self.set_item(leak_item, state='hidden')
+                continue
+            
+            leak_size, fill_color, outline_color = leak
+            area = self.pipe_areas[pipe_id]
+            mid_x = (area['x1'] + area['x2']) / 2
+            mid_y = (area['y1'] + area['y2']) / 2
+            self.set_item(leak_item,
+                          coords=(mid_x - leak_size, mid_y - leak_size, mid_x + leak_size, mid_y + leak_size),
+                          state='normal', fill=fill_color, outline=outline_color)
+        
+        # Firebase status in the legend
+        self.set_item(scene['firebase_status'], fill='#4CAF50' if self.firebase_initialized else '#FF9800')
+        self.set_item(scene['firebase_status_text'],
+                      text="Firebase Connected" if self.firebase_initialized else "Firebase: Offline Mode")
+    
     def add_legend(self):
         legend_x = self.canvas_width - 250
         legend_y = 50
@@ -1419,18 +1496,14 @@ class WaterSystemGUI:
             anchor='w'
         )
         
-        # Firebase status indicator
-        firebase_color = '#4CAF50' if self.firebase_initialized else '#FF9800'
-        firebase_text = "Firebase Connected" if self.firebase_initialized else "Firebase: Offline Mode"
-        
-        self.canvas.create_oval(
+        # Firebase status indicator (updated by update_scene)
+        self.scene['firebase_status'] = self.canvas.create_oval(
             legend_x + 10, legend_y + 175,
             legend_x + 30, legend_y + 195,
-            outline='#1a5a99', width=2, fill=firebase_color
+            outline='#1a5a99', width=2
         )
-        self.canvas.create_text(
+        self.scene['firebase_status_text'] = self.canvas.create_text(
             legend_x + 100, legend_y + 185,
-            text=firebase_text,
             font=('Helvetica', 10),
             fill='#333333',
             anchor='w'
@@ -1449,38 +1522,41 @@ class WaterSystemGUI:
                 bbox[3] + padding
             ))
     
+    def build_hit_index(self):
+        self.hit_index = SpatialIndex()
+        for tap_name, area in self.tap_areas.items():
+            self.hit_index.add_rect(tap_name, area['x'], area['y'], area['width'], area['height'])
+        for pipe_id, coords in self.pipe_areas.items():
+            self.hit_index.add_segment(pipe_id, coords['x1'], coords['y1'],
+                                       coords['x2'], coords['y2'], coords['width'] * 2)
+        self.hit_index.build()
+    
     def on_canvas_click(self, event):
         # Get the canvas coordinates considering scroll position
         canvas_x = self.canvas.canvasx(event.x)
         canvas_y = self.canvas.canvasy(event.y)
         
         # First check if a TAP was clicked
-        for tap_name, area in self.tap_areas.items():
-            if (abs(canvas_x - area['x']) <= area['width']/2 and 
-                abs(canvas_y - area['y']) <= area['height']/2):
-                # Toggle tap state
-                self.tap_states[tap_name] = not self.tap_states[tap_name]
-                self.calculate_water_flow()
-                self.draw_water_system()
-                
-                # Send tap states to Firebase
-                self.send_tap_states_to_firebase()
-                return
+        tap_name = self.hit_index.rect_at(canvas_x, canvas_y)
+        if tap_name is not None:
+            # Toggle tap state
+            self.tap_states[tap_name] = not self.tap_states[tap_name]
+            self.calculate_water_flow()
+            self.draw_water_system()
+            
+            self.schedule_publish()
+            return
         
         # Check if a pipe was clicked (for adding/removing leaks)
-        for pipe_id, coords in self.pipe_areas.items():
-            if self.point_near_line(canvas_x, canvas_y, 
-                                   coords['x1'], coords['y1'], 
-                                   coords['x2'], coords['y2'], 
-                                   coords['width'] * 2):
-                # Toggle leak state for this pipe
-                self.pipe_leaks[pipe_id] = not self.pipe_leaks[pipe_id]
-                self.calculate_water_flow()
-                self.draw_water_system()
-                
-                # Send leak states to Firebase
-                self.send_leak_states_to_firebase()
-                return
+        pipe_id = self.hit_index.segment_at(canvas_x, canvas_y)
+        if pipe_id is not None:
+            # Toggle leak state for this pipe
+            self.pipe_leaks[pipe_id] = not self.pipe_leaks[pipe_id]
+            self.calculate_water_flow()
+            self.draw_water_system()
+            
+            self.schedule_publish()
+            return
         
         # Check if tank valve was clicked
         tank_valve_x = 100 + 60  # tank_x + tank_width/2
@@ -1488,7 +1564,7 @@ class WaterSystemGUI:
         if (abs(canvas_x - tank_valve_x) <= 25 and 
             abs(canvas_y - tank_valve_y) <= 15):
             self.toggle_tank_valve()
-            # toggle_tank_valve() already calls send_valve_status_to_firebase()
+            # toggle_tank_valve() already schedules the Firebase update
             return
         
         # Check if valve A was clicked
@@ -1497,44 +1573,9 @@ class WaterSystemGUI:
         if (abs(canvas_x - valve_a_x) <= 30 and 
             abs(canvas_y - valve_a_y) <= 30):
             self.toggle_valve_a()
-            # toggle_valve_a() already calls send_valve_status_to_firebase()
+            # toggle_valve_a() already schedules the Firebase update
             return
     
-    def point_near_line(self, px, py, x1, y1, x2, y2, tolerance):
-        # Calculate distance from point to line segment
-        import math
-        
-        # Line vector
-        line_vec_x = x2 - x1
-        line_vec_y = y2 - y1
-        
-        # Point vector from line start
-        point_vec_x = px - x1
-        point_vec_y = py - y1
-        
-        # Length squared of line
-        line_len_sq = line_vec_x * line_vec_x + line_vec_y * line_vec_y
-        
-        # Dot product
-        dot = point_vec_x * line_vec_x + point_vec_y * line_vec_y
-        
-        # Calculate projection fraction
-        if line_len_sq != 0:
-            t = max(0, min(1, dot / line_len_sq))
-        else:
-            t = 0
-        
-        # Find closest point on line segment
-        closest_x = x1 + t * line_vec_x
-        closest_y = y1 + t * line_vec_y
-        
-        # Calculate distance from point to closest point on line
-        dist_x = px - closest_x
-        dist_y = py - closest_y
-        distance = math.sqrt(dist_x * dist_x + dist_y * dist_y)
-        
-        return distance <= tolerance
-    
     def toggle_tank_valve(self):
         self.valve_states["TANK_VALVE"] = not self.valve_states["TANK_VALVE"]
         
@@ -1548,10 +1589,8 @@ class WaterSystemGUI:
         self.calculate_water_flow()
         self.draw_water_system()
         
-        # Send update to Firebase
-        self.send_valve_status_to_firebase()
-        # Also send water flow status since it changed
-        self.send_water_flow_to_firebase()
+        # Valves and the resulting water flow go out as one tick
+        self.schedule_publish()
     
     def toggle_valve_a(self):
         self.valve_states["VALVE_A"] = not self.valve_states["VALVE_A"]
@@ -1566,66 +1605,8 @@ class WaterSystemGUI:
         self.calculate_water_flow()
         self.draw_water_system()
         
-        # Send update to Firebase
-        self.send_valve_status_to_firebase()
-        # Also send water flow status since it changed
-        self.send_water_flow_to_firebase()
-    
-    def send_valve_status_to_firebase(self):
-        """Send only valve status to Firebase"""
-        if not self.firebase_initialized:
-            return
-            
-        try:
-            valve_data = {
-                'TANK_VALVE': int(self.valve_states["TANK_VALVE"]),
-                'VALVE_A': int(self.valve_states["VALVE_A"])
-            }
-            
-            self.firebase_ref.child('valves').set(valve_data)
-            print(f"Valve status sent to Firebase: {valve_data}")
-            
-        except Exception as e:
-            print(f"Error sending valve status to Firebase: {e}")
-    
-    def send_tap_states_to_firebase(self):
-        """Send current tap states to Firebase"""
-        if not self.firebase_initialized:
-            return
-            
-        try:
-            taps_data = {tap: int(state) for tap, state in self.tap_states.items()}
-            self.firebase_ref.child('taps').set(taps_data)
-            print(f"Tap states sent to Firebase: {taps_data}")
-            
-        except Exception as e:
-            print(f"Error sending tap states to Firebase: {e}")
-    
-    def send_leak_states_to_firebase(self):
-        """Send current pipe leak states to Firebase"""
-        if not self.firebase_initialized:
-            return
-            
-        try:
-            leaks_data = {pipe: int(has_leak) for pipe, has_leak in self.pipe_leaks.items()}
-            self.firebase_ref.child('leaks').set(leaks_data)
-            print(f"Leak states sent to Firebase: {leaks_data}")
-            
-        except Exception as e:
-            print(f"Error sending leak states to Firebase: {e}")
-    
-    def send_water_flow_to_firebase(self):
-        """Send current water flow status to Firebase"""
-        if not self.firebase_initialized:
-            return
-            
-        try:
-            flow_data = {pipe: int(flow) for pipe, flow in self.water_flow.items()}
-            self.firebase_ref.child('water_flow').set(flow_data)
-            print(f"Water flow status sent to Firebase")
-            
-        except Exception as e:
-            print(f"Error sending water flow to Firebase: {e}")
+        # Valves and the resulting water flow go out as one tick
+        self.schedule_publish()
     
     def send_all_data_to_firebase(self):
         """Send all current data to Firebase"""
@@ -1634,31 +1615,8 @@ class WaterSystemGUI:
             return
             
         try:
-            # Calculate active leaks before sending
-            self.calculate_active_leaks()
-            
-            # Prepare data
-            data = {
-                'timestamp': datetime.now().isoformat(),
-                'sensors': {
-                    'pH': float(self.ph_value.get()),
-                    'turbidity': float(self.turbidity_value.get()),
-                    'salinity': float(self.salinity_value.get()),
-                    'flow': float(self.flow_value.get())
-                },
-                'water_level': int(self.water_level_value.get()),
-                'valves': {
-                    'TANK_VALVE': int(self.valve_states["TANK_VALVE"]),
-                    'VALVE_A': int(self.valve_states["VALVE_A"])
-                },
-                'taps': {tap: int(state) for tap, state in self.tap_states.items()},
-                'leaks': {pipe: int(has_leak) for pipe, has_leak in self.pipe_leaks.items()},
-                'active_leaks': {pipe: int(is_active) for pipe, is_active in self.active_leaks.items()},
-                'water_flow': {pipe: int(flow) for pipe, flow in self.water_flow.items()}
-            }
-            
-            # Send to Firebase
-            self.firebase_ref.set(data)
+            # Rewrite the whole tree rather than only what changed
+            self.publisher.submit(self.build_snapshot(), full=True)
             
             # Update status
             self.firebase_status_var.set("Firebase: Data Sent ✓")
@@ -1676,14 +1634,11 @@ class WaterSystemGUI:
     
     def check_leak_status(self):
         """Check and report ACTIVE leak status (only leaks with water flow)"""
-        # Calculate active leaks first
-        self.calculate_active_leaks()
-        
-        active_leak_count = sum(1 for is_active in self.active_leaks.values() if is_active)
-        total_leak_count = sum(1 for has_leak in self.pipe_leaks.values() if has_leak)
+        active_leak_count = self.active_leaks.count()
+        total_leak_count = self.pipe_leaks.count()
         
         if active_leak_count > 0:
-            active_leaking_pipes = [pipe for pipe, is_active in self.active_leaks.items() if is_active]
+            active_leaking_pipes = self.active_leaks.true_ids()
             message = f"Found {active_leak_count} ACTIVE leaks (water flowing):\n" + "\n".join(active_leaking_pipes)
             if total_leak_count > active_leak_count:
                 message += f"\n\nNote: {total_leak_count - active_leak_count} additional leaks detected but inactive (no water flow)"
@@ -1701,30 +1656,21 @@ class WaterSystemGUI:
     def detect_and_report_leaks(self):
         """Detect leaks and report to Firebase - only active leaks are reported"""
         try:
-            # Calculate active leaks first
-            self.calculate_active_leaks()
-            
-            active_leak_count = sum(1 for is_active in self.active_leaks.values() if is_active)
-            total_leak_count = sum(1 for has_leak in self.pipe_leaks.values() if has_leak)
+            active_leak_count = self.active_leaks.count()
+            total_leak_count = self.pipe_leaks.count()
             
+            # Leaking pipes split by whether water flows through them
+            inactive = self.pipe_leaks.values & ~self.water_flow.values
             leak_report = {
                 'timestamp': datetime.now().isoformat(),
                 'total_pipes': len(self.pipe_leaks),
                 'total_leaks': total_leak_count,
-                'active_leaks': [],
+                'active_leaks': self.active_leaks.true_ids(),
                 'active_leak_count': active_leak_count,
-                'inactive_leaks': [],
+                'inactive_leaks': [self.network.pipe_ids[i] for i in inactive.nonzero()[0]],
                 'inactive_leak_count': total_leak_count - active_leak_count
             }
             
-            # Find all pipes with leaks and categorize them
-            for pipe_id, has_leak in self.pipe_leaks.items():
-                if has_leak:
-                    if self.active_leaks.get(pipe_id, False):
-                        leak_report['active_leaks'].append(pipe_id)
-                    else:
-                        leak_report['inactive_leaks'].append(pipe_id)
-            
             # Send leak report to Firebase if connected
             if self.firebase_initialized:
                 self.firebase_ref.child('leak_report').set(leak_report)
@@ -1741,7 +1687,7 @@ class WaterSystemGUI:
         self.ph_display.config(text=f"{ph_value:.1f}")
         
         # Send sensor data to Firebase
-        self.send_sensor_data_to_firebase()
+        self.schedule_publish()
     
     def update_turbidity_display(self, value):
         # Update turbidity display with formatted value
@@ -1749,7 +1695,7 @@ class WaterSystemGUI:
         self.turb_display.config(text=f"{turb_value:.1f}")
         
         # Send sensor data to Firebase
-        self.send_sensor_data_to_firebase()
+        self.schedule_publish()
     
     def update_salinity_display(self, value):
         # Update salinity display with formatted value
@@ -1757,7 +1703,7 @@ class WaterSystemGUI:
         self.sal_display.config(text=f"{sal_value:.2f}")
         
         # Send sensor data to Firebase
-        self.send_sensor_data_to_firebase()
+        self.schedule_publish()
     
     def update_flow_display(self, value):
         # Update flow display with formatted value
@@ -1765,43 +1711,16 @@ class WaterSystemGUI:
         self.flow_display.config(text=f"{flow_value:.1f}")
         
         # Send sensor data to Firebase
-        self.send_sensor_data_to_firebase()
-    
-    def send_sensor_data_to_firebase(self):
-        """Send sensor data to Firebase"""
-        if not self.firebase_initialized:
-            return
-            
-        try:
-            sensor_data = {
-                'pH': float(self.ph_value.get()),
-                'turbidity': float(self.turbidity_value.get()),
-                'salinity': float(self.salinity_value.get()),
-                'flow': float(self.flow_value.get())
-            }
-            
-            self.firebase_ref.child('sensors').set(sensor_data)
-            print(f"Sensor data sent to Firebase: {sensor_data}")
-            
-        except Exception as e:
-            print(f"Error sending sensor data to Firebase: {e}")
+        self.schedule_publish()
     
     def update_water_level_display(self, value=None):
         # Update water level label
         water_level = self.water_level_value.get()
         self.water_level_label.config(text=f"{water_level}%")
         
-        # Recalculate water flow and redraw
+        # Recalculate water flow and redraw; the new level is published with the flow
         self.calculate_water_flow()
         self.draw_water_system()
-        
-        # Send water level to Firebase
-        if self.firebase_initialized:
-            try:
-                self.firebase_ref.child('water_level').set(water_level)
-                print(f"Water level sent to Firebase: {water_level}%")
-            except Exception as e:
-                print(f"Error sending water level to Firebase: {e}")
 
 def main():
     root = tk.Tk()
@@ -1815,6 +1734,10 @@ def main():
     root.bind("<Configure>", on_resize)
     
     root.mainloop()
+    
+    # Write the last tick before exiting
+    if app.publisher:
+        app.publisher.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""Bitset / run-length encoding of per-pipe and per-tap state for Firebase.
+
+Writes the format described in water-monitoring-dashboard/wire_format.py,
+which is also where it is decoded: an encoded family is
+{'encoding': 'bits' | 'rle', 'index': <version>, 'count': n, 'data': str}
+and the ids behind <version> are stored once at INDEX_ROOT/<version>.
+"""
+import base64
+import hashlib
+
+import numpy as np
+
+INDEX_ROOT = '/pipe_indexes'
+
+
+class WireIndex:
+    """Ordered id list of one family (pipes or taps) and its content-hash version"""
+
+    def __init__(self, ids):
+        self.ids = tuple(ids)
+        self.version = hashlib.sha1('\n'.join(self.ids).encode('utf-8')).hexdigest()[:12]
+
+    def encode(self, values):
+        """Encode a bool array in id order, picking the shorter of bits and rle"""
+        values = np.asarray(values, dtype=bool)
+
+        bits = np.packbits(values, bitorder='little').tobytes()
+        data, encoding = base64.b64encode(bits).decode('ascii'), 'bits'
+
+        # Run lengths from the positions where the value changes; runs start with 0
+        edges = np.flatnonzero(values[1:] != values[:-1]) + 1
+        runs = np.diff(np.concatenate(([0], edges, [len(values)]))).tolist()
+        if len(values) and values[0]:
+            runs.insert(0, 0)
+        rle = ','.join(map(str, runs))
+        if len(rle) < len(data):
+            data, encoding = rle, 'rle'
+
+        return {'encoding': encoding, 'index': self.version, 'count': len(values), 'data': data}
+
+    def publish(self, db):
+        """Store the id list where readers look it up; safe to repeat"""
+        db.reference(f"{INDEX_ROOT}/{self.version}").set(list(self.ids))
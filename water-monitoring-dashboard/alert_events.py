@@ -0,0 +1,396 @@
+"""Alert lifecycle as an append-only event log with materialized projections.
+
+Every change to alert or assignment state is recorded as one event
+
+    {'origin': <recording process>, 'seq': n, 'type': ..., 'at': <iso time>, ...}
+
+    created       'alert' (with its initial assignment), 'history': bool
+    assigned      'assignments' [{'id', 'mechanic_id', 'mechanic_name'}], 'status'
+    acknowledged  'ids', 'by'
+    resolved      'ids', 'by'
+    withdrawn     'id'  (dropped without touching history, e.g. simulated leaks)
+
+and applied to projections that the dashboard reads directly: active alerts
+by id, the history list, leak assignments and one queue per mechanic.
+Nothing else mutates alert dicts, and the same apply() runs for live changes
+and for replaying a log, so a store rebuilt from its events is identical to
+the one that wrote them. compact() folds the log into a snapshot of the
+projections (`base`); the store then keeps only the events recorded since.
+An attached journal compacts on its checkpoints, otherwise the store does
+so itself every `compact_every` events, so the log never grows unbounded.
+
+Several dashboard workers each record their own events, numbered per origin.
+A store remembers the last seq it applied from every origin (`clock`), so
+merge() takes exactly the events it has not seen yet: replicas exchange only
+new events, and a stale or repeated copy can never roll a store back.
+"""
+import bisect
+import os
+import threading
+import uuid
+from datetime import datetime
+
+# Work queue order: most severe first, then oldest first
+SEVERITY_RANK = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+
+def queue_key(alert):
+    """Sort key of an alert in a mechanic's queue (ISO timestamps sort by age)"""
+    return (SEVERITY_RANK.get(alert.get('severity'), len(SEVERITY_RANK)), alert.get('timestamp') or '', alert['id'])
+
+
+class MechanicQueue:
+    """One mechanic's open alerts, kept ordered by severity and age as they come and go.
+
+    Adding or removing an alert is a binary search in the sorted keys, so
+    reading the queue is O(own alerts) with no filtering or sorting. Iterating
+    yields alert ids in queue order. Not thread-safe on its own: AlertStore
+    changes and reads it under its lock.
+    """
+
+    def __init__(self):
+        self._keys = []  # Sorted queue_key() of every alert in the queue
+        self._alerts = {}  # Format: {alert_id: alert}
+
+    def add(self, alert):
+        self.remove(alert['id'])
+        bisect.insort(self._keys, queue_key(alert))
+        self._alerts[alert['id']] = alert
+
+    def remove(self, alert_id):
+        alert = self._alerts.get(alert_id)
+        if alert is not None:
+            del self._keys[bisect.bisect_left(self._keys, queue_key(alert))]
+            del self._alerts[alert_id]
+        return alert
+
+    def replace(self, alert):
+        """Swap in an updated copy of an alert already in the queue (same key)"""
+        self._alerts[alert['id']] = alert
+
+    def alerts(self):
+        return [self._alerts[key[-1]] for key in self._keys]
+
+    def __iter__(self):
+        return (key[-1] for key in self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, alert_id):
+        return alert_id in self._alerts
+
+
+class AlertStore:
+    """Alert event log and the projections derived from it.
+
+    Projections are plain dicts and lists: `active` {alert_id: alert} in
+    creation order, `history` (one record per incident), `assignments`
+    {alert_id: mechanic_id} and `queues` {mechanic_id: MechanicQueue}.
+    Lookups by id, counts and a mechanic's alerts are O(1) / O(own alerts)
+    instead of list scans. Other threads should use the read methods, which
+    copy under the lock. Alert dicts and history records are replaced, never
+    changed, once published, so a reader holding one always sees it whole.
+    """
+
+    def __init__(self, journal=None, on_record=None, compact_every=1000):
+        self._lock = threading.RLock()
+        self.base = None  # Snapshot the event log continues from
+        self.events = []
+        self.clock = {}  # Format: {origin: last seq applied}
+        self.journal = journal  # Receives every event applied here (see alert_journal.py)
+        self.on_record = on_record  # Called with each event recorded (not merged) here
+        self.compact_every = compact_every  # Events kept in memory when no journal compacts the store
+        self._origin = None
+        self._pid = None
+        self._reset_projections()
+
+    @property
+    def lock(self):
+        """Held while the store changes; hold it to keep it unchanged across several calls"""
+        return self._lock
+
+    @property
+    def origin(self):
+        """Id stamped on events recorded by this process (fresh after a fork)"""
+        if self._origin is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._origin = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+        return self._origin
+
+    @origin.setter
+    def origin(self, origin):
+        self._pid = os.getpid()
+        self._origin = origin
+
+    def _reset_projections(self):
+        self.active = {}  # Format: {alert_id: alert}
+        self.history = []
+        self.assignments = {}  # Format: {alert_id: mechanic_id}
+        self.queues = {}  # Format: {mechanic_id: MechanicQueue}
+        self.unacknowledged = 0
+        self._open_history = {}  # Format: {alert_id: index of its unresolved history record}
+        self._site_leaks = {}  # Format: {site: {alert_id: alert}}
+
+    # Reads
+
+    def get(self, alert_id):
+        return self.active.get(alert_id)
+
+    def active_alerts(self):
+        with self._lock:
+            return list(self.active.values())
+
+    def mechanic_alerts(self, mechanic_id):
+        """A mechanic's open alerts, most severe and then oldest first"""
+        with self._lock:
+            queue = self.queues.get(mechanic_id)
+            return queue.alerts() if queue is not None else []
+
+    def mechanic_alert_ids(self, mechanic_id):
+        with self._lock:
+            return list(self.queues.get(mechanic_id, ()))
+
+    def assigned_count(self, mechanic_id):
+        with self._lock:
+            return len(self.queues.get(mechanic_id, ()))
+
+    def site_leaks(self, site):
+        """Open leak alerts of a site (None for the default site)"""
+        with self._lock:
+            return list(self._site_leaks.get(site, {}).values())
+
+    # Commands: each records one event and returns what changed
+
+    def create(self, alert, history=True):
+        """Open an alert (replacing an active one with the same id)"""
+        self.record({'type': 'created', 'alert': dict(alert), 'history': history})
+        return self.active[alert['id']]
+
+    def assign(self, alert_id, mechanic_id, mechanic_name, status='reassigned'):
+        """Move an active alert to a mechanic; returns the previous mechanic"""
+        previous, _ = self.assign_many([(alert_id, mechanic_id, mechanic_name)], status)
+        return previous.get(alert_id)
+
+    def assign_many(self, assignments, status='reassigned'):
+        """Move several active alerts in one event, all or none.
+
+        `assignments` is a list of (alert_id, mechanic_id, mechanic_name);
+        alerts already with that mechanic are skipped. Returns ({alert_id:
+        previous mechanic_id} of the moved alerts, []), or ({}, [ids not
+        active]) without recording anything if any alert is not active.
+        """
+        with self._lock:
+            missing = [alert_id for alert_id, _, _ in assignments if alert_id not in self.active]
+            if missing:
+                return {}, missing
+            latest = {alert_id: (mechanic_id, mechanic_name)
+                      for alert_id, mechanic_id, mechanic_name in assignments}
+            moves = {alert_id: move for alert_id, move in latest.items()
+                     if self.assignments.get(alert_id) != move[0]}
+            if not moves:
+                return {}, []
+            previous = {alert_id: self.assignments.get(alert_id) for alert_id in moves}
+            self.record({'type': 'assigned', 'status': status, 'assignments': [
+                {'id': alert_id, 'mechanic_id': mechanic_id, 'mechanic_name': mechanic_name}
+                for alert_id, (mechanic_id, mechanic_name) in moves.items()]})
+        return previous, []
+
+    def acknowledge(self, alert_ids, acknowledged_by, mechanic_id=None):
+        """Acknowledge active alerts; with mechanic_id, only that mechanic's"""
+        with self._lock:
+            ids = [alert_id for alert_id in dict.fromkeys(alert_ids)
+                   if alert_id in self.active
+                   and (not mechanic_id or self.assignments.get(alert_id) == mechanic_id)]
+            if ids:
+                self.record({'type': 'acknowledged', 'ids': ids, 'by': acknowledged_by})
+        return ids
+
+    def resolve(self, alert_ids, resolved_by=None):
+        """Resolve active alerts; returns the removed alerts"""
+        with self._lock:
+            resolved = [self.active[alert_id] for alert_id in dict.fromkeys(alert_ids)
+                        if alert_id in self.active]
+            if resolved:
+                self.record({'type': 'resolved', 'ids': [alert['id'] for alert in resolved],
+                             'by': resolved_by})
+        return resolved
+
+    def withdraw(self, alert_id):
+        """Drop an active alert without resolving it in history; returns it or None"""
+        with self._lock:
+            alert = self.active.get(alert_id)
+            if alert is not None:
+                self.record({'type': 'withdrawn', 'id': alert_id})
+        return alert
+
+    def record(self, event):
+        """Stamp, log and apply an event"""
+        with self._lock:
+            event['origin'] = self.origin
+            event['seq'] = self.clock.get(event['origin'], 0) + 1
+            event.setdefault('at', datetime.now().isoformat())
+            self._append(event)
+            # Still under the lock, so replicas receive an origin's events in seq order
+            if self.on_record is not None:
+                self.on_record(event)
+        return event
+
+    def merge(self, events):
+        """Apply the events (recorded elsewhere) that this store has not seen; returns them"""
+        applied = []
+        with self._lock:
+            for event in events:
+                last_seq = self.clock.get(event.get('origin'), 0)
+                if event['seq'] <= last_seq:
+                    continue
+                if event['seq'] > last_seq + 1:
+                    print(f"Alert events {last_seq + 1}-{event['seq'] - 1} of {event.get('origin')} were missed")
+                self._append(event)
+                applied.append(event)
+        return applied
+
+    def _append(self, event):
+        self.events.append(event)
+        self.clock[event.get('origin')] = event['seq']
+        self.apply(event)
+        if self.journal is not None:
+            self.journal.append(self, event)  # Compacts the store on its checkpoints
+        elif len(self.events) >= self.compact_every:
+            self.compact()
+
+    # Projections
+
+    def apply(self, event):
+        kind = event['type']
+        if kind == 'created':
+            alert = dict(event['alert'])
+            self._remove(alert['id'])
+            self.active[alert['id']] = alert
+            if not alert.get('acknowledged'):
+                self.unacknowledged += 1
+            if alert['type'] == 'leak':
+                self._site_leaks.setdefault(alert.get('site'), {})[alert['id']] = alert
+            if alert.get('assigned_mechanic_id'):
+                self._enqueue(alert, alert['assigned_mechanic_id'])
+            if event.get('history', True):
+                self.history.append(dict(alert, resolved_at=None, resolved=False))
+                self._open_history[alert['id']] = len(self.history) - 1
+        elif kind == 'assigned':
+            for assignment in event['assignments']:
+                alert = self.active.get(assignment['id'])
+                if alert is None:
+                    continue
+                self._dequeue(alert['id'])
+                self._enqueue(alert, assignment['mechanic_id'])
+                self._update(alert['id'], assigned_mechanic_id=assignment['mechanic_id'],
+                             assigned_mechanic_name=assignment['mechanic_name'], status=event['status'])
+        elif kind == 'acknowledged':
+            for alert_id in event['ids']:
+                alert = self.active.get(alert_id)
+                if alert is None:
+                    continue
+                if not alert.get('acknowledged'):
+                    self.unacknowledged -= 1
+                self._update(alert_id, acknowledged=True, acknowledged_at=event['at'],
+                             acknowledged_by=event['by'])
+        elif kind == 'resolved':
+            for alert_id in event['ids']:
+                index = self._open_history.pop(alert_id, None)
+                if index is not None:
+                    record = dict(self.history[index], resolved=True, resolved_at=event['at'], status='resolved')
+                    if event.get('by'):
+                        record['resolved_by'] = event['by']
+                    self.history[index] = record
+                self._remove(alert_id)
+        elif kind == 'withdrawn':
+            self._remove(event['id'])
+
+    def _update(self, alert_id, **fields):
+        """Replace an active alert and its open history record with updated copies"""
+        alert = dict(self.active[alert_id], **fields)
+        self.active[alert_id] = alert
+        if alert['type'] == 'leak':
+            self._site_leaks[alert.get('site')][alert_id] = alert
+        mechanic_id = self.assignments.get(alert_id)
+        if mechanic_id is not None:
+            self.queues[mechanic_id].replace(alert)
+        index = self._open_history.get(alert_id)
+        if index is not None:
+            self.history[index] = dict(self.history[index], **fields)
+
+    def _enqueue(self, alert, mechanic_id):
+        self.assignments[alert['id']] = mechanic_id
+        self.queues.setdefault(mechanic_id, MechanicQueue()).add(alert)
+
+    def _dequeue(self, alert_id):
+        mechanic_id = self.assignments.pop(alert_id, None)
+        if mechanic_id is not None:
+            self.queues[mechanic_id].remove(alert_id)
+        return mechanic_id
+
+    def _remove(self, alert_id):
+        alert = self.active.pop(alert_id, None)
+        if alert is None:
+            return
+        if not alert.get('acknowledged'):
+            self.unacknowledged -= 1
+        if alert['type'] == 'leak':
+            self._site_leaks.get(alert.get('site'), {}).pop(alert_id, None)
+        self._dequeue(alert_id)
+
+    # Rebuilding
+
+    def snapshot(self):
+        """Projections as of `clock`, enough to restore() the store without its events"""
+        with self._lock:
+            return {
+                'clock': dict(self.clock),
+                'active': [dict(alert) for alert in self.active.values()],
+                'history': [dict(record) for record in self.history]
+            }
+
+    def compact(self):
+        """Fold the events into a new base snapshot and drop them"""
+        with self._lock:
+            self.base = self.snapshot()
+            self.events = []
+            return self.base
+
+    def restore(self, base, events=()):
+        """Rebuild every projection from a base snapshot (or None) and the events after it"""
+        with self._lock:
+            self.base = base
+            self.events = []
+            self.clock = dict(base['clock']) if base else {}
+            self._reset_projections()
+            if base:
+                self._load(base)
+            for event in events:
+                if event['seq'] > self.clock.get(event.get('origin'), 0):
+                    self.events.append(event)
+                    self.clock[event.get('origin')] = event['seq']
+                    self.apply(event)
+
+    def _load(self, base):
+        for record in base['history']:
+            self.history.append(dict(record))
+            if not record.get('resolved'):
+                self._open_history[record['id']] = len(self.history) - 1
+        for alert in base['active']:
+            alert = dict(alert)
+            self.active[alert['id']] = alert
+            if not alert.get('acknowledged'):
+                self.unacknowledged += 1
+            if alert['type'] == 'leak':
+                self._site_leaks.setdefault(alert.get('site'), {})[alert['id']] = alert
+            if alert.get('assigned_mechanic_id'):
+                self._enqueue(alert, alert['assigned_mechanic_id'])
+
+    def replay(self, events):
+        """Rebuild every projection from a complete log"""
+        self.restore(None, events)
+
+    def clear(self):
+        with self._lock:
+            self.restore(None)
@@ -0,0 +1,156 @@
+import time
+
+# Debounce states for a single alert key
+INACTIVE = 'inactive'
+PENDING_ENTER = 'pending_enter'
+ACTIVE = 'active'
+PENDING_EXIT = 'pending_exit'
+
+
+class AlertStateMachine:
+    """Per-key debounce state machine with separate enter and exit hold times.
+
+    A key only becomes active once its raw condition has stayed true for
+    `enter_hold` seconds, and only clears once the condition has stayed false
+    for `exit_hold` seconds. A pipe flickering between 0 and 1 therefore stays
+    a single incident instead of opening and resolving an alert every tick.
+    """
+
+    def __init__(self, enter_hold=0.0, exit_hold=0.0, clock=time.monotonic):
+        self.enter_hold = enter_hold
+        self.exit_hold = exit_hold
+        self.clock = clock
+        self._states = {}  # Format: {key: (state, since)}
+
+    def update(self, key, condition, now=None):
+        """Feed the raw condition for a key, return 'enter', 'exit' or None"""
+        if now is None:
+            now = self.clock()
+
+        state, since = self._states.get(key, (INACTIVE, now))
+
+        if state == INACTIVE:
+            if condition:
+                state, since = PENDING_ENTER, now
+        elif state == PENDING_ENTER:
+            if not condition:
+                state, since = INACTIVE, now
+        elif state == ACTIVE:
+            if not condition:
+                state, since = PENDING_EXIT, now
+        elif state == PENDING_EXIT:
+            if condition:
+                # Condition came back before the exit hold expired
+                state, since = ACTIVE, now
+
+        transition = None
+        if state == PENDING_ENTER and now - since >= self.enter_hold:
+            state, since = ACTIVE, now
+            transition = 'enter'
+        elif state == PENDING_EXIT and now - since >= self.exit_hold:
+            state, since = INACTIVE, now
+            transition = 'exit'
+
+        if state == INACTIVE:
+            self._states.pop(key, None)
+        else:
+            self._states[key] = (state, since)
+
+        return transition
+
+    def is_active(self, key):
+        """True while the key is active, including its exit hold"""
+        state, _ = self._states.get(key, (INACTIVE, None))
+        return state in (ACTIVE, PENDING_EXIT)
+
+    def state(self, key):
+        """Current debounce state name for a key"""
+        return self._states.get(key, (INACTIVE, None))[0]
+
+    def keys(self):
+        """Keys that are not inactive"""
+        return list(self._states)
+
+    def activate(self, key, now=None):
+        """Mark a key active without an enter hold (e.g. an alert restored after a restart)"""
+        self._states[key] = (ACTIVE, self.clock() if now is None else now)
+
+    def reset(self, key=None):
+        """Forget one key (or every key) so it starts from inactive"""
+        if key is None:
+            self._states.clear()
+        else:
+            self._states.pop(key, None)
+
+
+class ThresholdHysteresis(AlertStateMachine):
+    """Debounced 'value below threshold' alert with separate enter/exit levels.
+
+    The alert enters once the value drops below `enter_below` and only exits
+    once it has climbed back to `exit_at` or above, so a reading hovering
+    right at the threshold does not flap.
+    """
+
+    def __init__(self, enter_below, exit_at, enter_hold=0.0, exit_hold=0.0, clock=time.monotonic):
+        super().__init__(enter_hold=enter_hold, exit_hold=exit_hold, clock=clock)
+        self.enter_below = enter_below
+        self.exit_at = max(exit_at, enter_below)
+
+    def update_value(self, key, value, now=None):
+        """Feed a raw reading for a key, return 'enter', 'exit' or None"""
+        if self.state(key) in (ACTIVE, PENDING_EXIT):
+            condition = value < self.exit_at
+        else:
+            condition = value < self.enter_below
+        return self.update(key, condition, now)
+
+
+class SiteAlertEvaluator:
+    """Debounced alert conditions for one `/water_system`-shaped site snapshot.
+
+    Holds the leak and low-water state machines for a single site and turns a
+    raw snapshot into the set of alerts that should currently be open. It has
+    no dependency on the dashboard globals, so shard worker processes can run
+    it next to the data and send back only the result.
+    """
+
+    def __init__(self, enter_hold=0.0, exit_hold=0.0, low_water_enter_level=20, low_water_exit_level=25):
+        self.leak_states = AlertStateMachine(enter_hold=enter_hold, exit_hold=exit_hold)
+        self.water_level_states = ThresholdHysteresis(enter_below=low_water_enter_level,
+                                                      exit_at=low_water_exit_level,
+                                                      enter_hold=enter_hold,
+                                                      exit_hold=exit_hold)
+
+    def restore(self, active_pipe_ids, low_water_level=False, now=None):
+        """Start from alerts that are already open instead of from nothing"""
+        for pipe_id in active_pipe_ids:
+            self.leak_states.activate(f"leak_{pipe_id}", now)
+        if low_water_level:
+            self.water_level_states.activate('low_water_level', now)
+
+    def evaluate(self, system_data, now=None):
+        """Return {'active_leaks': list or None, 'low_water_level': bool, 'water_level': value}
+
+        Active leaks are listed in snapshot order, so alerts opened in the same
+        tick are created and assigned in the same order by every process.
+        """
+        active_leaks = None
+        if 'active_leaks' in system_data:
+            active_leaks = []
+            conditions = {f"leak_{pipe_id}": status == 1 for pipe_id, status in system_data['active_leaks'].items()}
+            # A pipe missing from the snapshot counts as not leaking, so it still goes through exit_hold
+            for leak_id in self.leak_states.keys():
+                conditions.setdefault(leak_id, False)
+            for leak_id, condition in conditions.items():
+                self.leak_states.update(leak_id, condition, now)
+                if self.leak_states.is_active(leak_id):
+                    active_leaks.append(leak_id[len('leak_'):])
+
+        water_level = system_data.get('water_level', 0)
+        self.water_level_states.update_value('low_water_level', water_level, now)
+
+        return {
+            'active_leaks': active_leaks,
+            'low_water_level': self.water_level_states.is_active('low_water_level'),
+            'water_level': water_level
+        }
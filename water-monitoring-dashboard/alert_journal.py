@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+
+SNAPSHOT_FILE = 'snapshot.json'
+WAL_FILE = 'wal.jsonl'
+
+# Reads of a snapshot that is replaced while the WAL is read are retried this often
+LOAD_ATTEMPTS = 3
+
+
+class AlertJournal:
+    """Persists an AlertStore as a compact snapshot plus a write-ahead log.
+
+    Every event the store applies is appended to WAL_FILE (one JSON line,
+    flushed before the change is broadcast). After `snapshot_every` events
+    the store is compacted: its projections are written to SNAPSHOT_FILE
+    (temp file + rename, so a crash leaves the old one intact) and the WAL
+    is truncated. Loading reads the snapshot and applies only WAL events
+    newer than it, so a leftover WAL from a crash between the two steps is
+    harmless, and a line torn by a crash is skipped.
+    """
+
+    def __init__(self, directory, snapshot_every=1000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.wal_path = os.path.join(directory, WAL_FILE)
+        self._lock = threading.Lock()
+        self._wal = None
+
+    def load(self):
+        """Return (base snapshot or None, WAL events after it)"""
+        # The leader may checkpoint (new snapshot, emptied WAL) while another
+        # worker reads; read again if the snapshot was replaced underneath us
+        for _ in range(LOAD_ATTEMPTS):
+            snapshot_id = self._snapshot_id()
+            base, events = self._read()
+            if self._snapshot_id() == snapshot_id:
+                break
+        return base, events
+
+    def _snapshot_id(self):
+        try:
+            stat = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read(self):
+        base = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                base = json.load(f)
+        clock = base['clock'] if base else {}
+
+        events = []
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Torn by a crash; writers after it started on a new line
+                        print(f"Ignoring torn alert WAL entry in {self.wal_path}")
+                        continue
+                    if event['seq'] > clock.get(event.get('origin'), 0):
+                        events.append(event)
+        return base, events
+
+    def restore(self, store):
+        """Load the persisted state into a store; returns the number of active alerts"""
+        start = time.perf_counter()
+        base, events = self.load()
+        store.restore(base, events)
+        if base or events:
+            print(f"Restored {len(store.active)} active alerts ({len(store.history)} in history) "
+                  f"from {self.directory} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return len(store.active)
+
+    def append(self, store, event):
+        """Log one applied event; compacts the store every `snapshot_every` events"""
+        with self._lock:
+            if self._wal is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._wal = open(self.wal_path, 'a', encoding='utf-8')
+                if self._wal.tell() and not self._ends_with_newline():
+                    self._wal.write('\n')  # Never glue an event onto a torn line
+            self._wal.write(json.dumps(event, separators=(',', ':')) + '\n')
+            self._wal.flush()
+        if len(store.events) >= self.snapshot_every:
+            self.checkpoint(store)
+
+    def _ends_with_newline(self):
+        with open(self.wal_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def checkpoint(self, store):
+        """Write the store's compacted state as the snapshot and start an empty WAL"""
+        # The store stays locked until the WAL is swapped: an event applied in
+        # between would be in neither the snapshot nor the new WAL
+        with store.lock, self._lock:
+            base = store.compact()
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(base, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            if self._wal is not None:
+                self._wal.close()
+            self._wal = open(self.wal_path, 'w', encoding='utf-8')
+
+    def close(self):
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
@@ -2,84 +2,111 @@
 
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 import json
 from datetime import datetime
-from firebase_config import initialize_firebase, get_system_data, get_firebase_ref
+import firebase_config
+from firebase_config import ensure_firebase
+from alert_hysteresis import SiteAlertEvaluator
+from site_sharding import ShardedMonitor
+from credential_store import CredentialStore, DEFAULT_CREDENTIALS_FILE
+from employees import UserRole, ADMIN_CREDENTIALS, MAINTENANCE_EMPLOYEES
+import metrics
+from tracing import tracer
+from feed_recorder import FeedRecorder
+from sse_mailbox import ClientMailbox, ReplayLog
+from compression import choose_encoding, compress_body, StreamCompressor
+from state_bus import create_state_bus, LeaderElection
+from metrics import (GET_SYSTEM_DATA_SECONDS, MONITOR_TICK_SECONDS, BROADCAST_SECONDS,
+                     SSE_QUEUE_DEPTH, SSE_DROPPED_TOTAL, SSE_COALESCED_TOTAL,
+                     SSE_CONNECTIONS, SSE_CONNECTIONS_TOTAL, SNAPSHOT_HELD_TOTAL, SNAPSHOT_SKIPPED_TOTAL)
+from snapshot_consistency import SnapshotGate
+from alert_events import AlertStore
+from alert_journal import AlertJournal
 import os
+import sys
 import threading
 import time
-import queue
-import hashlib
 from collections import defaultdict
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 
-# Initialize Firebase
-firebase_initialized = initialize_firebase()
+# Firebase connects at import by default; with FIREBASE_DEFERRED_INIT=1 it
+# connects (and the monitor starts) on the first request or from a server hook
+FIREBASE_DEFERRED_INIT = os.environ.get('FIREBASE_DEFERRED_INIT', '0') == '1'
+firebase_initialized = False
 
 # Flask-Login setup
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-# Store active alerts in memory
-active_alerts = []
-alert_history = []
+# Snapshot + write-ahead log of the alert store, restored on startup ('' disables)
+ALERT_STATE_DIR = os.environ.get('ALERT_STATE_DIR',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alert_state'))
+ALERT_SNAPSHOT_EVERY = int(os.environ.get('ALERT_SNAPSHOT_EVERY', 1000))
 
-# Track leak assignments to mechanics
-leak_assignments = {}  # Format: {leak_id: mechanic_id}
-mechanic_assigned_leaks = defaultdict(list)  # Format: {mechanic_id: [leak_id1, leak_id2]}
+# Alert lifecycle events; active alerts, history and mechanic assignments are projections of them
+alert_store = AlertStore(compact_every=ALERT_SNAPSHOT_EVERY)
+alert_journal = AlertJournal(ALERT_STATE_DIR, ALERT_SNAPSHOT_EVERY) if ALERT_STATE_DIR else None
 
-# SSE clients management
+# SSE clients management (one ClientMailbox per connection)
 sse_clients = []
 sse_lock = threading.Lock()
+SSE_MAX_PENDING = int(os.environ.get('SSE_MAX_PENDING', 100))
 
-# User roles
-class UserRole:
-    ADMIN = 'admin'
-    MECHANIC = 'mechanic'
-
-# Predefined admin credentials
-ADMIN_CREDENTIALS = {
-    'username': 'admin',
-    'password': generate_password_hash('WaterMonitor2024!'),
-    'role': UserRole.ADMIN,
-    'name': 'Administrator'
-}
+# Recent broadcasts, replayed to clients that reconnect with Last-Event-ID
+SSE_REPLAY_SIZE = int(os.environ.get('SSE_REPLAY_SIZE', 1000))
+sse_replay_log = ReplayLog(SSE_REPLAY_SIZE)
 
-# Predefined maintenance employees (in production, use database)
-MAINTENANCE_EMPLOYEES = {
-    'M001': {
-        'id': 'M001',
-        'password': generate_password_hash('mechanic001'),  # Default password
-        'role': UserRole.MECHANIC,
-        'name': 'John Smith',
-        'phone': '+1-555-0101',
-        'specialization': 'Pipe Leaks',
-        'assigned_leaks': []
-    },
-    'M002': {
-        'id': 'M002',
-        'password': generate_password_hash('mechanic002'),
-        'role': UserRole.MECHANIC,
-        'name': 'Jane Doe',
-        'phone': '+1-555-0102',
-        'specialization': 'Valve Maintenance',
-        'assigned_leaks': []
-    },
-    'M003': {
-        'id': 'M003',
-        'password': generate_password_hash('mechanic003'),
-        'role': UserRole.MECHANIC,
-        'name': 'Robert Johnson',
-        'phone': '+1-555-0103',
-        'specialization': 'Sensor Calibration',
-        'assigned_leaks': []
-    }
+# JSON responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 500))
+
+# /metrics is served only with a scrape token, or when explicitly made public
+# (e.g. when the app port is reachable from the internal network only)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC', '0') == '1'
+
+# Latest snapshot per site reported by the sharded monitor
+site_snapshots = {}
+
+# Alert debouncing: hold times in seconds before an alert opens/clears
+ALERT_ENTER_HOLD = float(os.environ.get('ALERT_ENTER_HOLD', 0))
+ALERT_EXIT_HOLD = float(os.environ.get('ALERT_EXIT_HOLD', 10))
+LOW_WATER_ENTER_LEVEL = float(os.environ.get('LOW_WATER_ENTER_LEVEL', 20))
+LOW_WATER_EXIT_LEVEL = float(os.environ.get('LOW_WATER_EXIT_LEVEL', 25))
+
+# Evaluator settings shared by the in-process monitor and shard workers
+ALERT_EVALUATOR_CONFIG = {
+    'enter_hold': ALERT_ENTER_HOLD,
+    'exit_hold': ALERT_EXIT_HOLD,
+    'low_water_enter_level': LOW_WATER_ENTER_LEVEL,
+    'low_water_exit_level': LOW_WATER_EXIT_LEVEL
 }
 
+# Sites to monitor: comma-separated database roots, one per site
+DEFAULT_SITE = '/water_system'
+MONITOR_SITES = [site.strip() for site in os.environ.get('MONITOR_SITES', DEFAULT_SITE).split(',') if site.strip()]
+MONITOR_WORKERS = int(os.environ.get('MONITOR_WORKERS', 0)) or None  # None = one per CPU core
+
+# Longest a monitor tick waits for a consistent snapshot before skipping (see snapshot_consistency.py)
+SNAPSHOT_MAX_WAIT = float(os.environ.get('SNAPSHOT_MAX_WAIT', 0.5))
+
+# Record every fetched snapshot to this file (gzip JSON lines) when set
+FEED_RECORD_PATH = os.environ.get('FEED_RECORD_PATH')
+
+# Shared bus between worker processes (see state_bus.py); only the elected
+# leader runs the monitor, broadcasts and alert state reach every worker
+state_bus = create_state_bus(os.environ.get('STATE_BUS_URL', 'local'))
+
+def get_system_data(site=DEFAULT_SITE):
+    """Fetch a site snapshot from Firebase, recording the fetch latency"""
+    with GET_SYSTEM_DATA_SECONDS.time():
+        return firebase_config.get_system_data(site)
+
+# Pre-hashed passwords, loaded on first login (see credential_store.py)
+credential_store = CredentialStore(os.environ.get('CREDENTIALS_FILE', DEFAULT_CREDENTIALS_FILE))
+
 # Valve and pipe name mappings
 VALVE_NAMES = {
     "TANK_VALVE": "Main Supply Valve",
@@ -112,6 +139,15 @@ TAP_NAMES = {
     "TAP5": "Emergency Supply"
 }
 
+LEAK_ALERT_TITLE = "🚨 ACTIVE LEAK DETECTED"
+
+# Reverse lookups for compact payloads, keyed by the processed-data field
+IDS_BY_NAME = {
+    'valves': {name: valve_id for valve_id, name in VALVE_NAMES.items()},
+    'taps': {name: tap_id for tap_id, name in TAP_NAMES.items()},
+    'leaks': {name: pipe_id for pipe_id, name in PIPE_NAMES.items()}
+}
+
 # User class for Flask-Login with role support
 class User(UserMixin):
     def __init__(self, id, role, name):
@@ -148,7 +184,7 @@ def get_available_mechanic():
     available_mechanics = []
     
     for mechanic_id in MAINTENANCE_EMPLOYEES:
-        assigned_count = len(mechanic_assigned_leaks.get(mechanic_id, []))
+        assigned_count = alert_store.assigned_count(mechanic_id)
         if assigned_count < min_leaks:
             min_leaks = assigned_count
             available_mechanics = [mechanic_id]
@@ -162,194 +198,278 @@ def get_available_mechanic():
     return None
 
 def assign_leak_to_mechanic(leak_id, pipe_name):
-    """Assign a leak to a mechanic"""
+    """Pick the mechanic for a new leak; the assignment is recorded with the alert's created event"""
     mechanic_id = get_available_mechanic()
     
     if mechanic_id:
-        leak_assignments[leak_id] = mechanic_id
-        mechanic_assigned_leaks[mechanic_id].append(leak_id)
-        
-        # Update employee record
-        if leak_id not in MAINTENANCE_EMPLOYEES[mechanic_id]['assigned_leaks']:
-            MAINTENANCE_EMPLOYEES[mechanic_id]['assigned_leaks'].append(leak_id)
-        
         print(f"Leak '{pipe_name}' assigned to mechanic {mechanic_id} ({MAINTENANCE_EMPLOYEES[mechanic_id]['name']})")
         return mechanic_id
     
     return None
 
-def unassign_leak(leak_id):
-    """Remove leak assignment"""
-    if leak_id in leak_assignments:
-        mechanic_id = leak_assignments[leak_id]
-        
-        # Remove from mechanic's assigned leaks
-        if leak_id in mechanic_assigned_leaks[mechanic_id]:
-            mechanic_assigned_leaks[mechanic_id].remove(leak_id)
-        
-        # Remove from employee record
-        if leak_id in MAINTENANCE_EMPLOYEES[mechanic_id]['assigned_leaks']:
-            MAINTENANCE_EMPLOYEES[mechanic_id]['assigned_leaks'].remove(leak_id)
-        
-        # Remove from leak assignments
-        del leak_assignments[leak_id]
-        
-        return mechanic_id
-    return None
-
 def get_assigned_leaks_for_mechanic(mechanic_id):
-    """Get all leaks assigned to a specific mechanic"""
-    if mechanic_id not in mechanic_assigned_leaks:
-        return []
-    
-    assigned_leak_ids = mechanic_assigned_leaks[mechanic_id]
-    mechanic_leaks = []
-    
-    for alert in active_alerts:
-        if alert['id'] in assigned_leak_ids:
-            mechanic_leaks.append(alert)
-    
-    return mechanic_leaks
+    """Get all leaks assigned to a specific mechanic, most severe and then oldest first"""
+    return alert_store.mechanic_alerts(mechanic_id)
+
+def acknowledge_alerts(alert_ids, acknowledged_by, mechanic_id=None):
+    """Acknowledge alerts in one event; mechanics may only acknowledge their own"""
+    return alert_store.acknowledge(alert_ids, acknowledged_by, mechanic_id)
+
+def reassign_leak(alert, mechanic_id):
+    """Move an active leak alert to another mechanic; returns the previous mechanic"""
+    return alert_store.assign(alert['id'], mechanic_id, MAINTENANCE_EMPLOYEES[mechanic_id]['name'])
+
+def seed_evaluator(site, evaluator):
+    """Start a site's debouncing from its open alerts, so restored alerts are not resolved and reopened"""
+    pipe_ids, low_water_level = restored_alert_state(site)
+    evaluator.restore(pipe_ids, low_water_level)
+    return evaluator
+
+def restored_alert_state(site):
+    """(leaking pipe ids, low water alert open) of a site's active alerts"""
+    pipe_ids = [alert['pipe_id'] for alert in alert_store.site_leaks(site_label(site))]
+    return pipe_ids, alert_store.get(site_alert_id(site, "low_water_level")) is not None
+
+def publish_alert_event(event):
+    """Send an alert event recorded in this worker to the other workers"""
+    state_bus.publish('alert_events', event)
+
+def handle_bus_alert_event(event):
+    """Alert event recorded by another worker; ones already applied here are ignored"""
+    alert_store.merge([event])
+
+def handle_bus_broadcast(message):
+    """Broadcast published by another worker: fan it out to this worker's clients"""
+    deliver_to_clients(message['data'])
+
+if state_bus.shared:
+    alert_store.on_record = publish_alert_event
+state_bus.subscribe('alert_events', handle_bus_alert_event)
+state_bus.subscribe('broadcast', handle_bus_broadcast)
 
 def broadcast_update(data):
-    """Broadcast update to all connected SSE clients"""
-    with sse_lock:
-        disconnected = []
-        for client_queue in sse_clients:
-            try:
-                client_queue.put(data, block=False)
-            except queue.Full:
-                disconnected.append(client_queue)
+    """Broadcast update to all connected SSE clients (on every worker)"""
+    tracer.mark(data.get('trace_id'), 'enqueue')
+    deliver_to_clients(data)
+    
+    # Alert state travels separately as events, published ahead of the broadcast that shows it
+    if state_bus.shared:
+        state_bus.publish('broadcast', {'data': data})
+
+def deliver_to_clients(data):
+    """Fan a message out to this worker's SSE clients"""
+    with BROADCAST_SECONDS.time(), sse_lock:
+        event_id = sse_replay_log.append(data)
         
-        # Remove disconnected clients
-        for client in disconnected:
-            sse_clients.remove(client)
+        # Mailboxes never block: slow clients get coalesced state, not a disconnect
+        for mailbox in sse_clients:
+            SSE_QUEUE_DEPTH.observe(mailbox.qsize())
+            outcome = mailbox.put(data, event_id)
+            if outcome == 'coalesced':
+                SSE_COALESCED_TOTAL.inc()
+            elif outcome == 'dropped':
+                SSE_DROPPED_TOTAL.inc()
 
-def broadcast_to_mechanic(mechanic_id, data):
+def broadcast_to_mechanic(mechanic_id, data, trace_id=None):
     """Send update to specific mechanic (if they're connected)"""
     # This is a simplified version - in production, you'd track which client is which mechanic
     # For now, we'll broadcast to all and let the client-side filter
-    broadcast_update({
+    message = {
         'type': 'mechanic_update',
         'mechanic_id': mechanic_id,
         'data': data
-    })
+    }
+    if trace_id:
+        message['trace_id'] = trace_id
+    broadcast_update(message)
 
-def monitor_leaks():
-    """Background thread to monitor for leaks and update alerts"""
-    prev_system_data = {}
-    mechanic_index = 0  # For round-robin assignment
+def site_label(site):
+    """Short name for a site root, None for the default site"""
+    if not site or site == DEFAULT_SITE:
+        return None
+    return site.strip('/')
+
+def site_alert_id(site, alert_id):
+    """Scope an alert id to its site (alerts of the default site keep plain ids)"""
+    label = site_label(site)
+    return f"{label}:{alert_id}" if label else alert_id
+
+def resolve_active_alert(alert_id):
+    """Resolve an active alert into history and release its mechanic"""
+    resolved = alert_store.resolve([alert_id])
+    if not resolved:
+        return False
     
-    while True:
-        try:
-            system_data = get_system_data()
-            data_changed = False
+    existing_alert = resolved[0]
+    if existing_alert['type'] == 'leak':
+        print(f"Leak resolved: {existing_alert['pipe_name']}")
+    
+    # Notify the mechanic it was assigned to
+    mechanic_id = existing_alert.get('assigned_mechanic_id')
+    if mechanic_id:
+        broadcast_to_mechanic(mechanic_id, {
+            'type': 'assignment_resolved',
+            'leak_id': alert_id
+        })
+    
+    return True
+
+def check_site_leaks(site, active_leaks, trace_id=None):
+    """Open alerts for newly active leaks of a site and resolve cleared ones"""
+    if active_leaks is None:
+        # Snapshot had no active_leaks subtree; leave existing alerts alone
+        return False
+    
+    data_changed = False
+    site_name = site_label(site)
+    
+    for pipe_id in active_leaks:
+        leak_id = site_alert_id(site, f"leak_{pipe_id}")
+        
+        # Check if this leak is already in active alerts
+        if alert_store.get(leak_id) is None:
+            pipe_name = PIPE_NAMES.get(pipe_id, pipe_id)
             
-            if 'active_leaks' in system_data:
-                for pipe_id, status in system_data['active_leaks'].items():
-                    if status == 1:  # Active leak
-                        pipe_name = PIPE_NAMES.get(pipe_id, pipe_id)
-                        leak_id = f"leak_{pipe_id}"
-                        
-                        # Check if this leak is already in active alerts
-                        existing_alert = next((a for a in active_alerts if a['id'] == leak_id), None)
-                        
-                        if not existing_alert:
-                            # Assign leak to a mechanic
-                            mechanic_id = assign_leak_to_mechanic(leak_id, pipe_name)
-                            mechanic_name = MAINTENANCE_EMPLOYEES[mechanic_id]['name'] if mechanic_id else "Unassigned"
-                            
-                            # Create new alert
-                            alert = {
-                                'id': leak_id,
-                                'type': 'leak',
-                                'title': f"🚨 ACTIVE LEAK DETECTED",
-                                'message': f"Leak detected in: {pipe_name}",
-                                'pipe_id': pipe_id,
-                                'pipe_name': pipe_name,
-                                'timestamp': datetime.now().isoformat(),
-                                'severity': 'high',
-                                'acknowledged': False,
-                                'assigned_mechanic_id': mechanic_id,
-                                'assigned_mechanic_name': mechanic_name,
-                                'status': 'assigned' if mechanic_id else 'unassigned'
-                            }
-                            active_alerts.append(alert)
-                            
-                            # Add to history
-                            alert_history.append({
-                                **alert,
-                                'resolved_at': None,
-                                'resolved': False
-                            })
-                            
-                            print(f"New leak alert: {pipe_name} assigned to {mechanic_name}")
-                            data_changed = True
-                            
-                            # Notify assigned mechanic
-                            if mechanic_id:
-                                broadcast_to_mechanic(mechanic_id, {
-                                    'type': 'new_assignment',
-                                    'alert': alert
-                                })
-                    else:
-                        # If leak is resolved, move from active to history
-                        leak_id = f"leak_{pipe_id}"
-                        existing_alert = next((a for a in active_alerts if a['id'] == leak_id), None)
-                        
-                        if existing_alert:
-                            # Get assigned mechanic before removing
-                            mechanic_id = existing_alert.get('assigned_mechanic_id')
-                            
-                            # Move to history as resolved
-                            active_alerts.remove(existing_alert)
-                            for history_alert in alert_history:
-                                if history_alert['id'] == leak_id and not history_alert.get('resolved'):
-                                    history_alert['resolved'] = True
-                                    history_alert['resolved_at'] = datetime.now().isoformat()
-                                    history_alert['status'] = 'resolved'
-                                    print(f"Leak resolved: {existing_alert['pipe_name']}")
-                            
-                            # Unassign the leak
-                            if mechanic_id:
-                                unassign_leak(leak_id)
-                                # Notify mechanic
-                                broadcast_to_mechanic(mechanic_id, {
-                                    'type': 'assignment_resolved',
-                                    'leak_id': leak_id
-                                })
-                            
-                            data_changed = True
+            # Assign leak to a mechanic
+            mechanic_id = assign_leak_to_mechanic(leak_id, pipe_name)
+            mechanic_name = MAINTENANCE_EMPLOYEES[mechanic_id]['name'] if mechanic_id else "Unassigned"
             
-            # Check for other system anomalies
-            anomaly_changed = check_system_anomalies(system_data)
+            # Create new alert
+            alert = {
+                'id': leak_id,
+                'type': 'leak',
+                'title': LEAK_ALERT_TITLE,
+                'message': f"Leak detected in: {pipe_name}",
+                'pipe_id': pipe_id,
+                'pipe_name': pipe_name,
+                'timestamp': datetime.now().isoformat(),
+                'severity': 'high',
+                'acknowledged': False,
+                'assigned_mechanic_id': mechanic_id,
+                'assigned_mechanic_name': mechanic_name,
+                'status': 'assigned' if mechanic_id else 'unassigned'
+            }
+            if site_name:
+                alert['site'] = site_name
+            alert = alert_store.create(alert)
+            tracer.mark(trace_id, 'alert')
             
-            # Check if any system data changed
-            if system_data != prev_system_data or data_changed or anomaly_changed:
-                # Broadcast update to all connected clients
-                update_data = get_processed_system_data(system_data)
-                broadcast_update({
-                    'type': 'system_update',
-                    'data': update_data
-                })
-                prev_system_data = system_data.copy()
+            print(f"New leak alert: {pipe_name} assigned to {mechanic_name}")
+            data_changed = True
             
-        except Exception as e:
-            print(f"Error in leak monitoring: {e}")
+            # Notify assigned mechanic
+            if mechanic_id:
+                broadcast_to_mechanic(mechanic_id, {
+                    'type': 'new_assignment',
+                    'alert': alert
+                }, trace_id)
+    
+    # If a leak is resolved, move it from active to history
+    leaking = set(active_leaks)
+    cleared_ids = [
+        alert['id'] for alert in alert_store.site_leaks(site_name)
+        if alert['pipe_id'] not in leaking
+    ]
+    for leak_id in cleared_ids:
+        if resolve_active_alert(leak_id):
+            data_changed = True
+    
+    return data_changed
+
+def apply_site_evaluation(site, evaluation, trace_id=None):
+    """Reconcile the alert store with a site's debounced alert conditions"""
+    leaks_changed = check_site_leaks(site, evaluation['active_leaks'], trace_id)
+    anomaly_changed = check_system_anomalies(site, evaluation)
+    return leaks_changed or anomaly_changed
+
+def publish_system_update(site, system_data, trace_id=None):
+    """Broadcast a site's processed system data to all connected clients"""
+    update = {
+        'type': 'system_update',
+        'data': get_processed_system_data(system_data)
+    }
+    if trace_id:
+        update['trace_id'] = trace_id
+    if site_label(site):
+        update['site'] = site_label(site)
+    broadcast_update(update)
+
+def handle_shard_result(site, snapshot, evaluation):
+    """Apply a result reported by a monitor shard process"""
+    with MONITOR_TICK_SECONDS.time():
+        trace_id = tracer.ingest(snapshot.get('trace')) if snapshot else None
+        data_changed = apply_site_evaluation(site, evaluation, trace_id)
+        
+        if snapshot is not None:
+            site_snapshots[site] = snapshot
         
-        time.sleep(2)  # Check every 2 seconds for faster updates
+        if snapshot is not None or data_changed:
+            publish_system_update(site, site_snapshots.get(site, {}), trace_id)
 
-def check_system_anomalies(system_data):
+def process_snapshot(site, system_data, evaluator, prev_system_data, now=None):
+    """One monitor tick for an already fetched snapshot; returns the snapshot to compare against next"""
+    # Simulator writes carry a trace stamp; start timing new ones
+    trace_id = tracer.ingest(system_data.get('trace'))
+    
+    # Debounce raw readings so a flickering pipe stays one incident
+    evaluation = evaluator.evaluate(system_data, now)
+    data_changed = apply_site_evaluation(site, evaluation, trace_id)
+    
+    # Check if any system data changed
+    if system_data != prev_system_data or data_changed:
+        # Broadcast update to all connected clients
+        publish_system_update(site, system_data, trace_id)
+        return system_data.copy()
+    
+    return prev_system_data
+
+def monitor_leaks(site=DEFAULT_SITE, stop_event=None):
+    """Background thread to monitor for leaks and update alerts"""
+    stop_event = stop_event or threading.Event()
+    prev_system_data = {}
+    evaluator = seed_evaluator(site, SiteAlertEvaluator(**ALERT_EVALUATOR_CONFIG))
+    
+    # Re-reads torn or out-of-order snapshots instead of alerting on them
+    gate = SnapshotGate(lambda: get_system_data(site), max_wait=SNAPSHOT_MAX_WAIT)
+    
+    # Optionally capture every snapshot for later replay (see feed_recorder.py)
+    recorder = FeedRecorder(FEED_RECORD_PATH) if FEED_RECORD_PATH else None
+    
+    try:
+        while not stop_event.is_set():
+            tick_start = time.perf_counter()
+            try:
+                system_data, outcome = gate.read()
+                if outcome != 'ok':
+                    SNAPSHOT_HELD_TOTAL.inc()
+                if system_data is None:
+                    SNAPSHOT_SKIPPED_TOTAL.inc()
+                else:
+                    if recorder:
+                        recorder.record(system_data)
+                    
+                    prev_system_data = process_snapshot(site, system_data, evaluator, prev_system_data)
+                
+            except Exception as e:
+                print(f"Error in leak monitoring: {e}")
+            
+            MONITOR_TICK_SECONDS.observe(time.perf_counter() - tick_start)
+            stop_event.wait(2)  # Check every 2 seconds for faster updates
+    finally:
+        # Finish the gzip member before a re-elected monitor appends the next one
+        if recorder:
+            recorder.close()
+
+def check_system_anomalies(site, evaluation):
     """Check for other system anomalies"""
     data_changed = False
     
     # Check for low water level (only for admin)
-    water_level = system_data.get('water_level', 0)
-    if water_level < 20:  # Assuming 20% is low
-        alert_id = "low_water_level"
-        existing_alert = next((a for a in active_alerts if a['id'] == alert_id), None)
-        
-        if not existing_alert:
+    water_level = evaluation['water_level']
+    alert_id = site_alert_id(site, "low_water_level")
+    
+    if evaluation['low_water_level']:  # Below LOW_WATER_ENTER_LEVEL
+        if alert_store.get(alert_id) is None:
             alert = {
                 'id': alert_id,
                 'type': 'water_level',
@@ -363,31 +483,23 @@ def check_system_anomalies(system_data):
                 'assigned_mechanic_name': None,
                 'status': 'unassigned'  # Water level alerts are for admin only
             }
-            active_alerts.append(alert)
-            
-            alert_history.append({
-                **alert,
-                'resolved_at': None,
-                'resolved': False
-            })
+            if site_label(site):
+                alert['site'] = site_label(site)
+            alert_store.create(alert)
             data_changed = True
     else:
         # If water level is back to normal, resolve the alert
-        alert_id = "low_water_level"
-        existing_alert = next((a for a in active_alerts if a['id'] == alert_id), None)
-        if existing_alert:
-            active_alerts.remove(existing_alert)
-            for history_alert in alert_history:
-                if history_alert['id'] == alert_id and not history_alert.get('resolved'):
-                    history_alert['resolved'] = True
-                    history_alert['resolved_at'] = datetime.now().isoformat()
-                    history_alert['status'] = 'resolved'
-            data_changed = True
+        data_changed = resolve_active_alert(alert_id)
     
     return data_changed
 
-def get_processed_system_data(system_data):
-    """Process system data for API response"""
+def get_processed_system_data(system_data, active_alerts=None):
+    """Process system data for API response (with all active alerts unless given a subset)"""
+    if active_alerts is None:
+        active_alerts, unacknowledged = alert_store.active_alerts(), alert_store.unacknowledged
+    else:
+        unacknowledged = len([a for a in active_alerts if not a.get('acknowledged')])
+    
     processed_data = {
         'valves': {},
         'sensors': system_data.get('sensors', {}),
@@ -395,7 +507,7 @@ def get_processed_system_data(system_data):
         'taps': {},
         'leaks': {},
         'active_alerts': active_alerts,
-        'unacknowledged_alerts': len([a for a in active_alerts if not a.get('acknowledged')]),
+        'unacknowledged_alerts': unacknowledged,
         'timestamp': system_data.get('timestamp', datetime.now().isoformat())
     }
     
@@ -420,11 +532,157 @@ def get_processed_system_data(system_data):
     
     return processed_data
 
-# Start leak monitoring in background thread
-if firebase_initialized:
-    monitor_thread = threading.Thread(target=monitor_leaks, daemon=True)
-    monitor_thread.start()
-    print("Leak monitoring started")
+def compact_alert(alert):
+    """Alert without the label text a client can rebuild from /api/labels"""
+    compact = dict(alert)
+    pipe_name = PIPE_NAMES.get(alert.get('pipe_id'))
+    if pipe_name and compact.get('pipe_name') == pipe_name:
+        del compact['pipe_name']
+        if (compact.get('title') == LEAK_ALERT_TITLE and
+                compact.get('message') == f"Leak detected in: {pipe_name}"):
+            del compact['title'], compact['message']
+    
+    mechanic = MAINTENANCE_EMPLOYEES.get(alert.get('assigned_mechanic_id'))
+    if mechanic and compact.get('assigned_mechanic_name') == mechanic['name']:
+        del compact['assigned_mechanic_name']
+    return compact
+
+def compact_payload(payload):
+    """Short ids instead of display names and alerts without label text"""
+    if isinstance(payload, list):
+        return [compact_payload(item) for item in payload]
+    if not isinstance(payload, dict):
+        return payload
+    if 'id' in payload and 'pipe_id' in payload:
+        return compact_alert(payload)
+    
+    compact = {}
+    for key, value in payload.items():
+        ids_by_name = IDS_BY_NAME.get(key)
+        if ids_by_name is not None and isinstance(value, dict):
+            compact[key] = {ids_by_name.get(name, name): status for name, status in value.items()}
+        else:
+            compact[key] = compact_payload(value)
+    return compact
+
+def api_response(payload):
+    """jsonify, compacted when the client asked for ?compact=1"""
+    if request.args.get('compact') == '1':
+        payload = compact_payload(payload)
+    return jsonify(payload)
+
+# Background services (Firebase connection and leak monitoring)
+sharded_monitor = None
+monitor_thread = None
+monitor_stop_event = None
+monitor_election = None
+services_pid = None  # Process the services were started in (workers forked after import start their own)
+services_lock = threading.Lock()
+
+def start_monitors():
+    """Start leak monitoring in this worker (called once it is elected leader)"""
+    global sharded_monitor, monitor_thread, monitor_stop_event
+    
+    # The leader persists alert state; it sees every worker's changes over the bus
+    if alert_journal:
+        alert_journal.checkpoint(alert_store)
+        alert_store.journal = alert_journal
+    
+    # One thread for a single site, a process pool for many
+    if len(MONITOR_SITES) > 1:
+        if FEED_RECORD_PATH:
+            print("FEED_RECORD_PATH is ignored: feeds are only recorded when a single site is monitored")
+        sharded_monitor = ShardedMonitor(MONITOR_SITES, handle_shard_result,
+                                         workers=MONITOR_WORKERS,
+                                         evaluator_config=ALERT_EVALUATOR_CONFIG,
+                                         snapshot_max_wait=SNAPSHOT_MAX_WAIT,
+                                         restored_state=restored_alert_state)
+        sharded_monitor.start()
+    else:
+        monitor_stop_event = threading.Event()
+        monitor_thread = threading.Thread(target=monitor_leaks, args=(MONITOR_SITES[0], monitor_stop_event),
+                                          daemon=True)
+        monitor_thread.start()
+        print("Leak monitoring started")
+
+def stop_monitors():
+    """Stop leak monitoring after another worker took over leadership"""
+    global sharded_monitor, monitor_thread, monitor_stop_event
+    
+    if sharded_monitor:
+        sharded_monitor.stop()
+        sharded_monitor = None
+    if monitor_stop_event:
+        monitor_stop_event.set()
+        monitor_stop_event = None
+        # Let the current tick finish, so the feed recorder is closed before a re-election
+        monitor_thread.join(timeout=30)
+        monitor_thread = None
+    if alert_journal:
+        alert_store.journal = None
+        alert_journal.close()
+    print("Leak monitoring stopped")
+
+def start_background_services():
+    """Connect to Firebase and start leak monitoring once per process; safe to call more than once"""
+    global firebase_initialized, monitor_election, services_pid
+    
+    with services_lock:
+        if services_pid == os.getpid():
+            return
+        services_pid = os.getpid()
+        
+        # Alert events other workers published before this one joined (connects the
+        # bus first, so every later event is delivered by the poller)
+        backlog = state_bus.backlog('alert_events')
+        alert_store.origin = state_bus.node_id
+        
+        # Alerts, history and assignments as they were before the restart
+        if alert_journal:
+            try:
+                alert_journal.restore(alert_store)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not restore alert state from {ALERT_STATE_DIR}: {e}")
+        
+        # Only events the journal does not already cover are applied
+        alert_store.merge(backlog)
+        state_bus.start()
+        
+        firebase_initialized = ensure_firebase()
+        if not firebase_initialized:
+            return
+        
+        # Only one worker monitors; the others take over if its lease expires
+        monitor_election = LeaderElection(state_bus, 'monitor', start_monitors, stop_monitors)
+        monitor_election.start()
+
+@app.before_request
+def ensure_background_services():
+    if services_pid != os.getpid():
+        start_background_services()
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli JSON bodies for clients that accept it"""
+    response.vary.add('Accept-Encoding')
+    if (response.is_streamed or response.mimetype != 'application/json' or
+            'Content-Encoding' in response.headers or response.status_code < 200):
+        return response
+    
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+    
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# Spawned shard workers re-import this file as __mp_main__ and must not start monitors.
+# Under gunicorn each worker starts them from the post_worker_init hook in gunicorn.conf.py
+# instead, so a preloading master never runs the election or the monitor itself.
+if not FIREBASE_DEFERRED_INIT and __name__ != '__mp_main__' and 'gunicorn' not in sys.modules:
+    start_background_services()
 
 @app.route('/')
 def index():
@@ -448,7 +706,7 @@ def login():
         password = request.form.get('password')
         
         # Check if admin login
-        if username == 'admin' and check_password_hash(ADMIN_CREDENTIALS['password'], password):
+        if username == 'admin' and credential_store.verify('admin', password):
             user = User('admin', UserRole.ADMIN, 'Administrator')
             login_user(user)
             flash('Admin login successful!', 'success')
@@ -457,7 +715,7 @@ def login():
         # Check if mechanic login
         elif username in MAINTENANCE_EMPLOYEES:
             employee = MAINTENANCE_EMPLOYEES[username]
-            if check_password_hash(employee['password'], password):
+            if credential_store.verify(username, password):
                 user = User(username, UserRole.MECHANIC, employee['name'])
                 login_user(user)
                 flash(f'Welcome, {employee["name"]}!', 'success')
@@ -512,12 +770,12 @@ def dashboard():
                 current_leaks[pipe_name] = "ACTIVE LEAK"
     
     # Get active alerts (includes leaks and other alerts)
-    active_alerts_count = len([a for a in active_alerts if not a.get('acknowledged')])
+    active_alerts_count = alert_store.unacknowledged
     
     # Get mechanic assignments summary
     mechanic_workload = {}
     for mechanic_id, employee in MAINTENANCE_EMPLOYEES.items():
-        assigned_leaks = mechanic_assigned_leaks.get(mechanic_id, [])
+        assigned_leaks = alert_store.mechanic_alert_ids(mechanic_id)
         mechanic_workload[employee['name']] = {
             'id': mechanic_id,
             'assigned_count': len(assigned_leaks),
@@ -560,44 +818,88 @@ def mechanic_dashboard():
 @login_required
 def stream():
     """Server-Sent Events endpoint for real-time updates"""
+    is_mechanic = current_user.is_mechanic()
+    user_id = current_user.id
+    
+    compact = request.args.get('compact') == '1'
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    
+    # EventSource resends the last id it received when it reconnects; ids are
+    # scoped to the worker that issued them (see ReplayLog)
+    last_event_id = request.headers.get('Last-Event-ID') or None
+    
+    def accepts(message):
+        # Mechanics only get their own updates, so admin traffic never fills their mailbox
+        if not is_mechanic:
+            return True
+        return message.get('type') == 'mechanic_update' and (
+            message.get('mechanic_id') == user_id or user_id in message.get('mechanic_ids', ()))
+    
     def event_stream():
-        # Create a queue for this client
-        client_queue = queue.Queue(maxsize=10)
+        compressor = StreamCompressor(encoding) if encoding else None
+        
+        def encode(text):
+            return compressor.compress(text) if compressor else text
+        
+        mailbox = ClientMailbox(max_pending=SSE_MAX_PENDING, accepts=accepts)
         
         with sse_lock:
-            sse_clients.append(client_queue)
+            # Preload missed messages under the broadcast lock so none is lost or repeated
+            missed = sse_replay_log.since(last_event_id) if last_event_id is not None else []
+            for event_id, message in missed or []:
+                mailbox.put(message, event_id)
+            sse_clients.append(mailbox)
+        SSE_CONNECTIONS.inc()
+        SSE_CONNECTIONS_TOTAL.inc()
+        
+        # Resync only when the gap is no longer in the replay log (or was trimmed)
+        connected = {
+            'type': 'connected',
+            'message': 'Stream connected',
+            'resumed': last_event_id is not None and missed is not None,
+            'resync': last_event_id is not None and (missed is None or mailbox.dropped > 0)
+        }
         
         try:
             # Send initial connection message
-            yield f"data: {json.dumps({'type': 'connected', 'message': 'Stream connected'})}\n\n"
+            yield encode(f"data: {json.dumps(connected)}\n\n")
             
             # Keep connection alive and send updates
             while True:
-                try:
-                    # Wait for update with timeout to send keepalive
-                    message = client_queue.get(timeout=30)
-                    
-                    # If mechanic, filter only relevant messages
-                    if current_user.is_mechanic():
-                        # Only send mechanic-specific updates and general pings
-                        if (message.get('type') == 'ping' or 
-                            message.get('type') == 'mechanic_update' and 
-                            message.get('mechanic_id') == current_user.id):
-                            yield f"data: {json.dumps(message)}\n\n"
-                    else:
-                        # Admin gets everything
-                        yield f"data: {json.dumps(message)}\n\n"
-                        
-                except queue.Empty:
+                # Wait for update with timeout to send keepalive
+                entry = mailbox.get(timeout=30)
+                
+                if entry is None:
                     # Send keepalive ping
-                    yield f"data: {json.dumps({'type': 'ping'})}\n\n"
-        except GeneratorExit:
+                    yield encode(f"data: {json.dumps({'type': 'ping'})}\n\n")
+                    continue
+                
+                event_id, message = entry
+                tracer.mark(message.get('trace_id'), 'sse_yield')
+                if compact:
+                    message = compact_payload(message)
+                yield encode(f"id: {event_id}\ndata: {json.dumps(message)}\n\n")
+        finally:
             # Client disconnected
             with sse_lock:
-                if client_queue in sse_clients:
-                    sse_clients.remove(client_queue)
+                if mailbox in sse_clients:
+                    sse_clients.remove(mailbox)
+            mailbox.close()
+            SSE_CONNECTIONS.dec()
+    
+    headers = {'Content-Encoding': encoding} if encoding else {}
+    return Response(event_stream(), mimetype='text/event-stream', headers=headers)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint (off unless METRICS_TOKEN or METRICS_PUBLIC is set)"""
+    if METRICS_TOKEN:
+        if request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif not METRICS_PUBLIC:
+        return Response('Not Found\n', status=404, mimetype='text/plain')
     
-    return Response(event_stream(), mimetype='text/event-stream')
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/system-data')
 @login_required
@@ -606,21 +908,57 @@ def api_system_data():
     system_data = get_system_data()
     
     if current_user.is_mechanic():
-        # For mechanics, only return their assigned leaks
+        # For mechanics, only return their assigned leaks (their work queue)
         mechanic_leaks = get_assigned_leaks_for_mechanic(current_user.id)
-        processed_data = get_processed_system_data(system_data)
-        
-        # Filter to only show mechanic's assigned leaks
-        filtered_alerts = [alert for alert in processed_data['active_alerts'] 
-                          if alert.get('assigned_mechanic_id') == current_user.id]
-        
-        processed_data['active_alerts'] = filtered_alerts
-        processed_data['unacknowledged_alerts'] = len([a for a in filtered_alerts if not a.get('acknowledged')])
+        processed_data = get_processed_system_data(system_data, mechanic_leaks)
     else:
         # Admin gets everything
         processed_data = get_processed_system_data(system_data)
     
-    return jsonify(processed_data)
+    return api_response(processed_data)
+
+@app.route('/api/labels')
+@login_required
+def get_labels():
+    """Display names for the short ids used in compact payloads (fetch once, cache)"""
+    response = jsonify({
+        'pipes': PIPE_NAMES,
+        'taps': TAP_NAMES,
+        'valves': VALVE_NAMES,
+        'mechanics': {mechanic_id: details['name'] for mechanic_id, details in MAINTENANCE_EMPLOYEES.items()},
+        'leak_alert_title': LEAK_ALERT_TITLE,
+        'leak_alert_message': "Leak detected in: {pipe_name}"
+    })
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response
+
+@app.route('/api/trace', methods=['POST'])
+@login_required
+def report_trace():
+    """Browser reports how long it took to apply a traced update"""
+    data = request.get_json(silent=True) or {}
+    trace_id = data.get('trace_id')
+    
+    try:
+        apply_seconds = (float(data['applied_at']) - float(data['received_at'])) / 1000
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'received_at and applied_at (ms) required'}), 400
+    
+    recorded = tracer.client_applied(trace_id, apply_seconds)
+    return jsonify({'success': recorded})
+
+@app.route('/api/trace/stats')
+@login_required
+def trace_stats():
+    """Per-stage latency percentiles from simulator write to browser render (admin only)"""
+    if not current_user.is_admin():
+        return jsonify({'success': False, 'message': 'Admin only'}), 403
+    
+    return jsonify({
+        'stages': tracer.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
 
 @app.route('/api/alerts')
 @login_required
@@ -629,7 +967,7 @@ def get_alerts():
     if current_user.is_mechanic():
         # Mechanics only see their assigned alerts
         mechanic_alerts = get_assigned_leaks_for_mechanic(current_user.id)
-        return jsonify({
+        return api_response({
             'active_alerts': mechanic_alerts,
             'unacknowledged_count': len([a for a in mechanic_alerts if not a.get('acknowledged')]),
             'total_active': len(mechanic_alerts),
@@ -637,10 +975,10 @@ def get_alerts():
         })
     else:
         # Admin sees everything
-        return jsonify({
-            'active_alerts': active_alerts,
-            'unacknowledged_count': len([a for a in active_alerts if not a.get('acknowledged')]),
-            'total_active': len(active_alerts),
+        return api_response({
+            'active_alerts': alert_store.active_alerts(),
+            'unacknowledged_count': alert_store.unacknowledged,
+            'total_active': len(alert_store.active),
             'timestamp': datetime.now().isoformat()
         })
 
@@ -648,64 +986,66 @@ def get_alerts():
 @login_required
 def acknowledge_alert():
     """Acknowledge an alert"""
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     alert_id = data.get('alert_id')
+    if not isinstance(alert_id, str):
+        return jsonify({'success': False, 'message': 'alert_id must be a string'}), 400
     
+    # Mechanics can only acknowledge their assigned alerts; admin can acknowledge any
     if current_user.is_mechanic():
-        # Mechanics can only acknowledge their assigned alerts
-        for alert in active_alerts:
-            if alert['id'] == alert_id and alert.get('assigned_mechanic_id') == current_user.id:
-                alert['acknowledged'] = True
-                alert['acknowledged_at'] = datetime.now().isoformat()
-                alert['acknowledged_by'] = current_user.name
-                
-                # Update history
-                for history_alert in alert_history:
-                    if history_alert['id'] == alert_id and not history_alert.get('resolved'):
-                        history_alert['acknowledged'] = True
-                        history_alert['acknowledged_at'] = datetime.now().isoformat()
-                        history_alert['acknowledged_by'] = current_user.name
-                
-                # Broadcast update
-                system_data = get_system_data()
-                broadcast_update({
-                    'type': 'alert_acknowledged',
-                    'alert_id': alert_id,
-                    'acknowledged_by': current_user.name,
-                    'data': get_processed_system_data(system_data)
-                })
-                
-                return jsonify({'success': True, 'message': 'Alert acknowledged'})
+        acknowledged_by, mechanic_id = current_user.name, current_user.id
+    else:
+        acknowledged_by, mechanic_id = 'Admin', None
+    
+    if acknowledge_alerts([alert_id], acknowledged_by, mechanic_id):
+        # Broadcast update
+        system_data = get_system_data()
+        broadcast_update({
+            'type': 'alert_acknowledged',
+            'alert_id': alert_id,
+            'acknowledged_by': acknowledged_by,
+            'data': get_processed_system_data(system_data)
+        })
         
+        return jsonify({'success': True, 'message': 'Alert acknowledged'})
+    
+    if mechanic_id:
         return jsonify({'success': False, 'message': 'Alert not found or not assigned to you'}), 403
+    return jsonify({'success': False, 'message': 'Alert not found'}), 404
+
+@app.route('/api/alerts/acknowledge-bulk', methods=['POST'])
+@login_required
+def acknowledge_alerts_bulk():
+    """Acknowledge many alerts with one Firebase read and one broadcast"""
+    data = request.get_json(silent=True) or {}
+    alert_ids = data.get('alert_ids')
     
+    if not isinstance(alert_ids, list) or not all(isinstance(alert_id, str) for alert_id in alert_ids):
+        return jsonify({'success': False, 'message': 'alert_ids must be a list of strings'}), 400
+    
+    if current_user.is_mechanic():
+        acknowledged_by, mechanic_id = current_user.name, current_user.id
     else:
-        # Admin can acknowledge any alert
-        for alert in active_alerts:
-            if alert['id'] == alert_id:
-                alert['acknowledged'] = True
-                alert['acknowledged_at'] = datetime.now().isoformat()
-                alert['acknowledged_by'] = 'Admin'
-                
-                # Update history
-                for history_alert in alert_history:
-                    if history_alert['id'] == alert_id and not history_alert.get('resolved'):
-                        history_alert['acknowledged'] = True
-                        history_alert['acknowledged_at'] = datetime.now().isoformat()
-                        history_alert['acknowledged_by'] = 'Admin'
-                
-                # Broadcast update
-                system_data = get_system_data()
-                broadcast_update({
-                    'type': 'alert_acknowledged',
-                    'alert_id': alert_id,
-                    'acknowledged_by': 'Admin',
-                    'data': get_processed_system_data(system_data)
-                })
-                
-                return jsonify({'success': True, 'message': 'Alert acknowledged'})
+        acknowledged_by, mechanic_id = 'Admin', None
     
-    return jsonify({'success': False, 'message': 'Alert not found'}), 404
+    acknowledged = acknowledge_alerts(alert_ids, acknowledged_by, mechanic_id)
+    
+    if acknowledged:
+        system_data = get_system_data()
+        broadcast_update({
+            'type': 'alerts_acknowledged',
+            'alert_ids': acknowledged,
+            'acknowledged_by': acknowledged_by,
+            'data': get_processed_system_data(system_data)
+        })
+    
+    acknowledged_ids = set(acknowledged)
+    return jsonify({
+        'success': bool(acknowledged),
+        'message': f'{len(acknowledged)} alerts acknowledged',
+        'acknowledged': acknowledged,
+        'not_acknowledged': [alert_id for alert_id in alert_ids if alert_id not in acknowledged_ids]
+    })
 
 @app.route('/api/alerts/history')
 @login_required
@@ -714,18 +1054,18 @@ def get_alert_history():
     if current_user.is_mechanic():
         # Mechanics only see their assigned alert history
         mechanic_history = [
-            alert for alert in alert_history 
+            alert for alert in alert_store.history
             if alert.get('assigned_mechanic_id') == current_user.id
         ]
-        return jsonify({
+        return api_response({
             'history': mechanic_history[-50:],  # Last 50 alerts
             'total_count': len(mechanic_history)
         })
     else:
         # Admin sees everything
-        return jsonify({
-            'history': alert_history[-50:],  # Last 50 alerts
-            'total_count': len(alert_history)
+        return api_response({
+            'history': alert_store.history[-50:],  # Last 50 alerts
+            'total_count': len(alert_store.history)
         })
 
 @app.route('/api/alerts/resolve-all', methods=['POST'])
@@ -735,26 +1075,8 @@ def resolve_all_alerts():
     if not current_user.is_admin():
         return jsonify({'success': False, 'message': 'Admin only'}), 403
     
-    for alert in active_alerts:
-        alert['resolved'] = True
-        alert['resolved_at'] = datetime.now().isoformat()
-        alert['resolved_by'] = current_user.name
-    
-    # Move all to history as resolved
-    for alert in active_alerts[:]:
-        for history_alert in alert_history:
-            if history_alert['id'] == alert['id'] and not history_alert.get('resolved'):
-                history_alert['resolved'] = True
-                history_alert['resolved_at'] = datetime.now().isoformat()
-                history_alert['resolved_by'] = current_user.name
-    
-    active_alerts.clear()
-    leak_assignments.clear()
-    mechanic_assigned_leaks.clear()
-    
-    # Clear assigned_leaks from employees
-    for mechanic_id in MAINTENANCE_EMPLOYEES:
-        MAINTENANCE_EMPLOYEES[mechanic_id]['assigned_leaks'] = []
+    # One event resolves every active alert into history and clears all assignments
+    alert_store.resolve([alert['id'] for alert in alert_store.active_alerts()], current_user.name)
     
     # Broadcast update
     system_data = get_system_data()
@@ -766,7 +1088,7 @@ def resolve_all_alerts():
     return jsonify({
         'success': True,
         'message': 'All alerts resolved',
-        'remaining_alerts': len(active_alerts)
+        'remaining_alerts': len(alert_store.active)
     })
 
 @app.route('/api/simulate-leak', methods=['POST'])
@@ -806,12 +1128,8 @@ def simulate_leak():
                 'simulated': True
             }
             
-            # Remove if already exists
-            existing_alert = next((a for a in active_alerts if a['id'] == leak_id), None)
-            if existing_alert:
-                active_alerts.remove(existing_alert)
-            
-            active_alerts.append(alert)
+            # Replaces an existing alert with the same id; simulated leaks stay out of history
+            alert = alert_store.create(alert, history=False)
             
             # Broadcast update
             system_data = get_system_data()
@@ -827,13 +1145,8 @@ def simulate_leak():
             })
         else:
             # Resolve leak
-            alert_to_remove = next((a for a in active_alerts if a['id'] == leak_id), None)
-            if alert_to_remove:
-                active_alerts.remove(alert_to_remove)
-                
-                # Unassign leak
-                mechanic_id = unassign_leak(leak_id)
-                
+            # Withdrawing the alert also unassigns it
+            if alert_store.withdraw(leak_id):
                 # Broadcast update
                 system_data = get_system_data()
                 broadcast_update({
@@ -857,20 +1170,20 @@ def get_mechanics():
     
     mechanics_list = []
     for mechanic_id, details in MAINTENANCE_EMPLOYEES.items():
-        assigned_count = len(mechanic_assigned_leaks.get(mechanic_id, []))
+        assigned_leaks = alert_store.mechanic_alert_ids(mechanic_id)
         mechanics_list.append({
             'id': mechanic_id,
             'name': details['name'],
             'specialization': details['specialization'],
             'phone': details['phone'],
-            'assigned_leaks_count': assigned_count,
-            'assigned_leaks': mechanic_assigned_leaks.get(mechanic_id, [])
+            'assigned_leaks_count': len(assigned_leaks),
+            'assigned_leaks': assigned_leaks
         })
     
     return jsonify({
         'mechanics': mechanics_list,
         'total_mechanics': len(mechanics_list),
-        'total_assigned_leaks': len(leak_assignments)
+        'total_assigned_leaks': len(alert_store.assignments)
     })
 
 @app.route('/api/assign-leak', methods=['POST'])
@@ -880,34 +1193,20 @@ def assign_leak():
     if not current_user.is_admin():
         return jsonify({'success': False, 'message': 'Admin only'}), 403
     
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     leak_id = data.get('leak_id')
     mechanic_id = data.get('mechanic_id')
+    if not isinstance(leak_id, str) or not isinstance(mechanic_id, str):
+        return jsonify({'success': False, 'message': 'leak_id and mechanic_id must be strings'}), 400
     
-    if leak_id not in [alert['id'] for alert in active_alerts]:
+    alert = alert_store.get(leak_id)
+    if not alert:
         return jsonify({'success': False, 'message': 'Leak not found'}), 404
     
     if mechanic_id not in MAINTENANCE_EMPLOYEES:
         return jsonify({'success': False, 'message': 'Mechanic not found'}), 404
     
-    # Unassign from current mechanic if any
-    old_mechanic_id = unassign_leak(leak_id)
-    
-    # Assign to new mechanic
-    leak_assignments[leak_id] = mechanic_id
-    mechanic_assigned_leaks[mechanic_id].append(leak_id)
-    
-    # Update employee record
-    if leak_id not in MAINTENANCE_EMPLOYEES[mechanic_id]['assigned_leaks']:
-        MAINTENANCE_EMPLOYEES[mechanic_id]['assigned_leaks'].append(leak_id)
-    
-    # Update alert
-    for alert in active_alerts:
-        if alert['id'] == leak_id:
-            alert['assigned_mechanic_id'] = mechanic_id
-            alert['assigned_mechanic_name'] = MAINTENANCE_EMPLOYEES[mechanic_id]['name']
-            alert['status'] = 'reassigned'
-            break
+    old_mechanic_id = reassign_leak(alert, mechanic_id)
     
     # Notify old mechanic (if any)
     if old_mechanic_id:
@@ -929,6 +1228,73 @@ def assign_leak():
         'new_mechanic': mechanic_id
     })
 
+@app.route('/api/assign-leaks', methods=['POST'])
+@login_required
+def assign_leaks_bulk():
+    """Assign/reassign many leaks at once (admin only); all or nothing"""
+    if not current_user.is_admin():
+        return jsonify({'success': False, 'message': 'Admin only'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    assignments = data.get('assignments')
+    if not isinstance(assignments, list):
+        return jsonify({'success': False, 'message': 'assignments must be a list of {leak_id, mechanic_id}'}), 400
+    
+    # Validate the whole batch before changing anything
+    errors = []
+    for item in assignments:
+        leak_id = item.get('leak_id') if isinstance(item, dict) else None
+        mechanic_id = item.get('mechanic_id') if isinstance(item, dict) else None
+        if not isinstance(leak_id, str) or not isinstance(mechanic_id, str):
+            errors.append({'leak_id': leak_id, 'message': 'leak_id and mechanic_id must be strings'})
+        elif mechanic_id not in MAINTENANCE_EMPLOYEES:
+            errors.append({'leak_id': leak_id, 'message': 'Mechanic not found'})
+        elif alert_store.get(leak_id) is None:
+            errors.append({'leak_id': leak_id, 'message': 'Leak not found'})
+    if errors:
+        return jsonify({'success': False, 'message': 'No leaks were assigned', 'errors': errors}), 400
+    
+    # Checked again and applied as one event under the store lock; a leak the
+    # monitor resolved in the meantime fails the batch instead of half-applying it
+    final = {item['leak_id']: item['mechanic_id'] for item in assignments}
+    previous, skipped = alert_store.assign_many([
+        (leak_id, mechanic_id, MAINTENANCE_EMPLOYEES[mechanic_id]['name'])
+        for leak_id, mechanic_id in final.items()
+    ])
+    if skipped:
+        return jsonify({
+            'success': False,
+            'message': 'No leaks were assigned',
+            'errors': [{'leak_id': leak_id, 'message': 'Leak was resolved'} for leak_id in skipped]
+        }), 409
+    
+    # Leaks that already were with their mechanic are left out of `previous`
+    assigned = defaultdict(list)  # Format: {mechanic_id: [leak_id]}
+    removed = defaultdict(list)
+    for leak_id, old_mechanic_id in previous.items():
+        if old_mechanic_id:
+            removed[old_mechanic_id].append(leak_id)
+        assigned[final[leak_id]].append(leak_id)
+    
+    # One message for every affected mechanic instead of one per leak
+    if previous:
+        broadcast_update({
+            'type': 'mechanic_update',
+            'mechanic_ids': sorted(set(assigned) | set(removed)),
+            'data': {
+                'type': 'assignments_changed',
+                'assigned': assigned,
+                'removed': removed
+            }
+        })
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(previous)} leaks assigned',
+        'assigned': assigned,
+        'removed': removed
+    })
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5050))
     app.run(host='0.0.0.0', port=port, debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,296 @@
+"""Reproducible benchmarks for the dashboard hot paths.
+
+Runs against synthetic /water_system snapshots, never Firebase:
+
+    python benchmark.py                                  # full suite, table output
+    python benchmark.py --quick                          # small sizes only
+    python benchmark.py --json results.json              # save results
+    python benchmark.py --compare baseline.json          # exit 1 on regressions
+    python benchmark.py --pipes 15,1000 --clients 10,100 --only broadcast
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Import the app without connecting to Firebase or starting the monitor
+os.environ.setdefault('FIREBASE_DEFERRED_INIT', '1')
+
+import app as dashboard  # noqa: E402
+import wire_format  # noqa: E402
+
+DEFAULT_PIPES = (15, 1000, 100000)
+DEFAULT_CLIENTS = (10, 100, 1000, 10000)
+
+
+def make_snapshot(num_pipes, leak_ratio=0.01, seed=42):
+    """Build a /water_system-shaped snapshot with `num_pipes` pipes"""
+    rng = random.Random(seed)
+
+    pipe_ids = list(dashboard.PIPE_NAMES)[:num_pipes]
+    pipe_ids += [f"P{i:06d}" for i in range(len(pipe_ids), num_pipes)]
+
+    leaks = {pipe_id: int(rng.random() < leak_ratio) for pipe_id in pipe_ids}
+    water_flow = {pipe_id: int(rng.random() < 0.8) for pipe_id in pipe_ids}
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'sensors': {'pH': 7.0, 'turbidity': 5.0, 'salinity': 0.5, 'flow': 2.5},
+        'water_level': 49,
+        'valves': {'TANK_VALVE': 1, 'VALVE_A': 1},
+        'taps': {tap_id: 0 for tap_id in dashboard.TAP_NAMES},
+        'leaks': leaks,
+        'active_leaks': {pipe_id: leaks[pipe_id] & water_flow[pipe_id] for pipe_id in pipe_ids},
+        'water_flow': water_flow
+    }
+
+
+def reset_state():
+    """Clear the dashboard's in-memory alert and client state"""
+    dashboard.alert_store.clear()
+    with dashboard.sse_lock:
+        dashboard.sse_clients.clear()
+
+
+def measure(fn, min_time=0.2, repeat=5):
+    """Time fn() in batches; return seconds per call for each batch"""
+    # Calibrate the batch size so one batch takes about min_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed))
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def result(name, params, samples):
+    median = statistics.median(samples)
+    return {
+        'name': name,
+        'params': params,
+        'min_s': min(samples),
+        'median_s': median,
+        'mean_s': statistics.mean(samples),
+        'ops_per_s': 1 / median if median else None
+    }
+
+
+def bench_monitor_tick(num_pipes, min_time, repeat):
+    """One steady-state monitor tick: evaluate, reconcile alerts, compare snapshots"""
+    reset_state()
+    snapshot = make_snapshot(num_pipes)
+    evaluator = dashboard.SiteAlertEvaluator(**dashboard.ALERT_EVALUATOR_CONFIG)
+    prev = {'data': {}}
+
+    def tick():
+        evaluation = evaluator.evaluate(snapshot)
+        data_changed = dashboard.apply_site_evaluation(dashboard.DEFAULT_SITE, evaluation)
+        if snapshot != prev['data'] or data_changed:
+            dashboard.get_processed_system_data(snapshot)
+            prev['data'] = snapshot.copy()
+
+    tick()  # First tick opens the alerts; measure the steady state after it
+    return result('monitor_tick', {'pipes': num_pipes}, measure(tick, min_time, repeat))
+
+
+def bench_processed_system_data(num_pipes, min_time, repeat):
+    reset_state()
+    snapshot = make_snapshot(num_pipes)
+    dashboard.apply_site_evaluation(
+        dashboard.DEFAULT_SITE,
+        dashboard.SiteAlertEvaluator(**dashboard.ALERT_EVALUATOR_CONFIG).evaluate(snapshot))
+
+    samples = measure(lambda: dashboard.get_processed_system_data(snapshot), min_time, repeat)
+    return result('get_processed_system_data', {'pipes': num_pipes, 'alerts': len(dashboard.alert_store.active)}, samples)
+
+
+def bench_alert_lookups(num_pipes, min_time, repeat):
+    """Per-mechanic alert lookup with every leaking pipe open as an alert"""
+    reset_state()
+    snapshot = make_snapshot(num_pipes)
+    dashboard.apply_site_evaluation(
+        dashboard.DEFAULT_SITE,
+        dashboard.SiteAlertEvaluator(**dashboard.ALERT_EVALUATOR_CONFIG).evaluate(snapshot))
+    mechanic_ids = list(dashboard.MAINTENANCE_EMPLOYEES)
+
+    def lookup():
+        for mechanic_id in mechanic_ids:
+            dashboard.get_assigned_leaks_for_mechanic(mechanic_id)
+
+    samples = measure(lookup, min_time, repeat)
+    return result('alert_lookup', {'pipes': num_pipes, 'alerts': len(dashboard.alert_store.active)}, samples)
+
+
+def bench_broadcast(num_clients, min_time, repeat):
+    """broadcast_update fan-out to N connected SSE clients"""
+    reset_state()
+    clients = [dashboard.ClientMailbox(max_pending=dashboard.SSE_MAX_PENDING) for _ in range(num_clients)]
+    with dashboard.sse_lock:
+        dashboard.sse_clients.extend(clients)
+
+    message = {'type': 'system_update', 'data': dashboard.get_processed_system_data(make_snapshot(15))}
+
+    def broadcast():
+        dashboard.broadcast_update(message)
+        # Drain so every put measures the queue path rather than coalescing
+        for client in clients:
+            client.get(timeout=0)
+
+    samples = measure(broadcast, min_time, repeat)
+    reset_state()
+    return result('broadcast_update', {'clients': num_clients}, samples)
+
+
+def bench_api_system_data(num_pipes, min_time, repeat):
+    """GET /api/system-data through the Flask test client as admin"""
+    reset_state()
+    snapshot = make_snapshot(num_pipes)
+    dashboard.firebase_config.get_system_data = lambda site='/water_system': snapshot
+    dashboard.services_pid = os.getpid()  # Keep before_request from connecting
+
+    client = dashboard.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = 'admin'
+        session['_fresh'] = True
+
+    def request():
+        response = client.get('/api/system-data')
+        assert response.status_code == 200
+
+    samples = measure(request, min_time, repeat)
+    return result('api_system_data', {'pipes': num_pipes}, samples)
+
+
+def wire_snapshot(num_pipes, wire):
+    """A snapshot as JSON text in the plain or bitset wire format, plus its index lookup"""
+    snapshot = make_snapshot(num_pipes)
+    indexes = {}
+    if wire == 'bitset':
+        for family in wire_format.ENCODED_FAMILIES:
+            ids = list(snapshot[family])
+            version = wire_format.index_version(ids)
+            indexes[version] = ids
+            snapshot[family] = wire_format.encode_values(ids, snapshot[family].values(), version)
+    return json.dumps(snapshot), indexes.get
+
+
+def bench_snapshot_parse(wire, cached=False):
+    """Parse a fetched snapshot (JSON text) into the plain maps the monitor reads.
+
+    Every call decodes from scratch unless `cached`, which measures an
+    unchanged snapshot served from wire_format's decode cache.
+    """
+    name = f"snapshot_parse_{wire}{'_cached' if cached else ''}"
+
+    def bench(num_pipes, min_time, repeat):
+        text, get_index = wire_snapshot(num_pipes, wire)
+
+        def parse():
+            if not cached:
+                wire_format.clear_decode_cache()
+            return wire_format.decode_snapshot(json.loads(text), get_index)
+
+        samples = measure(parse, min_time, repeat)
+        return result(name, {'pipes': num_pipes, 'bytes': len(text)}, samples)
+    return bench
+
+
+BENCHMARKS = {
+    'monitor_tick': ('pipes', bench_monitor_tick),
+    'get_processed_system_data': ('pipes', bench_processed_system_data),
+    'alert_lookup': ('pipes', bench_alert_lookups),
+    'broadcast_update': ('clients', bench_broadcast),
+    'api_system_data': ('pipes', bench_api_system_data),
+    'snapshot_parse_json': ('pipes', bench_snapshot_parse('json')),
+    'snapshot_parse_bitset': ('pipes', bench_snapshot_parse('bitset')),
+    'snapshot_parse_bitset_cached': ('pipes', bench_snapshot_parse('bitset', cached=True)),
+}
+
+
+def result_key(entry):
+    return f"{entry['name']}[{','.join(f'{k}={v}' for k, v in sorted(entry['params'].items()) if k != 'alerts')}]"
+
+
+def compare(results, baseline, threshold):
+    """Return the benchmarks whose median got slower than baseline * threshold"""
+    baseline_by_key = {result_key(entry): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        previous = baseline_by_key.get(result_key(entry))
+        if previous and entry['median_s'] > previous['median_s'] * threshold:
+            regressions.append((result_key(entry), previous['median_s'], entry['median_s']))
+    return regressions
+
+
+def parse_sizes(text):
+    return tuple(int(value) for value in text.split(',') if value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dashboard hot paths')
+    parser.add_argument('--pipes', type=parse_sizes, default=DEFAULT_PIPES, help='comma-separated pipe counts')
+    parser.add_argument('--clients', type=parse_sizes, default=DEFAULT_CLIENTS, help='comma-separated SSE client counts')
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help='run only these benchmarks')
+    parser.add_argument('--quick', action='store_true', help='small sizes and short runs')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timing batch')
+    parser.add_argument('--repeat', type=int, default=5, help='timing batches per benchmark')
+    parser.add_argument('--json', metavar='PATH', help='write results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown ratio vs baseline')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.pipes = tuple(n for n in args.pipes if n <= 1000)
+        args.clients = tuple(n for n in args.clients if n <= 1000)
+        args.min_time, args.repeat = 0.05, 3
+
+    results = []
+    for name, (axis, bench) in BENCHMARKS.items():
+        if args.only and name not in args.only:
+            continue
+        for size in (args.pipes if axis == 'pipes' else args.clients):
+            entry = bench(size, args.min_time, args.repeat)
+            results.append(entry)
+            print(f"{result_key(entry):55s} median {entry['median_s'] * 1000:10.3f} ms"
+                  f"  ({entry['ops_per_s']:,.0f} ops/s)")
+    reset_state()
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.2f}x baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Response compression for the JSON APIs and the SSE stream.
+
+gzip is always available; brotli is used when the optional `brotli` package
+is installed and the client accepts it.
+"""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Streaming-friendly; 11 is far too slow per message
+
+
+def parse_accept_encoding(header):
+    """Map each accepted coding to its q-value"""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """Best content coding we can produce for an Accept-Encoding header, or None"""
+    accepted = parse_accept_encoding(header)
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_body(data, encoding):
+    """Compress a complete response body"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+class StreamCompressor:
+    """Per-connection compressor whose output is flushed after every message.
+
+    Keeping one context for the whole connection lets repeated keys and
+    labels in later messages compress against earlier ones, while the sync
+    flush makes each message decodable as soon as it arrives.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, text):
+        data = text.encode('utf-8')
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
@@ -0,0 +1,119 @@
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_CREDENTIALS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'credentials.json')
+
+
+class CredentialStore:
+    """Pre-hashed login records loaded lazily from a JSON credential file.
+
+    Records look like {"M001": {"password_hash": "pbkdf2:...", "role": "mechanic"}}.
+    Nothing is read or hashed at import time: the file is loaded on the first
+    lookup, and successful verifications are remembered in a bounded cache so
+    repeated logins skip the PBKDF2 work.
+    """
+
+    def __init__(self, path=DEFAULT_CREDENTIALS_FILE, cache_size=1024):
+        self.path = path
+        self.cache_size = cache_size
+        self.load_ms = None
+        self._records = None
+        self._lock = threading.Lock()
+        self._verified = OrderedDict()  # Format: {(user_id, password_digest, hash): True}
+        # Per-process key so cached entries never hold anything password-derivable
+        self._cache_key = os.urandom(32)
+
+    def _ensure_loaded(self):
+        if self._records is not None:
+            return self._records
+
+        with self._lock:
+            if self._records is None:
+                start = time.perf_counter()
+                try:
+                    with open(self.path) as f:
+                        records = json.load(f)
+                except FileNotFoundError:
+                    print(f"Credential file not found: {self.path}")
+                    records = {}
+                self.load_ms = (time.perf_counter() - start) * 1000
+                self._records = records
+                print(f"Loaded {len(records)} credential records in {self.load_ms:.1f} ms")
+        return self._records
+
+    def get(self, user_id):
+        """Return the credential record for a user, or None"""
+        return self._ensure_loaded().get(user_id)
+
+    def verify(self, user_id, password):
+        """Check a password against the stored hash for a user"""
+        record = self.get(user_id)
+        if not record or not password:
+            return False
+
+        pwhash = record['password_hash']
+        digest = hmac.new(self._cache_key, password.encode('utf-8'), hashlib.sha256).digest()
+        cache_key = (user_id, digest, pwhash)
+
+        with self._lock:
+            if cache_key in self._verified:
+                self._verified.move_to_end(cache_key)
+                return True
+
+        # Only successful checks are cached; wrong guesses always pay full cost
+        if not check_password_hash(pwhash, password):
+            return False
+
+        with self._lock:
+            self._verified[cache_key] = True
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return True
+
+    def set_password(self, user_id, password, role=None):
+        """Hash and store a password for a user (used by the CLI)"""
+        records = self._ensure_loaded()
+        record = records.setdefault(user_id, {})
+        record['password_hash'] = generate_password_hash(password)
+        if role:
+            record['role'] = role
+
+    def save(self):
+        with self._lock:
+            with open(self.path, 'w') as f:
+                json.dump(self._records or {}, f, indent=2)
+                f.write('\n')
+
+
+def main(argv):
+    """Manage credential records: credential_store.py set <user_id>"""
+    import getpass
+    from employees import account_role
+
+    if len(argv) != 2 or argv[0] != 'set':
+        print("Usage: python credential_store.py set <user_id>")
+        return 1
+
+    # Only accounts in employees.py can log in; a password for any other id would be unusable
+    role = account_role(argv[1])
+    if role is None:
+        print(f"Unknown user {argv[1]}: add the account to employees.py first")
+        return 1
+
+    store = CredentialStore(os.environ.get('CREDENTIALS_FILE', DEFAULT_CREDENTIALS_FILE))
+    password = getpass.getpass(f"New password for {argv[1]}: ")
+    store.set_password(argv[1], password, role=role)
+    store.save()
+    print(f"Stored credentials for {argv[1]} in {store.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
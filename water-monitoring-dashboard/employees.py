@@ -0,0 +1,53 @@
+"""Accounts that can log in to the dashboard.
+
+Passwords for them live in the credential file (see credential_store.py);
+a credential record for an id that is not listed here can never be used.
+"""
+
+
+# User roles
+class UserRole:
+    ADMIN = 'admin'
+    MECHANIC = 'mechanic'
+
+
+# Predefined admin account
+ADMIN_CREDENTIALS = {
+    'username': 'admin',
+    'role': UserRole.ADMIN,
+    'name': 'Administrator'
+}
+
+# Predefined maintenance employees (in production, use database)
+MAINTENANCE_EMPLOYEES = {
+    'M001': {
+        'id': 'M001',
+        'role': UserRole.MECHANIC,
+        'name': 'John Smith',
+        'phone': '+1-555-0101',
+        'specialization': 'Pipe Leaks'
+    },
+    'M002': {
+        'id': 'M002',
+        'role': UserRole.MECHANIC,
+        'name': 'Jane Doe',
+        'phone': '+1-555-0102',
+        'specialization': 'Valve Maintenance'
+    },
+    'M003': {
+        'id': 'M003',
+        'role': UserRole.MECHANIC,
+        'name': 'Robert Johnson',
+        'phone': '+1-555-0103',
+        'specialization': 'Sensor Calibration'
+    }
+}
+
+
+def account_role(user_id):
+    """Role of a known account, or None if the id cannot log in"""
+    if user_id == ADMIN_CREDENTIALS['username']:
+        return UserRole.ADMIN
+    if user_id in MAINTENANCE_EMPLOYEES:
+        return UserRole.MECHANIC
+    return None
@@ -0,0 +1,260 @@
+"""Record /water_system snapshots to a compact file and replay them into the monitor.
+
+Recording happens inside the dashboard when FEED_RECORD_PATH is set. Replay:
+
+    python feed_recorder.py replay feed.jsonl.gz              # real time
+    python feed_recorder.py replay feed.jsonl.gz --speed 100  # 100x accelerated
+    python feed_recorder.py replay feed.jsonl.gz --speed max  # as fast as possible
+
+File format: gzip-compressed JSON lines. Each line carries 'o', the seconds
+since recording started, plus one of
+    {'full': snapshot}            keyframe (first line and every KEYFRAME_EVERY)
+    {'set': {...}, 'del': [...]}  changed / removed top-level subtrees
+    nothing else                  snapshot identical to the previous one
+
+A dashboard restarted with the same FEED_RECORD_PATH appends to the file and
+continues from its last offset, so offsets never go backwards (the downtime
+itself is not replayed).
+"""
+import argparse
+import atexit
+import gzip
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+KEYFRAME_EVERY = 500
+FLUSH_INTERVAL = 1.0  # seconds between compressed-stream flushes
+
+
+class FeedRecorder:
+    """Append snapshots to a gzip JSON-lines file as top-level deltas"""
+
+    def __init__(self, path, keyframe_every=KEYFRAME_EVERY):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        last_offset = resume_feed(path) if os.path.exists(path) else None
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._start = time.monotonic()
+        if last_offset is not None:
+            self._start -= last_offset
+        self._previous = None
+        self._since_keyframe = 0
+        self._last_flush = self._start
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def record(self, snapshot):
+        offset = round(time.monotonic() - self._start, 4)
+
+        with self._lock:
+            if self._previous is None or self._since_keyframe >= self.keyframe_every:
+                entry = {'o': offset, 'full': snapshot}
+                self._since_keyframe = 0
+            else:
+                entry = {'o': offset}
+                changed = {key: value for key, value in snapshot.items()
+                           if self._previous.get(key) != value}
+                removed = [key for key in self._previous if key not in snapshot]
+                if changed:
+                    entry['set'] = changed
+                if removed:
+                    entry['del'] = removed
+
+            self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self._since_keyframe += 1
+            self._previous = dict(snapshot)
+
+            # Sync-flush now and then so a killed process leaves a readable file
+            now = time.monotonic()
+            if now - self._last_flush >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def resume_feed(path):
+    """Return the last offset recorded in an existing feed (None if empty).
+
+    A recorder that was killed leaves its last gzip member without an end;
+    appending behind it would make the rest unreadable, so such a file is
+    first rewritten to its complete lines.
+    """
+    last_offset, complete_lines, torn = None, 0, False
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        while True:
+            try:
+                line = f.readline()
+            except EOFError:
+                torn = True
+                break
+            if not line:
+                break
+            try:
+                last_offset = json.loads(line)['o']
+            except ValueError:
+                torn = True
+                break
+            complete_lines += 1
+
+    if torn:
+        print(f"Feed {path} was not closed cleanly; keeping its first {complete_lines} entries")
+        tmp_path = path + '.tmp'
+        with gzip.open(path, 'rt', encoding='utf-8') as src, gzip.open(tmp_path, 'wt', encoding='utf-8') as dst:
+            dst.writelines(itertools.islice(src, complete_lines))
+        os.replace(tmp_path, path)
+    return last_offset
+
+
+def read_feed(path):
+    """Yield (offset_seconds, snapshot) for every recorded tick"""
+    snapshot = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        while True:
+            try:
+                line = f.readline()
+            except EOFError:
+                # Recorder was killed before closing; stop at the last flushed entry
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if 'full' in entry:
+                snapshot = entry['full']
+            else:
+                if 'set' in entry or 'del' in entry:
+                    snapshot = dict(snapshot)
+                    snapshot.update(entry.get('set', {}))
+                    for key in entry.get('del', []):
+                        snapshot.pop(key, None)
+            yield entry['o'], snapshot
+
+
+def replay(path, handle, speed=1.0):
+    """Feed recorded snapshots to handle(snapshot, offset, scheduled_at).
+
+    `speed` is the acceleration factor (10 = ten times faster); None replays
+    as fast as possible. `scheduled_at` is the monotonic time the snapshot was
+    due, so handlers can measure how far processing falls behind.
+    """
+    start = time.monotonic()
+    first_offset = None
+
+    for offset, snapshot in read_feed(path):
+        if first_offset is None:
+            first_offset = offset
+
+        if speed:
+            scheduled_at = start + (offset - first_offset) / speed
+            delay = scheduled_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            scheduled_at = time.monotonic()
+
+        handle(snapshot, offset, scheduled_at)
+
+
+def percentile_ms(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(pct / 100 * len(values)))] * 1000, 3)
+
+
+def replay_into_monitor(path, speed=1.0, site=None):
+    """Replay a feed through the dashboard's monitor tick and report throughput"""
+    # Import the app without connecting to Firebase or starting its own monitor
+    os.environ.setdefault('FIREBASE_DEFERRED_INIT', '1')
+    import app as dashboard
+
+    site = site or dashboard.DEFAULT_SITE
+    evaluator = dashboard.SiteAlertEvaluator(**dashboard.ALERT_EVALUATOR_CONFIG)
+    state = {'prev': {}, 'ticks': 0}
+    tick_seconds = []
+    alert_processing = []  # Snapshot due -> its alerts created, per alert
+
+    def handle(snapshot, offset, scheduled_at):
+        history_before = len(dashboard.alert_store.history)
+        tick_start = time.monotonic()
+
+        # Hold times follow the recording's clock, not the accelerated wall clock
+        state['prev'] = dashboard.process_snapshot(site, snapshot, evaluator, state['prev'], now=offset)
+
+        done = time.monotonic()
+        tick_seconds.append(done - tick_start)
+        new_alerts = len(dashboard.alert_store.history) - history_before
+        alert_processing.extend([done - scheduled_at] * new_alerts)
+        state['ticks'] += 1
+
+    wall_start = time.monotonic()
+    replay(path, handle, speed)
+    wall = time.monotonic() - wall_start
+
+    return {
+        'feed': path,
+        'speed': speed or 'max',
+        'snapshots': state['ticks'],
+        'wall_seconds': round(wall, 3),
+        'snapshots_per_second': round(state['ticks'] / wall, 1) if wall else None,
+        'tick_p50_ms': percentile_ms(tick_seconds, 50),
+        'tick_p99_ms': percentile_ms(tick_seconds, 99),
+        # Processing time in this process only: no Firebase fetch or client delivery
+        'alerts_created': len(alert_processing),
+        'alert_processing_p50_ms': percentile_ms(alert_processing, 50),
+        'alert_processing_p99_ms': percentile_ms(alert_processing, 99),
+        'active_alerts_at_end': len(dashboard.alert_store.active)
+    }
+
+
+def parse_speed(text):
+    return None if text == 'max' else float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay recorded /water_system feeds')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = subparsers.add_parser('replay', help='replay a feed into the monitor loop')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--speed', type=parse_speed, default=1.0,
+                               help="acceleration factor (e.g. 10, 1000) or 'max'")
+    replay_parser.add_argument('--site', help='site root to attribute alerts to')
+    replay_parser.add_argument('--json', metavar='PATH', help='write the report as JSON')
+
+    info_parser = subparsers.add_parser('info', help='summarize a feed file')
+    info_parser.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        count, last_offset = 0, 0
+        for last_offset, _ in read_feed(args.path):
+            count += 1
+        print(f"{args.path}: {count} snapshots over {last_offset:.1f} s "
+              f"({os.path.getsize(args.path) / 1024:.1f} KiB)")
+        return 0
+
+    report = replay_into_monitor(args.path, speed=args.speed, site=args.site)
+    for key, value in report.items():
+        print(f"{key:24s} {value}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,25 @@
-import firebase_admin
-from firebase_admin import credentials, db
 import os
+import threading
 from dotenv import load_dotenv
 
+from wire_format import INDEX_ROOT, decode_snapshot
+
 load_dotenv()
 
+# firebase_admin (and the Google client stack behind it) is imported on first
+# use rather than at module import, keeping worker boot and test collection fast
+_init_lock = threading.Lock()
+_init_result = None
+
+# Wire-format id lists by version; a version's list never changes
+_wire_indexes = {}
+
 def initialize_firebase():
     """Initialize Firebase connection"""
     try:
+        import firebase_admin
+        from firebase_admin import credentials
+        
         # Try to find service account key
         service_account_paths = [
             'serviceAccountKey.json',
@@ -46,20 +58,40 @@ def initialize_firebase():
         print(f"Firebase setup error: {e}")
         return False
 
-def get_firebase_ref():
+def ensure_firebase():
+    """Initialize Firebase once, on first use; later calls return the cached result"""
+    global _init_result
+    if _init_result is None:
+        with _init_lock:
+            if _init_result is None:
+                _init_result = initialize_firebase()
+    return _init_result
+
+def get_firebase_ref(path='/water_system'):
     """Get Firebase database reference"""
     try:
-        return db.reference('/water_system')
+        from firebase_admin import db
+        return db.reference(path)
     except:
         return None
 
-def get_system_data():
+def get_system_data(path='/water_system'):
     """Fetch all system data from Firebase"""
     try:
-        ref = get_firebase_ref()
+        ref = get_firebase_ref(path)
         if ref:
             data = ref.get()
-            return data if data else {}
+            return decode_snapshot(data, get_wire_index) if data else {}
     except Exception as e:
         print(f"Error fetching Firebase data: {e}")
     return {}
+
+def get_wire_index(version):
+    """Id list of a wire-format index version, fetched once (see wire_format.py)"""
+    ids = _wire_indexes.get(version)
+    if ids is None:
+        ref = get_firebase_ref(f"{INDEX_ROOT}/{version}")
+        ids = ref.get() if ref else None
+        if ids:
+            _wire_indexes[version] = ids
+    return ids
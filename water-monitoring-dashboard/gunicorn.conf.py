@@ -0,0 +1,9 @@
+"""gunicorn settings picked up from this directory (`gunicorn -w 4 app:app`)"""
+
+
+def post_worker_init(worker):
+    # Every worker polls the state bus and stands for monitor election, also
+    # when the app was only imported once in the master (--preload)
+    import app
+    if not app.FIREBASE_DEFERRED_INIT:
+        app.start_background_services()
@@ -0,0 +1,325 @@
+"""Synthetic high-rate sensor load for the dashboard's ingestion path.
+
+Generates /water_system-shaped updates for many virtual sites at a fixed
+offered rate and reports what the dashboard sustains:
+
+    python load_generator.py --rate 1000 --sites 10              # straight into the monitor tick
+    python load_generator.py --rate 100000 --sites 1000 --duration 30
+    python load_generator.py --target store --poll-interval 2   # through a Firebase stand-in
+    python load_generator.py --target store --wire bitset        # stand-in holds encoded families
+    python load_generator.py --rate 10000 --json load.json
+
+Targets:
+    ingest  every update is handed to process_snapshot as soon as it is due,
+            one SiteAlertEvaluator per site (the monitor tick without the fetch)
+    store   a writer thread writes updates into an in-memory Firebase stand-in
+            and a poller reads every site through get_system_data each
+            --poll-interval seconds, like monitor_leaks / shard_worker do;
+            with --wire bitset it stores the compact encoding of wire_format.py
+
+Load is open loop: update i is due at start + i / rate whether or not the
+previous one was processed, so an overloaded dashboard shows up as a
+growing backlog and alert latency instead of a silently lower rate. Alert
+latency is measured from the update that started a leak to the alert.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Import the app without connecting to Firebase or starting the monitor
+os.environ.setdefault('FIREBASE_DEFERRED_INIT', '1')
+
+import app as dashboard  # noqa: E402
+from benchmark import make_snapshot, reset_state  # noqa: E402
+from feed_recorder import percentile_ms  # noqa: E402
+from wire_format import ENCODED_FAMILIES, decode_snapshot, encode_values, index_version  # noqa: E402
+
+BATCH_SIZE = 1000  # Due updates handled between clock checks
+
+
+class VirtualSite:
+    """One simulated site whose state drifts a little with every update.
+
+    Updates are copy-on-write: only the subtrees that change are new dicts,
+    the rest is shared with the previous snapshot, which is what the monitor
+    compares against.
+    """
+
+    def __init__(self, site, num_pipes, seed):
+        self.site = site
+        self.rng = random.Random(seed)
+        self.snapshot = make_snapshot(num_pipes, leak_ratio=0, seed=seed)
+        self.pipe_ids = list(self.snapshot['leaks'])
+
+    def next_update(self, leak_rate):
+        """Return (snapshot, change); change is ('onset'|'clear', pipe_id) or None"""
+        rng = self.rng
+        previous = self.snapshot
+        snapshot = dict(previous)
+        sensors = previous['sensors']
+        snapshot['timestamp'] = datetime.now().isoformat()
+        snapshot['sensors'] = {
+            'pH': round(min(8.5, max(6.5, sensors['pH'] + rng.uniform(-0.05, 0.05))), 2),
+            'turbidity': round(min(20.0, max(0.0, sensors['turbidity'] + rng.uniform(-0.2, 0.2))), 2),
+            'salinity': round(min(2.0, max(0.0, sensors['salinity'] + rng.uniform(-0.02, 0.02))), 3),
+            'flow': round(min(5.0, max(0.0, sensors['flow'] + rng.uniform(-0.1, 0.1))), 2)
+        }
+        # Stay clear of the low-level threshold so only leaks open alerts
+        snapshot['water_level'] = min(95, max(40, previous['water_level'] + rng.randint(-1, 1)))
+
+        change = None
+        if rng.random() < leak_rate:
+            pipe_id = rng.choice(self.pipe_ids)
+            leaking = int(not previous['leaks'][pipe_id])
+            active = leaking & previous['water_flow'][pipe_id]
+            snapshot['leaks'] = dict(previous['leaks'], **{pipe_id: leaking})
+            if active != previous['active_leaks'][pipe_id]:
+                snapshot['active_leaks'] = dict(previous['active_leaks'], **{pipe_id: active})
+                change = ('onset' if active else 'clear', pipe_id)
+
+        self.snapshot = snapshot
+        return snapshot, change
+
+
+class FirebaseStandIn:
+    """In-memory /water_system tree per site, read through firebase_config.get_system_data.
+
+    With wire='bitset' families are stored encoded, as the simulator writes
+    them with WIRE_FORMAT=bitset, and decoded on read like a Firebase fetch.
+    """
+
+    def __init__(self, wire='json'):
+        self.wire = wire
+        self._data = {}
+        self._indexes = {}  # Format: {version: [id, ...]}
+        self._encoded = {}  # Format: {(site, family): (plain map, encoded)}
+        self._lock = threading.Lock()
+
+    def _encode(self, site, snapshot):
+        stored = dict(snapshot)
+        for family in ENCODED_FAMILIES:
+            plain = snapshot.get(family)
+            if plain is None:
+                continue
+            # Updates are copy-on-write, so an unchanged family is the same object
+            cached = self._encoded.get((site, family))
+            if cached and cached[0] is plain:
+                stored[family] = cached[1]
+                continue
+            ids = list(plain)
+            version = index_version(ids)
+            self._indexes.setdefault(version, ids)
+            stored[family] = encode_values(ids, plain.values(), version)
+            self._encoded[(site, family)] = (plain, stored[family])
+        return stored
+
+    def write(self, site, snapshot):
+        with self._lock:
+            self._data[site] = self._encode(site, snapshot) if self.wire == 'bitset' else snapshot
+
+    def get_system_data(self, path='/water_system'):
+        with self._lock:
+            data = self._data.get(path, {})
+        return decode_snapshot(data, self._indexes.get)
+
+
+class LoadRun:
+    """Shared bookkeeping for one run: leak onsets, tick times, alert latencies"""
+
+    def __init__(self, sites, num_pipes, leak_rate):
+        self.sites = [VirtualSite(site, num_pipes, seed) for seed, site in enumerate(sites)]
+        self.leak_rate = leak_rate
+        self.evaluators = {site: dashboard.SiteAlertEvaluator(**dashboard.ALERT_EVALUATOR_CONFIG) for site in sites}
+        self.prev_snapshots = {site: {} for site in sites}
+        self.generated = 0
+        self.ingested = 0
+        self.tick_seconds = []
+        self.alert_latencies = []
+        self._onsets = {}  # Format: {alert_id: monotonic time the leak started}
+        self._lock = threading.Lock()
+
+    def generate(self, index, scheduled_at):
+        """Produce update `index`, round-robin over the sites"""
+        virtual_site = self.sites[index % len(self.sites)]
+        snapshot, change = virtual_site.next_update(self.leak_rate)
+        self.generated += 1
+
+        if change:
+            kind, pipe_id = change
+            alert_id = dashboard.site_alert_id(virtual_site.site, f"leak_{pipe_id}")
+            with self._lock:
+                if kind == 'onset':
+                    self._onsets.setdefault(alert_id, scheduled_at)
+                else:
+                    # Cleared before an alert was opened; nothing to measure
+                    self._onsets.pop(alert_id, None)
+        return virtual_site.site, snapshot
+
+    def ingest(self, site, snapshot):
+        """Run one monitor tick and match any new alerts to their leak onsets"""
+        history_before = len(dashboard.alert_store.history)
+        tick_start = time.monotonic()
+
+        self.prev_snapshots[site] = dashboard.process_snapshot(
+            site, snapshot, self.evaluators[site], self.prev_snapshots[site])
+
+        done = time.monotonic()
+        self.tick_seconds.append(done - tick_start)
+        self.ingested += 1
+
+        for alert in dashboard.alert_store.history[history_before:]:
+            with self._lock:
+                onset = self._onsets.pop(alert['id'], None)
+            if onset is not None:
+                self.alert_latencies.append(done - onset)
+
+    @property
+    def pending_onsets(self):
+        return len(self._onsets)
+
+
+def run_ingest(run, rate, duration):
+    """Hand every due update straight to the monitor tick; returns updates left undone"""
+    start = time.monotonic()
+    end = start + duration
+    index = 0
+
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        due = int((now - start) * rate)
+        if index >= due:
+            time.sleep(min(end - now, (index + 1) / rate - (now - start)))
+            continue
+        # Bounded batches so an overloaded run still stops on time
+        batch_end = min(due, index + BATCH_SIZE)
+        while index < batch_end:
+            site, snapshot = run.generate(index, start + index / rate)
+            run.ingest(site, snapshot)
+            index += 1
+
+    return max(0, int(duration * rate) - index)
+
+
+def run_store(run, rate, duration, poll_interval, wire='json'):
+    """Write updates into a Firebase stand-in and poll it like the monitor does"""
+    stand_in = FirebaseStandIn(wire)
+    dashboard.firebase_config.get_system_data = stand_in.get_system_data
+    for virtual_site in run.sites:
+        stand_in.write(virtual_site.site, virtual_site.snapshot)
+
+    start = time.monotonic()
+    end = start + duration
+    stop_event = threading.Event()
+    backlog = {'updates': 0}
+
+    def writer():
+        index = 0
+        while not stop_event.is_set():
+            now = time.monotonic()
+            if now >= end:
+                break
+            due = int((now - start) * rate)
+            if index >= due:
+                time.sleep(min(end - now, (index + 1) / rate - (now - start)))
+                continue
+            batch_end = min(due, index + BATCH_SIZE)
+            while index < batch_end:
+                site, snapshot = run.generate(index, start + index / rate)
+                stand_in.write(site, snapshot)
+                index += 1
+        backlog['updates'] = max(0, int(duration * rate) - index)
+
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    writer_thread.start()
+
+    # One pass over every site per interval, plus a final pass after the writer stops
+    while True:
+        tick_start = time.monotonic()
+        finished = not writer_thread.is_alive()
+        for virtual_site in run.sites:
+            run.ingest(virtual_site.site, dashboard.get_system_data(virtual_site.site))
+        if finished:
+            break
+        stop_event.wait(max(0.0, min(poll_interval - (time.monotonic() - tick_start), end - time.monotonic())))
+
+    return backlog['updates']
+
+
+def run_load(rate, sites, duration, pipes=15, leak_rate=0.001, target='ingest', poll_interval=2.0,
+             wire='json', verbose=False):
+    """Run one load test and return the report"""
+    reset_state()
+    site_roots = [dashboard.DEFAULT_SITE] if sites == 1 else [f"/load/site-{i:05d}" for i in range(sites)]
+    run = LoadRun(site_roots, pipes, leak_rate)
+
+    # Alert and assignment logging would dominate the tick at these rates
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    wall_start = time.monotonic()
+    with output:
+        if target == 'store':
+            behind = run_store(run, rate, duration, poll_interval, wire)
+        else:
+            behind = run_ingest(run, rate, duration)
+    wall = time.monotonic() - wall_start
+
+    return {
+        'target': target,
+        'wire': wire if target == 'store' else 'json',
+        'sites': sites,
+        'pipes': pipes,
+        'offered_rate': rate,
+        'duration_seconds': duration,
+        'updates_generated': run.generated,
+        'updates_behind_schedule': behind,
+        'generated_per_second': round(run.generated / wall, 1) if wall else None,
+        'ticks_ingested': run.ingested,
+        'ingested_per_second': round(run.ingested / wall, 1) if wall else None,
+        'tick_p50_ms': percentile_ms(run.tick_seconds, 50),
+        'tick_p99_ms': percentile_ms(run.tick_seconds, 99),
+        'alerts_created': len(run.alert_latencies),
+        'alert_latency_p50_ms': percentile_ms(run.alert_latencies, 50),
+        'alert_latency_p99_ms': percentile_ms(run.alert_latencies, 99),
+        'leaks_without_alert': run.pending_onsets,
+        'active_alerts_at_end': len(dashboard.alert_store.active)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Drive the dashboard ingestion path with synthetic sensor load')
+    parser.add_argument('--rate', type=float, default=1000, help='offered updates per second across all sites')
+    parser.add_argument('--sites', type=int, default=10, help='number of virtual sites')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to generate load for')
+    parser.add_argument('--pipes', type=int, default=15, help='pipes per site')
+    parser.add_argument('--leak-rate', type=float, default=0.001,
+                        help='probability that an update starts or clears a leak')
+    parser.add_argument('--target', choices=('ingest', 'store'), default='ingest')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='seconds between polls of the stand-in (store target)')
+    parser.add_argument('--wire', choices=('json', 'bitset'), default='json',
+                        help='encoding of leak/flow/tap maps in the stand-in (store target)')
+    parser.add_argument('--verbose', action='store_true', help="keep the dashboard's alert logging")
+    parser.add_argument('--json', metavar='PATH', help='write the report as JSON')
+    args = parser.parse_args(argv)
+
+    report = run_load(args.rate, args.sites, args.duration, pipes=args.pipes, leak_rate=args.leak_rate,
+                      target=args.target, poll_interval=args.poll_interval, wire=args.wire,
+                      verbose=args.verbose)
+    for key, value in report.items():
+        print(f"{key:24s} {value}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
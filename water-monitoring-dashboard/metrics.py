@@ -0,0 +1,148 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Default latency buckets in seconds (1 ms .. 10 s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets for small counts such as queue depth
+DEPTH_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Counter:
+    """Monotonically increasing counter"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        yield self.name, '', self._value
+
+
+class Gauge(Counter):
+    """Value that can go up and down (e.g. open SSE connections)"""
+
+    type_name = 'gauge'
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and two additions"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the wall time of a with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def samples(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            yield f"{self.name}_bucket", f'{{le="{bound}"}}', cumulative
+        cumulative += counts[-1]
+        yield f"{self.name}_bucket", '{le="+Inf"}', cumulative
+        yield f"{self.name}_sum", '', total
+        yield f"{self.name}_count", '', cumulative
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation):
+        return self.register(Counter(name, documentation))
+
+    def gauge(self, name, documentation):
+        return self.register(Gauge(name, documentation))
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, buckets))
+
+    def render(self):
+        """Render all metrics in Prometheus exposition format 0.0.4"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+# Shared registry for the dashboard process
+registry = MetricsRegistry()
+
+GET_SYSTEM_DATA_SECONDS = registry.histogram(
+    'dashboard_get_system_data_seconds', 'Time spent fetching a /water_system snapshot')
+MONITOR_TICK_SECONDS = registry.histogram(
+    'dashboard_monitor_tick_seconds', 'Duration of one leak monitor tick (fetch, evaluate, broadcast)')
+BROADCAST_SECONDS = registry.histogram(
+    'dashboard_broadcast_seconds', 'Time to fan one message out to every SSE client queue')
+SSE_QUEUE_DEPTH = registry.histogram(
+    'dashboard_sse_queue_depth', 'SSE client mailbox depth observed when a message is enqueued', DEPTH_BUCKETS)
+SSE_DROPPED_TOTAL = registry.counter(
+    'dashboard_sse_dropped_total', 'Oldest pending SSE messages dropped because a client mailbox was full')
+SSE_COALESCED_TOTAL = registry.counter(
+    'dashboard_sse_coalesced_total', 'Undelivered system_update messages replaced by a newer one')
+SSE_CONNECTIONS = registry.gauge(
+    'dashboard_sse_connections', 'Currently open SSE connections')
+SSE_CONNECTIONS_TOTAL = registry.counter(
+    'dashboard_sse_connections_total', 'SSE connections opened since start')
+SNAPSHOT_HELD_TOTAL = registry.counter(
+    'dashboard_snapshot_held_total', 'Monitor ticks whose first read was torn or stale and had to be re-read')
+SNAPSHOT_SKIPPED_TOTAL = registry.counter(
+    'dashboard_snapshot_skipped_total', 'Monitor ticks skipped because no consistent snapshot arrived in time')
@@ -0,0 +1,177 @@
+import bisect
+import hashlib
+import multiprocessing
+import queue
+import threading
+import time
+
+from alert_hysteresis import SiteAlertEvaluator
+from firebase_config import initialize_firebase, get_system_data
+from snapshot_consistency import SnapshotGate
+
+
+class ConsistentHashRing:
+    """Consistent hash ring mapping site roots onto shard names.
+
+    Each shard is placed on the ring `replicas` times so sites spread evenly,
+    and adding or removing a shard only moves the sites next to it.
+    """
+
+    def __init__(self, nodes=(), replicas=64):
+        self.replicas = replicas
+        self._keys = []
+        self._ring = {}
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16)
+
+    def add_node(self, node):
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}")
+            self._ring[point] = node
+            bisect.insort(self._keys, point)
+
+    def remove_node(self, node):
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}")
+            if self._ring.pop(point, None) is not None:
+                self._keys.remove(point)
+
+    def get_node(self, key):
+        """Return the shard responsible for a key"""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[self._keys[index]]
+
+    def assign(self, keys):
+        """Group keys by shard: {node: [key, ...]}"""
+        assignment = {}
+        for key in keys:
+            assignment.setdefault(self.get_node(key), []).append(key)
+        return assignment
+
+
+def shard_worker(shard_name, sites, out_queue, stop_event, interval, evaluator_config, snapshot_max_wait=0.5,
+                 restored=None):
+    """Poll a group of sites in a worker process and report alert state changes.
+
+    Each site keeps its own SiteAlertEvaluator here, so debouncing happens
+    next to the data and only small results go back to the dashboard:
+    (site, snapshot or None, evaluation). The snapshot is only sent when it
+    changed since the previous tick. Torn or stale reads are held back by
+    a SnapshotGate; a skipped site sends nothing that tick. `restored` maps
+    sites to the (pipe ids, low water) alerts already open in the dashboard.
+    """
+    initialize_firebase()
+    evaluators = {site: SiteAlertEvaluator(**evaluator_config) for site in sites}
+    for site, (pipe_ids, low_water_level) in (restored or {}).items():
+        evaluators[site].restore(pipe_ids, low_water_level)
+    gates = {site: SnapshotGate(lambda site=site: get_system_data(site), max_wait=snapshot_max_wait)
+             for site in sites}
+    prev_snapshots = {}
+
+    print(f"Monitor shard {shard_name} watching {len(sites)} site(s)")
+
+    while not stop_event.is_set():
+        tick_start = time.monotonic()
+
+        for site in sites:
+            try:
+                system_data, _ = gates[site].read()
+                if system_data is None:
+                    continue
+                evaluation = evaluators[site].evaluate(system_data)
+
+                snapshot = None
+                if system_data != prev_snapshots.get(site):
+                    snapshot = system_data
+                    prev_snapshots[site] = system_data
+
+                out_queue.put((site, snapshot, evaluation))
+            except Exception as e:
+                print(f"Error in shard {shard_name} monitoring {site}: {e}")
+
+        elapsed = time.monotonic() - tick_start
+        stop_event.wait(max(0.0, interval - elapsed))
+
+
+class ShardedMonitor:
+    """Run the leak monitor for many sites across a pool of worker processes.
+
+    Sites are spread over the shards with a ConsistentHashRing. Results are
+    pulled off a shared queue by one consumer thread in the dashboard process
+    and handed to `handle_result(site, snapshot, evaluation)`, which applies
+    them to the alert store and broadcasts to SSE clients.
+    """
+
+    def __init__(self, sites, handle_result, workers=None, interval=2, evaluator_config=None,
+                 snapshot_max_wait=0.5, restored_state=None):
+        self.sites = list(sites)
+        self.handle_result = handle_result
+        self.interval = interval
+        self.evaluator_config = evaluator_config or {}
+        self.snapshot_max_wait = snapshot_max_wait
+        self.restored_state = restored_state  # site -> (pipe ids, low water) of its open alerts
+
+        workers = workers or multiprocessing.cpu_count()
+        self.shard_names = [f"shard-{i}" for i in range(max(1, min(workers, len(self.sites))))]
+        self.ring = ConsistentHashRing(self.shard_names)
+
+        # Spawn so worker processes never inherit Flask or Firebase state
+        self._ctx = multiprocessing.get_context('spawn')
+        self._out_queue = self._ctx.Queue()
+        self._stop_event = self._ctx.Event()
+        self._processes = {}
+        self._consumer = None
+
+    def _start_shard(self, shard_name, sites):
+        # Seed debouncing with the alerts open right now (also when restarting a shard)
+        restored = {site: self.restored_state(site) for site in sites} if self.restored_state else None
+        process = self._ctx.Process(
+            target=shard_worker,
+            args=(shard_name, sites, self._out_queue, self._stop_event,
+                  self.interval, self.evaluator_config, self.snapshot_max_wait, restored),
+            name=f"monitor-{shard_name}",
+            daemon=True
+        )
+        process.start()
+        self._processes[shard_name] = (process, sites)
+
+    def start(self):
+        for shard_name, sites in self.ring.assign(self.sites).items():
+            self._start_shard(shard_name, sites)
+
+        self._consumer = threading.Thread(target=self._consume, daemon=True)
+        self._consumer.start()
+        print(f"Sharded leak monitoring started: {len(self.sites)} sites on {len(self._processes)} processes")
+
+    def _consume(self):
+        last_health_check = time.monotonic()
+
+        while not self._stop_event.is_set():
+            try:
+                site, snapshot, evaluation = self._out_queue.get(timeout=self.interval)
+                self.handle_result(site, snapshot, evaluation)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"Error applying shard result: {e}")
+
+            if time.monotonic() - last_health_check >= self.interval:
+                self._restart_dead_shards()
+                last_health_check = time.monotonic()
+
+    def _restart_dead_shards(self):
+        for shard_name, (process, sites) in list(self._processes.items()):
+            if not process.is_alive() and not self._stop_event.is_set():
+                print(f"Monitor {shard_name} exited (code {process.exitcode}), restarting")
+                self._start_shard(shard_name, sites)
+
+    def stop(self):
+        self._stop_event.set()
+        for process, _ in self._processes.values():
+            process.join(timeout=self.interval * 2)
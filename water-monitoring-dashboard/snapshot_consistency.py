@@ -0,0 +1,89 @@
+import time
+
+# Seconds between re-reads of a snapshot that failed the checks
+RETRY_INTERVAL = 0.05
+
+
+def check_snapshot(snapshot, last_tick=None):
+    """Why a /water_system snapshot should not be evaluated yet, or None if it is fine.
+
+    'stale'  its tick is older than one already evaluated (out-of-order read)
+    'torn'   active_leaks disagrees with leaks & water_flow, i.e. the read
+             landed between two of a writer's separate subtree writes
+    Pipes missing from one of the maps are not cross-checked.
+    """
+    tick = snapshot.get('tick')
+    if last_tick is not None and isinstance(tick, int) and tick < last_tick:
+        return 'stale'
+
+    leaks, flow, active = snapshot.get('leaks'), snapshot.get('water_flow'), snapshot.get('active_leaks')
+    if not (isinstance(leaks, dict) and isinstance(flow, dict) and isinstance(active, dict)):
+        return None
+
+    for pipe_id, status in active.items():
+        leaking, flowing = leaks.get(pipe_id), flow.get(pipe_id)
+        if leaking is None or flowing is None:
+            continue
+        if (status == 1) != (leaking == 1 and flowing == 1):
+            return 'torn'
+    return None
+
+
+class SnapshotGate:
+    """Reads a site's snapshot and holds evaluation back until it is consistent.
+
+    An inconsistent or stale read is retried every RETRY_INTERVAL for at most
+    `max_wait` seconds; if none passes, the tick is skipped so the monitor
+    never opens or resolves alerts from a half-written state. After
+    `max_skips` skipped ticks in a row the latest read is evaluated anyway,
+    so a writer that never satisfies the checks cannot silence alerts.
+    """
+
+    def __init__(self, fetch, max_wait=0.5, max_skips=3):
+        self.fetch = fetch
+        self.max_wait = max_wait
+        self.max_skips = max_skips
+        self.last_tick = None
+        self.consecutive_skips = 0
+        self._checked = None  # (leaks, water_flow, active_leaks) maps that last passed
+
+    def _problem(self, snapshot):
+        maps = (snapshot.get('leaks'), snapshot.get('water_flow'), snapshot.get('active_leaks'))
+        # Decoded wire-format maps are reused while unchanged; skip the pipe scan for them
+        if self._checked and all(a is b for a, b in zip(maps, self._checked)):
+            return check_snapshot({'tick': snapshot.get('tick')}, self.last_tick)
+        problem = check_snapshot(snapshot, self.last_tick)
+        if problem is None:
+            self._checked = maps
+        return problem
+
+    def _accept(self, snapshot):
+        tick = snapshot.get('tick')
+        if isinstance(tick, int):
+            self.last_tick = tick
+        self.consecutive_skips = 0
+        return snapshot
+
+    def read(self):
+        """Return (snapshot or None, outcome); outcome is 'ok', 'recovered', 'skipped' or 'forced'"""
+        deadline = time.monotonic() + self.max_wait
+        snapshot = self.fetch()
+        problem = self._problem(snapshot)
+        if problem is None:
+            return self._accept(snapshot), 'ok'
+
+        while time.monotonic() + RETRY_INTERVAL <= deadline:
+            time.sleep(RETRY_INTERVAL)
+            snapshot = self.fetch()
+            problem = self._problem(snapshot)
+            if problem is None:
+                return self._accept(snapshot), 'recovered'
+
+        self.consecutive_skips += 1
+        if self.consecutive_skips > self.max_skips:
+            print(f"Snapshot still {problem} after {self.max_skips} skipped ticks; evaluating it anyway")
+            self.last_tick = None
+            return self._accept(snapshot), 'forced'
+
+        print(f"Skipping monitor tick: snapshot {problem} for {self.max_wait:.2f} s")
+        return None, 'skipped'
@@ -0,0 +1,143 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+
+# Message types where only the newest one per site matters to a client
+COALESCED_TYPES = ('system_update',)
+
+
+class ClientMailbox:
+    """Per-client SSE mailbox that never blocks the publisher.
+
+    State messages (COALESCED_TYPES) occupy one slot per (type, site): a newer
+    one replaces the undelivered older one and moves to the back, so a slow
+    client only ever receives the latest state. Every other message (alerts,
+    assignments) is kept in order; when more than `max_pending` are waiting
+    the oldest one is dropped instead of disconnecting the client.
+    """
+
+    def __init__(self, max_pending=100, accepts=None):
+        self.max_pending = max_pending
+        self.accepts = accepts
+        self.coalesced = 0
+        self.dropped = 0
+        self._pending = OrderedDict()  # Format: {slot_key or sequence: (event_id, message)}
+        self._events = 0  # Non-coalesced messages currently pending
+        self._sequence = 0
+        self._closed = False
+        self._ready = threading.Condition(threading.Lock())
+
+    def put(self, message, event_id=None):
+        """Queue a message; returns 'queued', 'coalesced', 'dropped' or None if filtered"""
+        if self.accepts is not None and not self.accepts(message):
+            return None
+
+        with self._ready:
+            if self._closed:
+                return None
+
+            outcome = 'queued'
+            if message.get('type') in COALESCED_TYPES:
+                key = ('state', message.get('type'), message.get('site'))
+                if self._pending.pop(key, None) is not None:
+                    self.coalesced += 1
+                    outcome = 'coalesced'
+            else:
+                self._sequence += 1
+                key = self._sequence
+                self._events += 1
+                if self._events > self.max_pending:
+                    self._drop_oldest_event()
+                    outcome = 'dropped'
+
+            self._pending[key] = (event_id, message)
+            self._ready.notify()
+            return outcome
+
+    def _drop_oldest_event(self):
+        for key in self._pending:
+            if not isinstance(key, tuple):
+                del self._pending[key]
+                self._events -= 1
+                self.dropped += 1
+                return
+
+    def get(self, timeout=None):
+        """Next (event_id, message) in delivery order, or None on timeout / close"""
+        with self._ready:
+            if not self._pending and not self._closed:
+                self._ready.wait(timeout)
+            if not self._pending:
+                return None
+            key, entry = self._pending.popitem(last=False)
+            if not isinstance(key, tuple):
+                self._events -= 1
+            return entry
+
+    def close(self):
+        with self._ready:
+            self._closed = True
+            self._pending.clear()
+            self._events = 0
+            self._ready.notify_all()
+
+    def qsize(self):
+        return len(self._pending)
+
+
+class ReplayLog:
+    """Bounded ring of recent broadcasts with ids scoped to this process.
+
+    Event ids are "<scope>:<seq>", where the scope is unique to the process
+    that issued them. Reconnecting EventSource clients send the last id they
+    saw as Last-Event-ID; since() hands back everything after it, or None
+    when the id was issued by another worker or an earlier process, or the
+    gap is no longer covered by the ring, and the client has to resync from
+    the REST endpoints instead.
+    """
+
+    def __init__(self, size=1000):
+        self._entries = deque(maxlen=size)  # Format: [(seq, event_id, message)]
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.scope = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+        self._entries.clear()
+        self._last_seq = 0
+
+    def _check_fork(self):
+        # Workers forked from a preloading master must not share the master's scope
+        if self._pid != os.getpid():
+            self._reset()
+
+    def append(self, message):
+        """Store a message and return its event id"""
+        with self._lock:
+            self._check_fork()
+            self._last_seq += 1
+            event_id = f"{self.scope}:{self._last_seq}"
+            self._entries.append((self._last_seq, event_id, message))
+            return event_id
+
+    @property
+    def last_id(self):
+        return f"{self.scope}:{self._last_seq}"
+
+    def since(self, last_id):
+        """Entries (event_id, message) after last_id, or None if they cannot be replayed here"""
+        with self._lock:
+            self._check_fork()
+            scope, _, seq = str(last_id).rpartition(':')
+            if scope != self.scope or not seq.isdigit() or int(seq) > self._last_seq:
+                return None  # Issued by another worker or process
+            last_seq = int(seq)
+            if last_seq == self._last_seq:
+                return []
+            if not self._entries or self._entries[0][0] > last_seq + 1:
+                return None
+            # Seqs are contiguous, so the first wanted entry is at a fixed offset
+            start = last_seq + 1 - self._entries[0][0]
+            return [self._entries[i][1:] for i in range(start, len(self._entries))]
@@ -0,0 +1,133 @@
+"""Measure dashboard cold start with `python -X importtime` and enforce a budget.
+
+Usage:
+    python startup_profile.py                      # profile `import app`
+    python startup_profile.py --deferred           # same, with FIREBASE_DEFERRED_INIT=1
+    python startup_profile.py --budget-ms 800      # exit 1 if cold start is over budget
+    python startup_profile.py --json report.json   # also write the report as JSON
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Child script: import the module and print the wall time it took
+# (the stderr marker separates interpreter startup from the profiled import)
+PROBE = (
+    "import time, sys\n"
+    "sys.stderr.write('IMPORTTIME_START\\n'); sys.stderr.flush()\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "sys.stdout.write('IMPORT_WALL_MS=%.3f\\n' % ((time.perf_counter() - start) * 1000))\n"
+)
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into [{'module', 'self_us', 'cumulative_us', 'depth'}]"""
+    if 'IMPORTTIME_START' in stderr:
+        stderr = stderr.split('IMPORTTIME_START', 1)[1]
+
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            entries.append({
+                'module': name.strip(),
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                # Nested imports are indented by two spaces per level
+                'depth': (len(name) - len(name.lstrip()) - 1) // 2
+            })
+        except ValueError:
+            continue
+    return entries
+
+
+def profile_import(module='app', deferred=False):
+    """Import `module` in a fresh interpreter and return the profiling report"""
+    env = dict(os.environ)
+    if deferred:
+        env['FIREBASE_DEFERRED_INIT'] = '1'
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module)],
+        cwd=HERE, env=env, capture_output=True, text=True
+    )
+
+    wall_ms = None
+    for line in result.stdout.splitlines():
+        if line.startswith('IMPORT_WALL_MS='):
+            wall_ms = float(line.split('=', 1)[1])
+
+    entries = parse_importtime(result.stderr)
+    return {
+        'module': module,
+        'deferred': deferred,
+        'returncode': result.returncode,
+        'wall_ms': wall_ms,
+        'import_ms': sum(e['cumulative_us'] for e in entries if e['depth'] == 0) / 1000,
+        'modules_imported': len(entries),
+        'entries': entries,
+        'errors': [line for line in result.stderr.splitlines()
+                   if not line.startswith('import time:') and line != 'IMPORTTIME_START']
+    }
+
+
+def print_report(report, top=20):
+    print(f"Cold start profile for `import {report['module']}`"
+          f" ({'deferred' if report['deferred'] else 'eager'} Firebase init)")
+
+    if report['returncode'] != 0:
+        print("Import failed:")
+        for line in report['errors'][-10:]:
+            print(f"  {line}")
+        return
+
+    print(f"  Wall time:        {report['wall_ms']:.1f} ms")
+    print(f"  Import time:      {report['import_ms']:.1f} ms")
+    print(f"  Modules imported: {report['modules_imported']}")
+
+    # Depth 0 is the profiled module itself; depth 1 are the imports it makes
+    print(f"\nTop {top} imports of `{report['module']}` by cumulative time:")
+    direct = [e for e in report['entries'] if e['depth'] == 1]
+    for entry in sorted(direct, key=lambda e: e['cumulative_us'], reverse=True)[:top]:
+        print(f"  {entry['cumulative_us'] / 1000:9.1f} ms  {entry['module']}")
+
+    print(f"\nTop {top} modules by self time:")
+    for entry in sorted(report['entries'], key=lambda e: e['self_us'], reverse=True)[:top]:
+        print(f"  {entry['self_us'] / 1000:9.1f} ms  {entry['module']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile dashboard import time')
+    parser.add_argument('--module', default='app', help='module to import (default: app)')
+    parser.add_argument('--deferred', action='store_true', help='set FIREBASE_DEFERRED_INIT=1')
+    parser.add_argument('--top', type=int, default=20, help='rows to show per table')
+    parser.add_argument('--budget-ms', type=float, help='fail if wall time exceeds this')
+    parser.add_argument('--json', metavar='PATH', help='write the full report as JSON')
+    args = parser.parse_args(argv)
+
+    report = profile_import(args.module, deferred=args.deferred)
+    print_report(report, top=args.top)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if report['returncode'] != 0:
+        return 2
+    if args.budget_ms is not None and report['wall_ms'] > args.budget_ms:
+        print(f"\nFAIL: cold start {report['wall_ms']:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+        return 1
+    if args.budget_ms is not None:
+        print(f"\nOK: cold start within budget of {args.budget_ms:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
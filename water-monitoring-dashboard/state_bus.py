@@ -0,0 +1,287 @@
+"""Shared state bus so several dashboard worker processes act as one.
+
+    STATE_BUS_URL=local                          single process (default, no-op bus)
+    STATE_BUS_URL=sqlite:////tmp/dashboard.db    workers on one host share a SQLite file
+
+A bus does three things: publish messages to the *other* workers, keep the
+last "retained" message per channel (and a backlog of recent messages) for
+workers that start later, and grant named leases for leader election. Any backend with those primitives can
+replace SQLite (e.g. Redis pub/sub + SET key NX PX for the lease) by
+implementing the same methods and registering a scheme in create_state_bus.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class LocalStateBus:
+    """Bus for a single process: nothing to publish to, always the leader"""
+
+    shared = False
+
+    def __init__(self):
+        self.node_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._retained = {}
+
+    def start(self):
+        pass
+
+    def subscribe(self, channel, handler):
+        pass
+
+    def publish(self, channel, message, retain=False):
+        if retain:
+            self._retained[channel] = message
+
+    def _prune(self, db):
+        """Drop all but the newest keep_events rows per channel that every live worker has read"""
+        now = time.time()
+        db.execute('DELETE FROM cursors WHERE seen_at < ?', (now - self.cursor_ttl,))
+        read_by_all = db.execute(
+            'SELECT COALESCE(MIN(last_id), (SELECT MAX(id) FROM events)) FROM cursors').fetchone()[0]
+        for (channel,) in db.execute('SELECT DISTINCT channel FROM events').fetchall():
+            db.execute('''
+                DELETE FROM events WHERE channel = ? AND id <= ? AND id < (
+                    SELECT COALESCE(MIN(id), 0) FROM (
+                        SELECT id FROM events WHERE channel = ? ORDER BY id DESC LIMIT ?))
+            ''', (channel, read_by_all, channel, self.keep_events))
+
+    def _store_cursor(self):
+        """Record how far this worker has read; call with self._lock held"""
+        self._conn.execute('INSERT OR REPLACE INTO cursors (node_id, last_id, seen_at) VALUES (?, ?, ?)',
+                           (self.node_id, self._last_id, time.time()))
+
+    def retained(self, channel):
+        return self._retained.get(channel)
+
+    def backlog(self, channel):
+        return []
+
+    def acquire_lease(self, name, ttl):
+        return True
+
+    def release_lease(self, name):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteStateBus(LocalStateBus):
+    """Bus backed by one SQLite file in WAL mode, shared by workers on a host.
+
+    Messages are rows in an append-only table; every worker polls for rows
+    newer than the last one it saw, skipping its own, and records that
+    position in `cursors`. Old rows are pruned so the file stays small, but
+    per channel (a busy channel never pushes out a quiet one's backlog) and
+    never past the position of a live worker that has not read them yet.
+    The connection is opened lazily per process, so a bus created before
+    gunicorn forks (--preload) still works in each worker.
+    """
+
+    shared = True
+
+    def __init__(self, path, poll_interval=0.05, keep_events=10000, cursor_interval=1.0, cursor_ttl=60):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.keep_events = keep_events  # Per channel
+        self.cursor_interval = cursor_interval  # Seconds between cursor updates
+        self.cursor_ttl = cursor_ttl  # Cursors older than this belong to dead workers
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._poller = None
+        self._published = 0
+        self._conn = None
+        self._pid = None
+        self._last_id = 0
+        self._cursor_at = 0
+
+    def _db(self):
+        """Connection for this process; call with self._lock held"""
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+
+        self._pid = os.getpid()
+        self.node_id = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS retained (
+                channel TEXT PRIMARY KEY,
+                payload TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cursors (
+                node_id TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                seen_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS events_channel ON events (channel, id);
+        ''')
+
+        # Only messages published after this worker connected are delivered
+        self._last_id = self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        self._store_cursor()
+        return self._conn
+
+    def start(self):
+        # A poller inherited through fork is not running in this process
+        if self._poller is None or not self._poller.is_alive():
+            self._poller = threading.Thread(target=self._poll, daemon=True)
+            self._poller.start()
+
+    def subscribe(self, channel, handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def publish(self, channel, message, retain=False):
+        payload = json.dumps(message, separators=(',', ':'))
+        with self._lock:
+            db = self._db()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute('INSERT INTO events (channel, origin, payload) VALUES (?, ?, ?)',
+                           (channel, self.node_id, payload))
+                if retain:
+                    db.execute('INSERT OR REPLACE INTO retained (channel, payload) VALUES (?, ?)',
+                               (channel, payload))
+                self._published += 1
+                if self._published % 1000 == 0:
+                    self._prune(db)
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+    def retained(self, channel):
+        with self._lock:
+            row = self._db().execute('SELECT payload FROM retained WHERE channel = ?', (channel,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def backlog(self, channel):
+        """Messages on a channel that are still kept but were published before this worker connected"""
+        with self._lock:
+            db = self._db()
+            rows = db.execute('SELECT payload FROM events WHERE channel = ? AND id <= ? ORDER BY id',
+                              (channel, self._last_id)).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def _poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                with self._lock:
+                    rows = self._db().execute(
+                        'SELECT id, channel, origin, payload FROM events WHERE id > ? ORDER BY id',
+                        (self._last_id,)).fetchall()
+                for event_id, channel, origin, payload in rows:
+                    self._last_id = event_id
+                    if origin == self.node_id:
+                        continue
+                    for handler in self._handlers.get(channel, ()):
+                        handler(json.loads(payload))
+                if time.monotonic() - self._cursor_at >= self.cursor_interval:
+                    with self._lock:
+                        self._db()
+                        self._store_cursor()
+                    self._cursor_at = time.monotonic()
+            except Exception as e:
+                print(f"State bus poll error: {e}")
+
+    def acquire_lease(self, name, ttl):
+        """Take or renew a lease; True while this worker holds it"""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute('''
+                INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.owner = excluded.owner OR leases.expires_at < ?
+            ''', (name, self.node_id, now + ttl, now))
+            row = db.execute('SELECT owner FROM leases WHERE name = ?', (name,)).fetchone()
+        return row is not None and row[0] == self.node_id
+
+    def release_lease(self, name):
+        with self._lock:
+            self._db().execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, self.node_id))
+
+    def close(self):
+        self._stop_event.set()
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                # Stop holding back pruning for rows this worker will never read
+                self._conn.execute('DELETE FROM cursors WHERE node_id = ?', (self.node_id,))
+                self._conn.close()
+                self._conn = None
+
+
+def create_state_bus(url=None):
+    """Build a bus from a STATE_BUS_URL value"""
+    if not url or url == 'local':
+        return LocalStateBus()
+    if url.startswith('sqlite:///'):
+        return SQLiteStateBus(url[len('sqlite:///'):])
+    raise ValueError(f"Unsupported STATE_BUS_URL {url!r} (expected 'local' or 'sqlite:///path')")
+
+
+class LeaderElection:
+    """Keep renewing a lease and run callbacks when leadership changes.
+
+    With a LocalStateBus the process is elected immediately and no thread
+    is started.
+    """
+
+    def __init__(self, bus, name, on_elected, on_demoted, ttl=10):
+        self.bus = bus
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.ttl = ttl
+        self.is_leader = False
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if not self.bus.shared:
+            self._set_leader(True)
+            return
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._set_leader(self.bus.acquire_lease(self.name, self.ttl))
+            except Exception as e:
+                print(f"Leader election error: {e}")
+                self._set_leader(False)
+            # Renew well before the lease runs out
+            self._stop_event.wait(self.ttl / 3)
+
+    def _set_leader(self, leader):
+        if leader and not self.is_leader:
+            self.is_leader = True
+            print(f"Elected leader for {self.name} ({self.bus.node_id})")
+            self.on_elected()
+        elif not leader and self.is_leader:
+            self.is_leader = False
+            print(f"Lost leadership for {self.name} ({self.bus.node_id})")
+            self.on_demoted()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_leader:
+            self._set_leader(False)
+            self.bus.release_lease(self.name)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Dashboard modules are imported flat (`from alert_events import ...`), as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
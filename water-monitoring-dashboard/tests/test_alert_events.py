@@ -0,0 +1,247 @@
+import json
+import threading
+
+from alert_events import AlertStore
+
+
+def leak(alert_id, mechanic_id=None, severity='high', timestamp='2026-01-01T00:00:00', site=None):
+    alert = {
+        'id': alert_id,
+        'type': 'leak',
+        'pipe_id': alert_id.split('_', 1)[-1],
+        'pipe_name': alert_id,
+        'timestamp': timestamp,
+        'severity': severity,
+        'acknowledged': False,
+        'assigned_mechanic_id': mechanic_id,
+        'assigned_mechanic_name': mechanic_id,
+        'status': 'assigned' if mechanic_id else 'unassigned'
+    }
+    if site:
+        alert['site'] = site
+    return alert
+
+
+def projections(store):
+    return {
+        'active': store.active,
+        'history': store.history,
+        'assignments': store.assignments,
+        'queues': {mechanic_id: list(queue) for mechanic_id, queue in store.queues.items() if queue},
+        'unacknowledged': store.unacknowledged
+    }
+
+
+def populated_store():
+    store = AlertStore()
+    store.create(leak('leak_P1', 'M1'))
+    store.create(leak('leak_P2', 'M1'))
+    store.create(leak('leak_P3', 'M2', site='north'))
+    store.create(dict(leak('leak_SIM'), simulated=True), history=False)
+    store.acknowledge(['leak_P1'], 'John')
+    store.assign('leak_P2', 'M2', 'Jane')
+    store.resolve(['leak_P1'], 'Admin')
+    store.withdraw('leak_SIM')
+    return store
+
+
+def test_projections_follow_the_events():
+    store = populated_store()
+
+    assert list(store.active) == ['leak_P2', 'leak_P3']
+    assert store.assignments == {'leak_P2': 'M2', 'leak_P3': 'M2'}
+    assert store.mechanic_alerts('M1') == []
+    assert [alert['id'] for alert in store.mechanic_alerts('M2')] == ['leak_P2', 'leak_P3']
+    assert store.unacknowledged == 2
+    assert [alert['id'] for alert in store.site_leaks('north')] == ['leak_P3']
+
+    # One history record per incident; simulated alerts stay out of it
+    assert [record['id'] for record in store.history] == ['leak_P1', 'leak_P2', 'leak_P3']
+    resolved = store.history[0]
+    assert resolved['resolved'] and resolved['status'] == 'resolved' and resolved['resolved_by'] == 'Admin'
+    assert resolved['acknowledged_by'] == 'John'
+    # History follows an open alert's reassignment
+    assert store.history[1]['assigned_mechanic_id'] == 'M2'
+
+
+def test_assign_many_is_one_event_and_all_or_nothing():
+    store = AlertStore()
+    store.create(leak('leak_P1', 'M1'))
+    store.create(leak('leak_P2'))
+    store.create(leak('leak_P3', 'M2'))
+    store.resolve(['leak_P3'])
+    events = len(store.events)
+
+    previous, missing = store.assign_many([('leak_P1', 'M2', 'Jane'), ('leak_P3', 'M1', 'John')])
+    assert (previous, missing) == ({}, ['leak_P3'])
+    assert len(store.events) == events and store.assignments == {'leak_P1': 'M1'}
+
+    previous, missing = store.assign_many([('leak_P1', 'M2', 'Jane'), ('leak_P2', 'M2', 'Jane')])
+    assert (previous, missing) == ({'leak_P1': 'M1', 'leak_P2': None}, [])
+    assert len(store.events) == events + 1
+    assert store.mechanic_alert_ids('M2') == ['leak_P1', 'leak_P2']
+    assert store.active['leak_P2']['assigned_mechanic_name'] == 'Jane'
+
+    # Leaks already with the requested mechanic are not moved
+    previous, missing = store.assign_many([('leak_P1', 'M2', 'Jane'), ('leak_P2', 'M1', 'John')])
+    assert (previous, missing) == ({'leak_P2': 'M2'}, [])
+    assert store.assign_many([('leak_P2', 'M1', 'John')]) == ({}, [])
+    assert len(store.events) == events + 2
+
+
+def test_mechanic_can_only_acknowledge_own_alerts():
+    store = AlertStore()
+    store.create(leak('leak_P1', 'M1'))
+    store.create(leak('leak_P2', 'M2'))
+
+    assert store.acknowledge(['leak_P1', 'leak_P2', 'missing'], 'John', mechanic_id='M1') == ['leak_P1']
+    assert store.acknowledge(['leak_P2'], 'Admin') == ['leak_P2']
+    assert store.unacknowledged == 0
+
+
+def test_replay_rebuilds_identical_projections():
+    store = populated_store()
+    log = json.loads(json.dumps(store.events))
+
+    rebuilt = AlertStore()
+    rebuilt.replay(log)
+
+    assert projections(rebuilt) == projections(store)
+    assert rebuilt.clock == store.clock
+
+
+def test_restore_from_compacted_base_and_tail():
+    store = populated_store()
+    base = json.loads(json.dumps(store.compact()))
+    assert store.events == []
+    store.create(leak('leak_P4', 'M1'))
+    store.resolve(['leak_P2'])
+
+    restored = AlertStore()
+    restored.restore(base, json.loads(json.dumps(store.events)))
+
+    assert projections(restored) == projections(store)
+
+
+def test_merge_keeps_concurrent_changes_of_both_workers():
+    leader, worker = AlertStore(), AlertStore()
+    leader.on_record = lambda event: worker.merge([event])
+    worker.on_record = lambda event: leader.merge([event])
+    leader.create(leak('leak_P1', 'M1'))
+
+    # Recorded concurrently: neither worker has seen the other's event yet
+    leader.on_record = worker.on_record = None
+    created = leader.create(leak('leak_P2', 'M2'))
+    acknowledged = worker.acknowledge(['leak_P1'], 'Admin')
+    assert acknowledged == ['leak_P1']
+
+    worker.merge(leader.events)
+    leader.merge(worker.events)
+
+    for store in (leader, worker):
+        assert list(store.active) == ['leak_P1', 'leak_P2']
+        assert store.active['leak_P1']['acknowledged']
+        assert store.assignments['leak_P2'] == created['assigned_mechanic_id']
+    assert leader.clock == worker.clock
+
+
+def test_merge_ignores_stale_and_repeated_events():
+    store = AlertStore()
+    store.create(leak('leak_P1', 'M1'))
+    stale = json.loads(json.dumps(store.events))
+    store.resolve(['leak_P1'])
+    clock = dict(store.clock)
+
+    assert store.merge(stale) == []
+    assert store.merge(store.events) == []
+    assert store.active == {}
+    assert store.clock == clock
+
+
+def test_merge_from_a_replica_applies_only_new_events():
+    source, replica = AlertStore(), AlertStore()
+    source.create(leak('leak_P1', 'M1'))
+    replica.merge(source.events)
+    source.acknowledge(['leak_P1'], 'Admin')
+
+    applied = replica.merge(source.events)
+
+    assert [event['type'] for event in applied] == ['acknowledged']
+    assert projections(replica) == projections(source)
+
+
+def test_recorded_events_are_numbered_per_origin():
+    store = AlertStore()
+    store.origin = 'worker-a'
+    store.create(leak('leak_P1'))
+    store.merge([{'origin': 'worker-b', 'seq': 1, 'type': 'acknowledged', 'ids': ['leak_P1'],
+                  'by': 'Admin', 'at': '2026-01-01T00:00:01'}])
+    store.create(leak('leak_P2'))
+
+    assert [(event['origin'], event['seq']) for event in store.events] == [
+        ('worker-a', 1), ('worker-b', 1), ('worker-a', 2)]
+    assert store.clock == {'worker-a': 2, 'worker-b': 1}
+
+
+def test_mechanic_queue_is_ordered_by_severity_then_age():
+    store = AlertStore()
+    store.create(leak('leak_P1', 'M1', severity='medium', timestamp='2026-01-01T00:00:01'))
+    store.create(leak('leak_P2', 'M1', severity='critical', timestamp='2026-01-01T00:00:03'))
+    store.create(leak('leak_P3', 'M1', severity='medium', timestamp='2026-01-01T00:00:00'))
+    store.create(leak('leak_P4', 'M2', severity='critical', timestamp='2026-01-01T00:00:00'))
+    store.assign('leak_P4', 'M1', 'John')
+    store.acknowledge(['leak_P3'], 'John')
+
+    queue = store.mechanic_alerts('M1')
+    assert [alert['id'] for alert in queue] == ['leak_P4', 'leak_P2', 'leak_P3', 'leak_P1']
+    assert queue[2]['acknowledged'] and queue[0]['assigned_mechanic_id'] == 'M1'
+    assert store.mechanic_alert_ids('M2') == [] and store.assigned_count('M1') == 4
+
+    store.resolve(['leak_P2'])
+    assert store.mechanic_alert_ids('M1') == ['leak_P4', 'leak_P3', 'leak_P1']
+
+
+def test_reads_are_safe_while_another_thread_records():
+    store = AlertStore()
+    stop = threading.Event()
+    errors = []
+
+    def churn():
+        i = 0
+        try:
+            while not stop.is_set():
+                store.create(leak(f"leak_P{i}", f"M{i % 2}", site='north'))
+                store.acknowledge([f"leak_P{i}"], 'Admin')
+                store.assign(f"leak_P{i}", f"M{(i + 1) % 2}", 'Jane')
+                store.resolve([f"leak_P{i - 2}"])
+                i += 1
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=churn)
+    writer.start()
+    try:
+        for _ in range(2000):
+            for mechanic_id in ('M0', 'M1'):
+                for alert in store.mechanic_alerts(mechanic_id):
+                    assert alert['assigned_mechanic_id'] == mechanic_id
+                store.mechanic_alert_ids(mechanic_id)
+            store.site_leaks('north')
+            store.active_alerts()
+    finally:
+        stop.set()
+        writer.join()
+
+    assert errors == []
+
+
+def test_store_without_a_journal_compacts_itself():
+    store = AlertStore(compact_every=10)
+    for i in range(25):
+        store.create(leak(f"leak_P{i}", 'M1'))
+        store.resolve([f"leak_P{i - 1}"])
+
+    assert len(store.events) < 10
+    rebuilt = AlertStore()
+    rebuilt.restore(json.loads(json.dumps(store.base)), json.loads(json.dumps(store.events)))
+    assert projections(rebuilt) == projections(store)
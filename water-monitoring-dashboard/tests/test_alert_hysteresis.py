@@ -0,0 +1,33 @@
+from alert_hysteresis import SiteAlertEvaluator
+
+
+def test_pipe_missing_from_the_snapshot_waits_out_the_exit_hold():
+    evaluator = SiteAlertEvaluator(exit_hold=10)
+    assert evaluator.evaluate({'active_leaks': {'P1': 1, 'P2': 1}}, now=0)['active_leaks'] == ['P1', 'P2']
+
+    # P2 dropped out of the subtree: still open during the exit hold, like a 0
+    assert evaluator.evaluate({'active_leaks': {'P1': 1}}, now=5)['active_leaks'] == ['P1', 'P2']
+    assert evaluator.evaluate({'active_leaks': {'P1': 1}}, now=15)['active_leaks'] == ['P1']
+
+
+def test_missing_pipe_that_returns_within_the_hold_stays_one_incident():
+    evaluator = SiteAlertEvaluator(exit_hold=10)
+    evaluator.evaluate({'active_leaks': {'P1': 1}}, now=0)
+    evaluator.evaluate({'active_leaks': {}}, now=5)
+
+    assert evaluator.evaluate({'active_leaks': {'P1': 1}}, now=12)['active_leaks'] == ['P1']
+    assert evaluator.leak_states.state('leak_P1') == 'active'
+
+
+def test_low_water_exits_above_the_default_exit_level():
+    evaluator = SiteAlertEvaluator()
+    assert evaluator.evaluate({'water_level': 15})['low_water_level']
+    assert evaluator.evaluate({'water_level': 22})['low_water_level']
+    assert not evaluator.evaluate({'water_level': 25})['low_water_level']
+
+
+def test_leaks_opened_in_one_tick_keep_snapshot_order():
+    pipes = [f"P{i}" for i in (7, 3, 12, 1, 9)]
+    evaluator = SiteAlertEvaluator()
+
+    assert evaluator.evaluate({'active_leaks': {pipe_id: 1 for pipe_id in pipes}})['active_leaks'] == pipes
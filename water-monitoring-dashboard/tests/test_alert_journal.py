@@ -0,0 +1,144 @@
+import json
+import threading
+
+from alert_events import AlertStore
+from alert_hysteresis import SiteAlertEvaluator
+from alert_journal import AlertJournal, WAL_FILE
+
+from test_alert_events import leak, projections
+
+
+def journaled_store(directory, snapshot_every=1000):
+    journal = AlertJournal(str(directory), snapshot_every=snapshot_every)
+    store = AlertStore()
+    journal.checkpoint(store)
+    store.journal = journal
+    return store, journal
+
+
+def restart(directory):
+    """A fresh process: new store, state read back from the journal"""
+    store = AlertStore()
+    AlertJournal(str(directory)).restore(store)
+    return store
+
+
+def record_incidents(store, count):
+    for i in range(count):
+        store.create(leak(f"leak_P{i}", f"M{i % 3}", timestamp=f"2026-01-01T00:00:{i:02d}"))
+        if i % 2:
+            store.acknowledge([f"leak_P{i}"], 'Admin')
+        if i % 3 == 0:
+            store.resolve([f"leak_P{i}"])
+
+
+def test_restart_restores_exact_state(tmp_path):
+    store, _ = journaled_store(tmp_path)
+    record_incidents(store, 20)
+    store.assign('leak_P1', 'M2', 'Jane')
+
+    # No close(): the process is killed
+    assert projections(restart(tmp_path)) == projections(store)
+
+
+def test_restart_across_snapshots(tmp_path):
+    store, journal = journaled_store(tmp_path, snapshot_every=7)
+    record_incidents(store, 30)
+
+    assert store.base is not None and len(store.events) < 7
+    restored = restart(tmp_path)
+    assert projections(restored) == projections(store)
+    assert restored.clock == store.clock
+
+
+def test_wal_left_over_from_a_crash_during_checkpoint(tmp_path):
+    store, journal = journaled_store(tmp_path)
+    record_incidents(store, 10)
+    wal = (tmp_path / WAL_FILE).read_text()
+
+    # Snapshot written, WAL not truncated yet
+    journal.checkpoint(store)
+    (tmp_path / WAL_FILE).write_text(wal)
+
+    assert projections(restart(tmp_path)) == projections(store)
+
+
+def test_torn_last_line_is_ignored_and_not_glued_to(tmp_path):
+    store, journal = journaled_store(tmp_path)
+    record_incidents(store, 5)
+    expected = projections(store)
+    journal.close()
+    with open(tmp_path / WAL_FILE, 'a', encoding='utf-8') as f:
+        f.write('{"origin":"x","seq":9,"ty')
+
+    restored = restart(tmp_path)
+    assert projections(restored) == expected
+
+    # The next writer starts a fresh line after the torn one
+    journal = AlertJournal(str(tmp_path))
+    restored.journal = journal
+    restored.acknowledge(['leak_P4'], 'Admin')
+    journal.close()
+    assert restart(tmp_path).active['leak_P4']['acknowledged']
+
+
+def test_stale_events_after_restart_do_not_roll_back(tmp_path):
+    store, _ = journaled_store(tmp_path)
+    store.create(leak('leak_P1', 'M1'))
+    retained = json.loads(json.dumps(store.events))  # e.g. still on the bus
+    store.resolve(['leak_P1'])
+
+    restored = restart(tmp_path)
+    assert restored.merge(retained) == []
+    assert restored.active == {}
+    assert restored.clock == store.clock
+
+
+def test_load_survives_a_concurrent_checkpoint(tmp_path, monkeypatch):
+    store, journal = journaled_store(tmp_path)
+    record_incidents(store, 6)
+    reader = AlertJournal(str(tmp_path))
+    read = reader._read
+
+    def read_then_checkpoint():
+        result = read()
+        if not hasattr(read_then_checkpoint, 'done'):
+            read_then_checkpoint.done = True
+            store.create(leak('leak_LATE', 'M1'))
+            journal.checkpoint(store)
+        return result
+
+    monkeypatch.setattr(reader, '_read', read_then_checkpoint)
+    restored = AlertStore()
+    reader.restore(restored)
+    assert projections(restored) == projections(store)
+
+
+def test_event_recorded_during_a_checkpoint_is_not_lost(tmp_path, monkeypatch):
+    store, journal = journaled_store(tmp_path)
+    record_incidents(store, 4)
+    compact = store.compact
+    writers = []
+
+    def compact_while_another_thread_records():
+        base = compact()
+        writers.append(threading.Thread(target=store.create, args=(leak('leak_LATE', 'M1'),)))
+        writers[0].start()
+        writers[0].join(0.2)  # Must wait until the new WAL is in place
+        return base
+
+    monkeypatch.setattr(store, 'compact', compact_while_another_thread_records)
+    journal.checkpoint(store)
+    writers[0].join()
+
+    assert 'leak_LATE' in restart(tmp_path).active
+
+
+def test_restored_alerts_are_not_resolved_and_reopened():
+    evaluator = SiteAlertEvaluator(enter_hold=5, exit_hold=10)
+    evaluator.restore(['P1'], low_water_level=True, now=0)
+
+    evaluation = evaluator.evaluate({'active_leaks': {'P1': 1}, 'water_level': 10}, now=0.1)
+
+    assert evaluation['active_leaks'] == ['P1']
+    assert evaluation['low_water_level']
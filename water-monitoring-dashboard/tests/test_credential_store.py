@@ -0,0 +1,15 @@
+import credential_store
+from credential_store import CredentialStore
+
+
+def test_cli_only_sets_passwords_for_accounts_that_can_log_in(tmp_path, monkeypatch):
+    path = tmp_path / 'credentials.json'
+    monkeypatch.setenv('CREDENTIALS_FILE', str(path))
+    monkeypatch.setattr('getpass.getpass', lambda prompt: 'secret')
+
+    assert credential_store.main(['set', 'M004']) == 1
+    assert not path.exists()
+
+    assert credential_store.main(['set', 'M001']) == 0
+    store = CredentialStore(str(path))
+    assert store.verify('M001', 'secret') and store.get('M001')['role'] == 'mechanic'
@@ -0,0 +1,37 @@
+import shutil
+
+from feed_recorder import FeedRecorder, read_feed
+
+
+def record(path, snapshots, close=True):
+    recorder = FeedRecorder(str(path))
+    for snapshot in snapshots:
+        recorder.record(snapshot)
+    recorder._file.flush()
+    if close:
+        recorder.close()
+    return recorder
+
+
+def test_restarted_recorder_continues_the_offsets(tmp_path):
+    path = tmp_path / 'feed.jsonl.gz'
+    record(path, [{'water_level': 50}, {'water_level': 40}])
+    record(path, [{'water_level': 30}, {'water_level': 30, 'active_leaks': {'P1': 1}}])
+
+    feed = list(read_feed(str(path)))
+    offsets = [offset for offset, _ in feed]
+    assert offsets == sorted(offsets)
+    assert [snapshot for _, snapshot in feed] == [
+        {'water_level': 50}, {'water_level': 40}, {'water_level': 30},
+        {'water_level': 30, 'active_leaks': {'P1': 1}}]
+
+
+def test_recorder_appends_after_a_killed_run(tmp_path):
+    path = tmp_path / 'feed.jsonl.gz'
+    recorder = record(tmp_path / 'live.jsonl.gz', [{'water_level': 50}, {'water_level': 40}], close=False)
+    shutil.copy(recorder.path, path)  # What a killed process leaves behind: no gzip trailer
+    recorder.close()
+
+    record(path, [{'water_level': 30}])
+
+    assert [snapshot['water_level'] for _, snapshot in read_feed(str(path))] == [50, 40, 30]
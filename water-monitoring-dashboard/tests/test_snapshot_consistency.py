@@ -0,0 +1,46 @@
+from snapshot_consistency import SnapshotGate, check_snapshot
+
+
+def snapshot(tick, leaking=(), active=None):
+    active = leaking if active is None else active
+    return {
+        'tick': tick,
+        'leaks': {pipe_id: int(pipe_id in leaking) for pipe_id in ('P1', 'P2')},
+        'water_flow': {'P1': 1, 'P2': 1},
+        'active_leaks': {pipe_id: int(pipe_id in active) for pipe_id in ('P1', 'P2')}
+    }
+
+
+def feed(*snapshots):
+    reads = list(snapshots)
+    return lambda: reads.pop(0) if len(reads) > 1 else reads[0]
+
+
+def test_check_snapshot():
+    assert check_snapshot(snapshot(1, ['P1'])) is None
+    assert check_snapshot(snapshot(1, ['P1'], active=[])) == 'torn'
+    assert check_snapshot(snapshot(1), last_tick=2) == 'stale'
+    assert check_snapshot({'active_leaks': {'P1': 1}}) is None  # Nothing to cross-check
+
+
+def test_gate_rereads_a_torn_snapshot_until_it_is_consistent():
+    gate = SnapshotGate(feed(snapshot(1, ['P1'], active=[]), snapshot(1, ['P1'])), max_wait=0.5)
+
+    read, outcome = gate.read()
+
+    assert outcome == 'recovered' and read['active_leaks']['P1'] == 1
+
+
+def test_gate_skips_then_forces_a_snapshot_that_never_settles():
+    gate = SnapshotGate(feed(snapshot(1, ['P1'], active=[])), max_wait=0, max_skips=2)
+
+    assert [gate.read()[1] for _ in range(3)] == ['skipped', 'skipped', 'forced']
+    assert gate.read()[1] == 'skipped'  # The count starts over after a forced tick
+
+
+def test_gate_rejects_out_of_order_ticks():
+    gate = SnapshotGate(feed(snapshot(5), snapshot(4), snapshot(6)), max_wait=0)
+
+    assert gate.read()[1] == 'ok'
+    assert gate.read() == (None, 'skipped')
+    assert gate.read()[1] == 'ok' and gate.last_tick == 6
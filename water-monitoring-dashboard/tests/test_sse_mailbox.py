@@ -0,0 +1,22 @@
+from sse_mailbox import ReplayLog
+
+
+def test_replay_after_the_last_seen_id():
+    log = ReplayLog(size=3)
+    ids = [log.append({'n': n}) for n in range(5)]
+
+    assert log.since(ids[2]) == [(ids[3], {'n': 3}), (ids[4], {'n': 4})]
+    assert log.since(ids[4]) == []
+    assert log.since(ids[0]) is None  # Evicted from the ring
+
+
+def test_ids_from_another_worker_force_a_resync():
+    log, other = ReplayLog(), ReplayLog()
+    for n in range(5):
+        log.append({'n': n})
+        other.append({'n': n})
+
+    # Same seq, different issuer: never replayed from the wrong offset
+    assert log.since(other.last_id) is None
+    assert log.since(f"{log.scope}:99") is None
+    assert log.since('12345') is None
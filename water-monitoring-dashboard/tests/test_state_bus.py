@@ -0,0 +1,65 @@
+import time
+
+from state_bus import SQLiteStateBus
+
+
+def bus_at(tmp_path, **options):
+    bus = SQLiteStateBus(str(tmp_path / 'bus.db'), poll_interval=0.01, keep_events=3, **options)
+    bus.backlog('connect')  # Opens the connection and registers the bus's cursor
+    return bus
+
+
+def prune(bus):
+    with bus._lock:
+        db = bus._db()
+        # As after a poll: the pruning worker has read everything itself
+        bus._last_id = db.execute('SELECT MAX(id) FROM events').fetchone()[0]
+        bus._store_cursor()
+        bus._prune(db)
+
+
+def test_a_busy_channel_does_not_push_out_a_quiet_one(tmp_path):
+    writer = bus_at(tmp_path)
+    writer.publish('alert_events', {'n': 0})
+    for n in range(10):
+        writer.publish('broadcast', {'n': n})
+    writer.close()  # No other live reader
+
+    joiner = bus_at(tmp_path)
+    prune(joiner)
+
+    assert joiner.backlog('alert_events') == [{'n': 0}]
+    assert joiner.backlog('broadcast') == [{'n': n} for n in range(7, 10)]
+
+
+def test_rows_a_live_worker_has_not_read_are_kept(tmp_path):
+    slow, writer = bus_at(tmp_path), bus_at(tmp_path)
+    received = []
+    slow.subscribe('broadcast', received.append)
+    for n in range(10):
+        writer.publish('broadcast', {'n': n})
+
+    prune(writer)
+    slow.start()
+    deadline = time.monotonic() + 5
+    while len(received) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    slow.close()
+    writer.close()
+
+    assert received == [{'n': n} for n in range(10)]
+
+
+def test_cursors_of_dead_workers_stop_holding_rows(tmp_path):
+    dead = bus_at(tmp_path)
+    writer = bus_at(tmp_path, cursor_ttl=0)
+    for n in range(10):
+        writer.publish('broadcast', {'n': n})
+    dead._conn = None  # Killed: never reads or deregisters
+
+    time.sleep(0.01)
+    prune(writer)
+
+    with writer._lock:
+        count = writer._db().execute('SELECT COUNT(*) FROM events').fetchone()[0]
+    assert count == 3
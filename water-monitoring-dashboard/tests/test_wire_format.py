@@ -0,0 +1,69 @@
+import importlib.util
+import json
+import os
+import random
+
+import pytest
+
+from wire_format import decode_snapshot, decode_values, encode_values, index_version, is_encoded
+
+PIPES = [f"P{i}" for i in range(1, 41)]
+
+
+def roundtrip(values):
+    encoded = json.loads(json.dumps(encode_values(PIPES[:len(values)], values)))
+    return list(decode_values(encoded)), encoded['encoding']
+
+
+@pytest.mark.parametrize('values', [
+    [],
+    [0] * 40,
+    [1] * 40,
+    [0] * 39 + [1],  # sparse: rle
+    [1] + [0] * 39,  # rle starting with a run of 1
+    [i % 2 for i in range(40)],  # dense: bits
+    [1, 0, 1],  # shorter than a byte
+])
+def test_encode_decode_roundtrip(values):
+    assert roundtrip(values)[0] == values
+
+
+def test_encoder_picks_the_shorter_form():
+    assert roundtrip([0] * 39 + [1])[1] == 'rle'
+    assert roundtrip([i % 2 for i in range(40)])[1] == 'bits'
+
+
+def test_decode_snapshot_expands_families_and_keeps_the_rest():
+    values = [i % 3 == 0 for i in range(len(PIPES))]
+    version = index_version(PIPES)
+    snapshot = {'water_level': 50, 'leaks': encode_values(PIPES, values, version),
+                'taps': {'T1': 1}}
+
+    decoded = decode_snapshot(snapshot, {version: PIPES}.get)
+
+    assert decoded['leaks'] == {pipe_id: int(value) for pipe_id, value in zip(PIPES, values)}
+    assert decoded['taps'] == {'T1': 1} and decoded['water_level'] == 50
+    assert is_encoded(snapshot['leaks'])  # Input left untouched
+
+
+def test_unknown_or_mismatched_index_drops_the_family():
+    encoded = encode_values(PIPES, [1] * len(PIPES))
+    snapshot = {'leaks': encoded, 'active_leaks': dict(encoded)}
+
+    assert 'leaks' not in decode_snapshot(snapshot, lambda version: None)
+    assert decode_snapshot(snapshot, lambda version: PIPES[:-1]) == {}
+
+
+def test_simulator_encoder_matches_the_dashboard_encoder():
+    pytest.importorskip('numpy')
+    path = os.path.join(os.path.dirname(__file__), '..', '..', 'simulation', 'wire_format.py')
+    spec = importlib.util.spec_from_file_location('simulation_wire_format', path)
+    simulation_wire_format = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(simulation_wire_format)
+
+    index = simulation_wire_format.WireIndex(PIPES)
+    assert index.version == index_version(PIPES)
+    rng = random.Random(7)
+    for density in (0, 0.02, 0.5, 1):
+        values = [rng.random() < density for _ in PIPES]
+        assert index.encode(values) == encode_values(PIPES, values)
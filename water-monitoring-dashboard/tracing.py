@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Hops a simulator write goes through before it is rendered in a browser
+STAGES = ('ingest', 'alert', 'enqueue', 'sse_yield', 'client_apply', 'end_to_end')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class LatencyTracer:
+    """Per-stage latency samples for traces stamped by the simulator.
+
+    The simulator writes {'id', 'written_at'} (wall clock) next to its data.
+    Ingestion converts that into a trace; every later hop inside the dashboard
+    is timed with the monotonic clock relative to the previous hop, so only
+    the simulator -> dashboard and end-to-end stages depend on clock sync.
+    """
+
+    def __init__(self, max_samples=2048, max_traces=1024):
+        self.max_traces = max_traces
+        self._samples = {stage: deque(maxlen=max_samples) for stage in STAGES}
+        self._traces = OrderedDict()  # Format: {trace_id: {'written_at', 'last_mono', 'yield_wall', ...}}
+        self._lock = threading.Lock()
+
+    def ingest(self, trace):
+        """Start tracking a trace read from a snapshot; returns its id if it is new"""
+        if not isinstance(trace, dict) or not trace.get('id'):
+            return None
+
+        trace_id = str(trace['id'])
+        now_wall = time.time()
+        with self._lock:
+            if trace_id in self._traces:
+                return None
+            written_at = trace.get('written_at')
+            self._traces[trace_id] = {
+                'written_at': written_at,
+                'last_mono': time.monotonic(),
+                'yield_wall': None,
+                'stages': set()
+            }
+            if len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+            if written_at is not None:
+                self._samples['ingest'].append(max(0.0, now_wall - float(written_at)))
+        return trace_id
+
+    def mark(self, trace_id, stage):
+        """Record the time since the previous hop of a trace (first occurrence only)"""
+        if not trace_id:
+            return
+        now_mono = time.monotonic()
+        with self._lock:
+            entry = self._traces.get(trace_id)
+            if entry is None or stage in entry['stages']:
+                return
+            entry['stages'].add(stage)
+            self._samples[stage].append(now_mono - entry['last_mono'])
+            entry['last_mono'] = now_mono
+            if stage == 'sse_yield':
+                entry['yield_wall'] = time.time()
+
+    def client_applied(self, trace_id, apply_seconds):
+        """Record a browser's receive -> render time and the resulting end-to-end latency"""
+        with self._lock:
+            entry = self._traces.get(trace_id)
+            if entry is None or 'client_apply' in entry['stages']:
+                return False
+            entry['stages'].add('client_apply')
+            apply_seconds = max(0.0, float(apply_seconds))
+            self._samples['client_apply'].append(apply_seconds)
+            if entry['written_at'] is not None and entry['yield_wall'] is not None:
+                self._samples['end_to_end'].append(
+                    max(0.0, entry['yield_wall'] - float(entry['written_at'])) + apply_seconds)
+        return True
+
+    def stats(self):
+        """Per-stage count and p50/p90/p99/max in milliseconds"""
+        with self._lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self._samples.items()}
+
+        result = {}
+        for stage in STAGES:
+            values = snapshot[stage]
+            result[stage] = {
+                'count': len(values),
+                'p50_ms': seconds_to_ms(percentile(values, 50)),
+                'p90_ms': seconds_to_ms(percentile(values, 90)),
+                'p99_ms': seconds_to_ms(percentile(values, 99)),
+                'max_ms': seconds_to_ms(values[-1] if values else None)
+            }
+        return result
+
+
+def seconds_to_ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+# Shared tracer for the dashboard process
+tracer = LatencyTracer()
@@ -0,0 +1,111 @@
+"""Compact encoding of the per-pipe and per-tap 0/1 maps in /water_system.
+
+By default a family such as `leaks` is written as {pipe_id: 0/1}. When the
+simulator runs with WIRE_FORMAT=bitset it writes instead
+
+    {'encoding': 'bits' | 'rle', 'index': <version>, 'count': n, 'data': str}
+
+and stores the ids once, in bit order, as a list at INDEX_ROOT/<version>.
+The version is a hash of that list, so an index never changes once written
+and readers can cache it forever.
+
+    bits  base64 of the values packed 8 per byte, least significant bit first
+    rle   comma-separated run lengths, alternating runs of 0 and 1, starting with 0
+
+The encoder picks whichever is shorter (rle wins for sparse leak maps).
+decode_snapshot() turns encoded families back into plain maps, so the rest
+of the dashboard never sees the difference. Expanding a map is the costly
+part, and most families do not change between two fetches, so decoded maps
+are cached by their encoded form and shared between snapshots; they must be
+treated as read-only.
+"""
+import base64
+import hashlib
+import itertools
+
+ENCODED_FAMILIES = ('leaks', 'active_leaks', 'water_flow', 'taps')
+INDEX_ROOT = '/pipe_indexes'
+
+DECODE_CACHE_SIZE = 256
+
+# bytes.translate table: b'0' -> 0, b'1' -> 1
+_DIGITS = bytes.maketrans(b'01', b'\x00\x01')
+
+_decoded = {}  # Format: {(index, encoding, data): {id: 0/1}}
+
+
+def index_version(ids):
+    """Content hash identifying an ordered id list"""
+    return hashlib.sha1('\n'.join(ids).encode('utf-8')).hexdigest()[:12]
+
+
+def encode_values(ids, values, version=None):
+    """Encode 0/1 values (in the order of ids) as a compact family"""
+    values = [1 if value else 0 for value in values]
+    count = len(values)
+
+    bits = int(''.join(map(str, reversed(values))) or '0', 2).to_bytes((count + 7) // 8, 'little')
+    data, encoding = base64.b64encode(bits).decode('ascii'), 'bits'
+
+    runs = [len(list(group)) for _, group in itertools.groupby(values)]
+    if values and values[0]:
+        runs.insert(0, 0)
+    rle = ','.join(map(str, runs))
+    if len(rle) < len(data):
+        data, encoding = rle, 'rle'
+
+    return {'encoding': encoding, 'index': version or index_version(ids), 'count': count, 'data': data}
+
+
+def is_encoded(value):
+    return isinstance(value, dict) and 'encoding' in value and 'index' in value
+
+
+def decode_values(encoded):
+    """bytes of 0/1 values, one per id"""
+    count = encoded['count']
+    if encoded['encoding'] == 'rle':
+        if not encoded['data']:
+            return bytes(count)
+        runs = map(int, encoded['data'].split(','))
+        return b''.join((b'\x01' if i % 2 else b'\x00') * run for i, run in enumerate(runs))[:count]
+
+    raw = base64.b64decode(encoded['data'])
+    digits = format(int.from_bytes(raw, 'little'), f'0{count}b')[::-1]
+    return digits[:count].encode('ascii').translate(_DIGITS)
+
+
+def clear_decode_cache():
+    """Forget every decoded map (the next decode_snapshot expands from scratch)"""
+    _decoded.clear()
+
+
+def decode_snapshot(snapshot, get_index):
+    """Return the snapshot with every encoded family expanded to {id: 0/1}.
+
+    `get_index(version)` returns the id list for an index version, or None
+    if it is unknown; families that cannot be decoded are dropped, which the
+    monitor treats like a missing subtree.
+    """
+    if not any(is_encoded(snapshot.get(family)) for family in ENCODED_FAMILIES):
+        return snapshot
+
+    decoded = dict(snapshot)
+    for family in ENCODED_FAMILIES:
+        encoded = snapshot.get(family)
+        if not is_encoded(encoded):
+            continue
+        key = (encoded['index'], encoded['encoding'], encoded['data'])
+        values = _decoded.get(key)
+        if values is None:
+            ids = get_index(encoded['index'])
+            if ids is None or len(ids) != encoded['count']:
+                print(f"Unknown wire index {encoded['index']} for {family}; skipping it")
+                del decoded[family]
+                continue
+            values = dict(zip(ids, decode_values(encoded)))
+            if len(_decoded) >= DECODE_CACHE_SIZE:
+                _decoded.clear()
+            _decoded[key] = values
+        decoded[family] = values
+    return decoded